@@ -0,0 +1,46 @@
+# app/data_access/backends/__init__.py
+"""
+Backends de persistência. O padrão é o SQLite do db.py; o PostgreSQL é opcional
+(DB_BACKEND=postgres + DATABASE_URL, ou DATABASE_URL começando com postgres://).
+"""
+from __future__ import annotations
+import os
+from types import ModuleType
+from typing import Any, Optional
+
+from app.data_access.backends.base import DatabaseBackend
+from app.data_access.backends.sqlite import SQLiteBackend, load_legacy_module
+
+BACKENDS = ("sqlite", "postgres")
+
+def backend_name() -> str:
+    """Backend configurado no ambiente (DB_BACKEND; senão deduzido de DATABASE_URL)."""
+    name = (os.getenv("DB_BACKEND") or "").strip().lower()
+    if not name:
+        url = os.getenv("DATABASE_URL", "")
+        name = "postgres" if url.startswith(("postgres://", "postgresql://")) else "sqlite"
+    if name == "postgresql":
+        name = "postgres"
+    if name not in BACKENDS:
+        raise ValueError(f"DB_BACKEND desconhecido: {name!r}. Use um de {BACKENDS}")
+    return name
+
+def create_backend(name: Optional[str] = None, legacy: Optional[ModuleType] = None,
+                   **options: Any) -> DatabaseBackend:
+    """Instancia o backend pedido (ou o configurado). `options` vão para o construtor."""
+    name = name or backend_name()
+    if name == "sqlite":
+        return SQLiteBackend(legacy=legacy)
+    if name == "postgres":
+        from app.data_access.backends.postgres import PostgresBackend
+
+        dsn = options.pop("dsn", None) or os.getenv("DATABASE_URL")
+        if not dsn:
+            raise RuntimeError("DB_BACKEND=postgres requer DATABASE_URL (ou dsn=...)")
+        options.setdefault("schema", os.getenv("DB_SCHEMA", "public"))
+        options.setdefault("max_size", int(os.getenv("DB_POOL_MAX", "10")))
+        return PostgresBackend(dsn, legacy=legacy, **options)
+    raise ValueError(f"Backend desconhecido: {name!r}. Use um de {BACKENDS}")
+
+__all__ = ["DatabaseBackend", "SQLiteBackend", "BACKENDS", "backend_name", "create_backend",
+           "load_legacy_module"]
@@ -0,0 +1,108 @@
+# app/data_access/backends/base.py
+from __future__ import annotations
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+class DatabaseBackend(ABC):
+    """
+    Interface de persistência do Matupiri: contas, perfis, elegibilidade e analytics.
+    Os formatos de entrada/saída são os do db.py legado (o bridge repassa as chamadas
+    sem conversão), então trocar de backend não muda nada para as páginas.
+    """
+
+    name: str = "?"
+
+    # ---------------- ciclo de vida ----------------
+    @abstractmethod
+    def run_migrations(self) -> int:
+        """Cria/atualiza o esquema (idempotente). Retorna a versão do esquema."""
+
+    @abstractmethod
+    def pool_stats(self) -> Dict[str, Any]:
+        """Estatísticas do pool de conexões."""
+
+    def close(self) -> None:
+        """Fecha as conexões do backend."""
+
+    # ---------------- contas ----------------
+    @abstractmethod
+    def create_person_account(self, name: str, username: str, password_or_hash: str) -> int: ...
+
+    @abstractmethod
+    def create_collective_account(self, cnpj: str, contact: str, password_or_hash: str) -> int: ...
+
+    @abstractmethod
+    def authenticate_person(self, username: str, password_or_hash: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def authenticate_collective(self, cnpj: str, password_or_hash: str) -> Optional[Dict[str, Any]]: ...
+
+    # ---------------- perfis ----------------
+    @abstractmethod
+    def save_profile_for_account(self, owner_account_id: int, profile: Dict[str, Any]) -> int: ...
+
+    @abstractmethod
+    def update_profile_for_account(self, profile_id: int, owner_account_id: int,
+                                   profile: Dict[str, Any]) -> None: ...
+
+    @abstractmethod
+    def get_profiles_by_account(self, owner_account_id: int) -> List[Tuple[int, int, str, str]]: ...
+
+    @abstractmethod
+    def load_profile(self, profile_id: int) -> Dict[str, Any]: ...
+
+    @abstractmethod
+    def load_profile_entry(self, profile_id: int) -> Optional[Tuple[Dict[str, Any], str]]: ...
+
+    @abstractmethod
+    def profile_updated_at(self, profile_id: int) -> Optional[str]: ...
+
+    # ---------------- elegibilidade ----------------
+    @abstractmethod
+    def save_eligibility(self, user_id: str, profile_id: int, desired_policy: Optional[str],
+                         matched_policies: List[Dict[str, Any]], gaps: List[Dict[str, Any]]) -> int: ...
+
+    # ---------------- analytics ----------------
+    @abstractmethod
+    def log_event(self, kind: str, policy: Optional[str] = None, uf: Optional[str] = None,
+                  municipio: Optional[str] = None, query: Optional[str] = None,
+                  gender: Optional[str] = None, met: Optional[List[str]] = None,
+                  missing: Optional[List[str]] = None, extras: Optional[Dict[str, Any]] = None) -> int: ...
+
+    @abstractmethod
+    def log_events(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Grava vários eventos (kwargs de log_event) num único lote. Retorna quantos."""
+
+    @abstractmethod
+    def iter_analytics(self, start_iso: Optional[str] = None, end_iso: Optional[str] = None,
+                       uf: Optional[str] = None, municipio: Optional[str] = None,
+                       gender: Optional[str] = None, batch_size: int = 5_000) -> Iterator[List[Dict[str, Any]]]: ...
+
+    def get_analytics(self, start_iso: Optional[str] = None, end_iso: Optional[str] = None,
+                      uf: Optional[str] = None, municipio: Optional[str] = None,
+                      gender: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [d for batch in self.iter_analytics(start_iso, end_iso, uf, municipio, gender) for d in batch]
+
+    def get_analytics_frame(self, start_iso: Optional[str] = None, end_iso: Optional[str] = None,
+                            uf: Optional[str] = None, municipio: Optional[str] = None,
+                            gender: Optional[str] = None, batch_size: int = 50_000,
+                            with_requirements: bool = False):
+        """DataFrame dos eventos (implementação genérica a partir de iter_analytics)."""
+        import pandas as pd
+
+        columns = ["ts", "kind", "policy", "uf", "municipio", "query", "gender"]
+        if with_requirements:
+            columns += ["met", "missing"]
+        rows = [{c: d[c] for c in columns}
+                for batch in self.iter_analytics(start_iso, end_iso, uf, municipio, gender, batch_size)
+                for d in batch]
+        df = pd.DataFrame(rows, columns=columns)
+        df["ts"] = pd.to_datetime(df["ts"], utc=True)
+        for c in ("kind", "policy", "uf", "municipio", "gender"):
+            df[c] = df[c].astype("category")
+        return df
+
+    @abstractmethod
+    def get_analytics_aggregate(self, metric: str, group_by: Optional[List[str]] = None,
+                                filters: Optional[Dict[str, Any]] = None,
+                                top_n: Optional[int] = 10) -> Dict[str, Any]: ...
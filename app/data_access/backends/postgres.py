@@ -0,0 +1,396 @@
+# app/data_access/backends/postgres.py
+"""
+Backend PostgreSQL (opcional): pip install "psycopg[binary,pool]>=3.1".
+
+- Pool de conexões (psycopg_pool), uma transação por operação.
+- get_analytics/iter_analytics leem com cursor do lado do servidor (memória constante).
+- log_events grava lotes com COPY (ids reservados na sequence, requisitos também via COPY).
+- Normalização de eventos, filtros e hash de senha vêm do db.py, então os dois
+  backends gravam e respondem exatamente o mesmo.
+"""
+from __future__ import annotations
+import json
+import time
+import uuid
+from types import ModuleType
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.data_access.backends.base import DatabaseBackend
+from app.data_access.backends.sqlite import _event_row, load_legacy_module
+
+_EVENT_COLS = ("ts, kind, policy, uf, municipio, query, gender, extras_json, "
+               "ts_ms, uf_norm, municipio_norm, gender_norm")
+_READ_COLS = "id, ts, ts_ms, kind, policy, uf, municipio, query, gender, extras_json"
+_MIGRATION_LOCK_KEY = 0x4D617475  # pg_advisory_xact_lock: um migrador por vez
+
+# Esquema equivalente ao do SQLite (mesmos nomes de tabelas/colunas e índices)
+_SCHEMA_V1 = (
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        created_at TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS accounts (
+        id BIGSERIAL PRIMARY KEY,
+        kind TEXT NOT NULL CHECK (kind IN ('person','collective')),
+        username TEXT UNIQUE,
+        display_name TEXT,
+        cnpj TEXT UNIQUE,
+        contact TEXT,
+        password_hash TEXT NOT NULL,
+        created_at TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS profiles (
+        id BIGSERIAL PRIMARY KEY,
+        user_id TEXT,
+        profile_json TEXT,
+        version INTEGER NOT NULL DEFAULT 1,
+        created_at TEXT,
+        updated_at TEXT,
+        owner_account_id BIGINT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS eligibility_results (
+        id BIGSERIAL PRIMARY KEY,
+        user_id TEXT,
+        profile_id BIGINT,
+        desired_policy TEXT,
+        matched_policies_json TEXT,
+        gaps_json TEXT,
+        created_at TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS analytics_events (
+        id BIGSERIAL PRIMARY KEY,
+        ts TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        policy TEXT,
+        uf TEXT,
+        municipio TEXT,
+        query TEXT,
+        gender TEXT,
+        extras_json TEXT,
+        ts_ms BIGINT,
+        uf_norm TEXT,
+        municipio_norm TEXT,
+        gender_norm TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS analytics_event_requirements (
+        event_id BIGINT NOT NULL REFERENCES analytics_events(id) ON DELETE CASCADE,
+        status TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        requirement TEXT NOT NULL,
+        PRIMARY KEY (event_id, status, position)
+    )
+    """,
+)
+
+def _pg(sql: str) -> str:
+    """Placeholders do sqlite3 (?) → psycopg (%s)."""
+    return sql.replace("?", "%s")
+
+class PostgresBackend(DatabaseBackend):
+    """Backend PostgreSQL com pool de conexões; `schema` isola instalações (e testes)."""
+
+    name = "postgres"
+
+    def __init__(self, dsn: str, legacy: Optional[ModuleType] = None, schema: str = "public",
+                 min_size: int = 1, max_size: int = 10, timeout: float = 30.0):
+        try:
+            import psycopg
+            from psycopg_pool import ConnectionPool
+        except ImportError as e:
+            raise RuntimeError("Backend PostgreSQL requer psycopg 3: "
+                               "pip install 'psycopg[binary,pool]>=3.1'") from e
+        if not schema.isidentifier():
+            raise ValueError(f"Schema inválido: {schema!r}")
+        self._errors = psycopg.errors
+        self.legacy = legacy or load_legacy_module()
+        self.schema = schema
+        self._pool = ConnectionPool(dsn, min_size=min_size, max_size=max_size, timeout=timeout,
+                                    kwargs={"options": f"-c search_path={schema}"}, open=True)
+        self._migrated: Optional[int] = None
+
+    # ---------------- ciclo de vida ----------------
+    def run_migrations(self) -> int:
+        if self._migrated is not None:
+            return self._migrated
+        migrations = ((1, _SCHEMA_V1 + tuple(self.legacy._ANALYTICS_INDEXES) + tuple(self.legacy._PROFILE_INDEXES)
+                       + tuple(self.legacy._EVENT_REQUIREMENTS_INDEXES[:1])),)
+        with self._pool.connection() as cn:
+            # lock antes do CREATE SCHEMA: dois processos criando o mesmo schema colidem no catálogo
+            cn.execute("SELECT pg_advisory_xact_lock(%s)", (_MIGRATION_LOCK_KEY,))
+            cn.execute(f"CREATE SCHEMA IF NOT EXISTS {self.schema}")
+            cn.execute("CREATE TABLE IF NOT EXISTS matupiri_schema (version INTEGER NOT NULL)")
+            row = cn.execute("SELECT MAX(version) FROM matupiri_schema").fetchone()
+            current = int(row[0] or 0)
+            for version, statements in migrations:
+                if version > current:
+                    for ddl in statements:
+                        cn.execute(ddl)
+                    current = version
+            cn.execute("DELETE FROM matupiri_schema")
+            cn.execute("INSERT INTO matupiri_schema (version) VALUES (%s)", (current,))
+        self._migrated = current
+        return current
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "schema": self.schema, **self._pool.get_stats()}
+
+    def close(self) -> None:
+        self._pool.close()
+
+    # ---------------- contas ----------------
+    def _hash(self, password_or_hash: str) -> str:
+        lg = self.legacy
+        return password_or_hash if lg._is_pbkdf2_hash(password_or_hash) else lg._hasher().run(lg._hash_password, password_or_hash)
+
+    def create_person_account(self, name: str, username: str, password_or_hash: str) -> int:
+        pw_hash = self._hash(password_or_hash)
+        with self._pool.connection() as cn:
+            return int(cn.execute("""
+                INSERT INTO accounts (kind, username, display_name, password_hash, created_at)
+                VALUES ('person', %s, %s, %s, %s) RETURNING id
+            """, (username, name, pw_hash, self.legacy._now_iso())).fetchone()[0])
+
+    def create_collective_account(self, cnpj: str, contact: str, password_or_hash: str) -> int:
+        pw_hash = self._hash(password_or_hash)
+        with self._pool.connection() as cn:
+            return int(cn.execute("""
+                INSERT INTO accounts (kind, cnpj, contact, password_hash, created_at)
+                VALUES ('collective', %s, %s, %s, %s) RETURNING id
+            """, (cnpj, contact, pw_hash, self.legacy._now_iso())).fetchone()[0])
+
+    def _check_password(self, account_id: int, stored: str, password_or_hash: str) -> bool:
+        """Mesma regra do db.py: confere no executor de hash e regrava hashes antigos."""
+        lg = self.legacy
+        if lg._is_pbkdf2_hash(password_or_hash):
+            return lg.hmac.compare_digest(stored, password_or_hash)
+        if not lg._hasher().run(lg._verify_password, password_or_hash, stored):
+            return False
+        if lg._needs_rehash(stored):
+            try:
+                new_hash = lg._hasher().run(lg._hash_password, password_or_hash)
+                with self._pool.connection() as cn:
+                    cn.execute("UPDATE accounts SET password_hash=%s WHERE id=%s AND password_hash=%s",
+                               (new_hash, account_id, stored))
+            except (lg.AuthBusyError, self._errors.Error):
+                pass
+        return True
+
+    def authenticate_person(self, username: str, password_or_hash: str) -> Optional[Dict[str, Any]]:
+        with self._pool.connection() as cn:
+            row = cn.execute("""
+                SELECT id, kind, username, display_name, password_hash
+                  FROM accounts WHERE kind='person' AND username=%s
+            """, (username,)).fetchone()
+        if not row or not self._check_password(row[0], row[4] or "", password_or_hash):
+            return None
+        return {"id": row[0], "kind": row[1], "username": row[2], "display_name": row[3]}
+
+    def authenticate_collective(self, cnpj: str, password_or_hash: str) -> Optional[Dict[str, Any]]:
+        with self._pool.connection() as cn:
+            row = cn.execute("""
+                SELECT id, kind, cnpj, contact, password_hash
+                  FROM accounts WHERE kind='collective' AND cnpj=%s
+            """, (cnpj,)).fetchone()
+        if not row or not self._check_password(row[0], row[4] or "", password_or_hash):
+            return None
+        return {"id": row[0], "kind": row[1], "cnpj": row[2], "contact": row[3]}
+
+    # ---------------- perfis ----------------
+    def save_profile_for_account(self, owner_account_id: int, profile: Dict[str, Any]) -> int:
+        now = self.legacy._now_iso()
+        retries = self.legacy._PROFILE_SAVE_RETRIES
+        for attempt in range(retries):
+            try:
+                with self._pool.connection() as cn:
+                    return int(cn.execute("""
+                        INSERT INTO profiles (user_id, profile_json, version, created_at, updated_at, owner_account_id)
+                        SELECT '', %s, COALESCE(MAX(version), 0) + 1, %s, %s, %s
+                          FROM profiles WHERE owner_account_id = %s
+                        RETURNING id
+                    """, (json.dumps(profile, ensure_ascii=False), now, now,
+                          owner_account_id, owner_account_id)).fetchone()[0])
+            except self._errors.UniqueViolation:
+                if attempt == retries - 1:
+                    raise
+                time.sleep(0.01 * (attempt + 1))
+        raise AssertionError("inalcançável")
+
+    def update_profile_for_account(self, profile_id: int, owner_account_id: int,
+                                   profile: Dict[str, Any]) -> None:
+        with self._pool.connection() as cn:
+            row = cn.execute("SELECT owner_account_id FROM profiles WHERE id=%s FOR UPDATE",
+                             (profile_id,)).fetchone()
+            if not row or int(row[0] or 0) != int(owner_account_id):
+                raise PermissionError("Este perfil não pertence à sua conta.")
+            cn.execute("UPDATE profiles SET profile_json=%s, updated_at=%s WHERE id=%s",
+                       (json.dumps(profile, ensure_ascii=False), self.legacy._now_iso(), profile_id))
+
+    def get_profiles_by_account(self, owner_account_id: int) -> List[Tuple[int, int, str, str]]:
+        with self._pool.connection() as cn:
+            rows = cn.execute("""
+                SELECT id, version, created_at, updated_at
+                  FROM profiles
+                 WHERE owner_account_id=%s
+                 ORDER BY version DESC
+            """, (owner_account_id,)).fetchall()
+        return [(int(r[0]), int(r[1] or 1), r[2], r[3]) for r in rows]
+
+    def load_profile(self, profile_id: int) -> Dict[str, Any]:
+        entry = self.load_profile_entry(profile_id)
+        return entry[0] if entry else {}
+
+    def load_profile_entry(self, profile_id: int) -> Optional[Tuple[Dict[str, Any], str]]:
+        with self._pool.connection() as cn:
+            r = cn.execute("SELECT profile_json, updated_at FROM profiles WHERE id=%s", (profile_id,)).fetchone()
+        return (json.loads(r[0] or "{}"), r[1] or "") if r else None
+
+    def profile_updated_at(self, profile_id: int) -> Optional[str]:
+        with self._pool.connection() as cn:
+            r = cn.execute("SELECT updated_at FROM profiles WHERE id=%s", (profile_id,)).fetchone()
+        return (r[0] or "") if r else None
+
+    # ---------------- elegibilidade ----------------
+    def save_eligibility(self, user_id: str, profile_id: int, desired_policy: Optional[str],
+                         matched_policies: List[Dict[str, Any]], gaps: List[Dict[str, Any]]) -> int:
+        with self._pool.connection() as cn:
+            return int(cn.execute("""
+                INSERT INTO eligibility_results
+                (user_id, profile_id, desired_policy, matched_policies_json, gaps_json, created_at)
+                VALUES (%s,%s,%s,%s,%s,%s) RETURNING id
+            """, (user_id, profile_id, desired_policy or "",
+                  json.dumps(matched_policies, ensure_ascii=False),
+                  json.dumps(gaps, ensure_ascii=False),
+                  self.legacy._now_iso())).fetchone()[0])
+
+    # ---------------- analytics ----------------
+    def log_event(self, kind: str, policy: Optional[str] = None, uf: Optional[str] = None,
+                  municipio: Optional[str] = None, query: Optional[str] = None,
+                  gender: Optional[str] = None, met: Optional[List[str]] = None,
+                  missing: Optional[List[str]] = None, extras: Optional[Dict[str, Any]] = None) -> int:
+        *event, met_l, missing_l = self.legacy._event_row(kind, policy, uf, municipio, query, gender,
+                                                          met, missing, extras)
+        with self._pool.connection() as cn:
+            rid = int(cn.execute(f"INSERT INTO analytics_events ({_EVENT_COLS}) "
+                                 f"VALUES ({', '.join(['%s'] * 12)}) RETURNING id", event).fetchone()[0])
+            reqs = _requirement_rows(rid, met_l, missing_l)
+            if reqs:
+                with cn.cursor() as cur:
+                    cur.executemany("INSERT INTO analytics_event_requirements (event_id, status, position, requirement) "
+                                    "VALUES (%s,%s,%s,%s)", reqs)
+        return rid
+
+    def log_events(self, events: Iterable[Dict[str, Any]]) -> int:
+        """Lote via COPY: reserva os ids na sequence e copia eventos e requisitos."""
+        rows = [_event_row(self.legacy, e) for e in events]
+        if not rows:
+            return 0
+        with self._pool.connection() as cn:
+            ids = [r[0] for r in cn.execute(
+                "SELECT nextval(pg_get_serial_sequence('analytics_events', 'id')) FROM generate_series(1, %s)",
+                (len(rows),))]
+            with cn.cursor() as cur:
+                with cur.copy(f"COPY analytics_events (id, {_EVENT_COLS}) FROM STDIN") as cp:
+                    for rid, row in zip(ids, rows):
+                        cp.write_row((rid, *row[:12]))
+                reqs = [r for rid, row in zip(ids, rows) for r in _requirement_rows(rid, row[12], row[13])]
+                if reqs:
+                    with cur.copy("COPY analytics_event_requirements (event_id, status, position, requirement) "
+                                  "FROM STDIN") as cp:
+                        for r in reqs:
+                            cp.write_row(r)
+        return len(rows)
+
+    def iter_analytics(self, start_iso: Optional[str] = None, end_iso: Optional[str] = None,
+                       uf: Optional[str] = None, municipio: Optional[str] = None,
+                       gender: Optional[str] = None, batch_size: int = 5_000) -> Iterator[List[Dict[str, Any]]]:
+        where, args = self.legacy._analytics_filters(start_iso, end_iso, uf, municipio, gender)
+        batch_size = max(1, int(batch_size))
+        with self._pool.connection() as cn:
+            # cursor nomeado = cursor do servidor: o resultado não é materializado no cliente
+            with cn.cursor(name=f"analytics_{uuid.uuid4().hex}") as cur:
+                cur.itersize = batch_size
+                cur.execute(_pg(f"SELECT {_READ_COLS} FROM analytics_events WHERE 1=1 {where} "
+                                "ORDER BY ts_ms DESC, id DESC"), args)
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        return
+                    reqs = self._requirements_for(cn, [r[0] for r in rows])
+                    batch: List[Dict[str, Any]] = []
+                    for eid, ts, _ts_ms, kind, policy, uf_, mun, query, gen, extras in rows:
+                        lists = reqs.get(eid, {})
+                        batch.append({
+                            "ts": ts, "kind": kind, "policy": policy,
+                            "uf": uf_, "municipio": mun, "query": query,
+                            "gender": gen,
+                            "met": lists.get("met", []),
+                            "missing": lists.get("missing", []),
+                            "extras": json.loads(extras) if extras and extras != "{}" else {},
+                        })
+                    yield batch
+
+    def _requirements_for(self, cn: Any, ids: List[int]) -> Dict[int, Dict[str, List[str]]]:
+        out: Dict[int, Dict[str, List[str]]] = {}
+        for event_id, status, requirement in cn.execute("""
+            SELECT event_id, status, requirement
+              FROM analytics_event_requirements
+             WHERE event_id = ANY(%s)
+             ORDER BY event_id, status, position
+        """, (ids,)):
+            out.setdefault(event_id, {}).setdefault(status, []).append(requirement)
+        return out
+
+    def get_analytics_aggregate(self, metric: str, group_by: Optional[List[str]] = None,
+                                filters: Optional[Dict[str, Any]] = None,
+                                top_n: Optional[int] = 10) -> Dict[str, Any]:
+        """Mesmo contrato do db.py; agrega direto dos eventos (o Postgres não usa rollups)."""
+        lg = self.legacy
+        if metric not in lg._AGG_METRICS:
+            raise ValueError(f"Métrica desconhecida: {metric!r}. Use uma de {sorted(lg._AGG_METRICS)}")
+        kind, status = lg._AGG_METRICS[metric]
+        cols = list(group_by or [])
+        bad = [c for c in cols if c not in lg._AGG_DIMS or (c == "requirement" and not status)]
+        if bad:
+            raise ValueError(f"Colunas de agrupamento inválidas para '{metric}': {bad}")
+        filters = dict(filters or {})
+        dims = list(dict.fromkeys(cols + ["uf", "municipio"]))
+        parts, args = lg._agg_sources(kind, status, dims, filters, False, (self.schema,))
+        src = _pg("WITH src AS (" + " UNION ALL ".join(parts) + ") ")
+
+        rank_sql = src + f"SELECT {', '.join(cols) + ', ' if cols else ''}SUM(n) AS n FROM src WHERE 1=1"
+        rank_sql += "".join(f" AND {c} <> ''" for c in cols)
+        if cols:
+            rank_sql += " GROUP BY " + ", ".join(cols)
+        # COLLATE "C": desempate byte a byte, como o BINARY do SQLite
+        rank_sql += " HAVING SUM(n) > 0 ORDER BY n DESC" + "".join(f', {c} COLLATE "C"' for c in cols)
+        rank_args = list(args)
+        if top_n:
+            rank_sql += " LIMIT %s"; rank_args.append(int(top_n))
+        weight_sql = src + ("SELECT uf, municipio, SUM(n) AS weight FROM src"
+                            " WHERE uf <> '' AND municipio <> '' GROUP BY uf, municipio")
+        where, wargs = lg._analytics_filters(**filters)
+
+        with self._pool.connection() as cn:
+            total = cn.execute(_pg(f"SELECT COUNT(*) FROM analytics_events WHERE 1=1 {where}"), wargs).fetchone()[0]
+            ranking = [{**dict(zip(cols, r[:-1])), "count": int(r[-1])}
+                       for r in cn.execute(rank_sql, rank_args)]
+            weights = [{"uf": r[0], "municipio": r[1], "weight": int(r[2])}
+                       for r in cn.execute(weight_sql, args)]
+        return {"total": int(total), "ranking": ranking, "weights": weights}
+
+def _requirement_rows(event_id: int, met: List[str], missing: List[str]) -> List[Tuple[int, str, int, str]]:
+    return [(event_id, status, pos, req)
+            for status, items in (("met", met), ("missing", missing))
+            for pos, req in enumerate(items or [])]
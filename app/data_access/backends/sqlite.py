@@ -0,0 +1,121 @@
+# app/data_access/backends/sqlite.py
+from __future__ import annotations
+import importlib.util
+import traceback
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.data_access.backends.base import DatabaseBackend
+
+ROOT = Path(__file__).resolve().parents[3]           # .../Matupiri_v1
+DB_FILE = ROOT / "db.py"
+
+def load_legacy_module(module_name: str = "db_legacy") -> ModuleType:
+    """Carrega SEMPRE o db.py pelo caminho absoluto (sem depender do nome "db")."""
+    if not DB_FILE.exists():
+        raise RuntimeError(f"db.py não encontrado em {DB_FILE}")
+    try:
+        spec = importlib.util.spec_from_file_location(module_name, DB_FILE)
+        mod = importlib.util.module_from_spec(spec)  # type: ignore
+        assert spec and spec.loader
+        spec.loader.exec_module(mod)                 # type: ignore
+        return mod
+    except Exception:
+        raise RuntimeError(
+            "Falha ao carregar o db.py por caminho absoluto:\n" +
+            traceback.format_exc()
+        )
+
+class SQLiteBackend(DatabaseBackend):
+    """Backend padrão: o db.py da raiz (arquivo SQLite em DB_PATH)."""
+
+    name = "sqlite"
+
+    def __init__(self, legacy: Optional[ModuleType] = None):
+        self.legacy = legacy or load_legacy_module()
+
+    def run_migrations(self) -> int:
+        return self.legacy.run_migrations()
+
+    def pool_stats(self) -> Dict[str, Any]:
+        return self.legacy.pool_stats()
+
+    def close(self) -> None:
+        self.legacy.get_pool().close()
+
+    def create_person_account(self, name: str, username: str, password_or_hash: str) -> int:
+        return self.legacy.create_person_account(name, username, password_or_hash)
+
+    def create_collective_account(self, cnpj: str, contact: str, password_or_hash: str) -> int:
+        return self.legacy.create_collective_account(cnpj, contact, password_or_hash)
+
+    def authenticate_person(self, username: str, password_or_hash: str) -> Optional[Dict[str, Any]]:
+        return self.legacy.authenticate_person(username, password_or_hash)
+
+    def authenticate_collective(self, cnpj: str, password_or_hash: str) -> Optional[Dict[str, Any]]:
+        return self.legacy.authenticate_collective(cnpj, password_or_hash)
+
+    def save_profile_for_account(self, owner_account_id: int, profile: Dict[str, Any]) -> int:
+        return self.legacy.save_profile_for_account(owner_account_id, profile)
+
+    def update_profile_for_account(self, profile_id: int, owner_account_id: int,
+                                   profile: Dict[str, Any]) -> None:
+        return self.legacy.update_profile_for_account(profile_id, owner_account_id, profile)
+
+    def get_profiles_by_account(self, owner_account_id: int) -> List[Tuple[int, int, str, str]]:
+        return self.legacy.get_profiles_by_account(owner_account_id)
+
+    def load_profile(self, profile_id: int) -> Dict[str, Any]:
+        return self.legacy.load_profile(profile_id)
+
+    def load_profile_entry(self, profile_id: int) -> Optional[Tuple[Dict[str, Any], str]]:
+        return self.legacy.load_profile_entry(profile_id)
+
+    def profile_updated_at(self, profile_id: int) -> Optional[str]:
+        return self.legacy.profile_updated_at(profile_id)
+
+    def save_eligibility(self, user_id: str, profile_id: int, desired_policy: Optional[str],
+                         matched_policies: List[Dict[str, Any]], gaps: List[Dict[str, Any]]) -> int:
+        return self.legacy.save_eligibility(user_id, profile_id, desired_policy, matched_policies, gaps)
+
+    def log_event(self, kind: str, policy: Optional[str] = None, uf: Optional[str] = None,
+                  municipio: Optional[str] = None, query: Optional[str] = None,
+                  gender: Optional[str] = None, met: Optional[List[str]] = None,
+                  missing: Optional[List[str]] = None, extras: Optional[Dict[str, Any]] = None) -> int:
+        return self.legacy.log_event(kind, policy, uf, municipio, query, gender, met, missing, extras)
+
+    def log_events(self, events: Iterable[Dict[str, Any]]) -> int:
+        rows = [_event_row(self.legacy, e) for e in events]
+        if rows:
+            self.legacy._insert_events(rows)
+        return len(rows)
+
+    def iter_analytics(self, start_iso: Optional[str] = None, end_iso: Optional[str] = None,
+                       uf: Optional[str] = None, municipio: Optional[str] = None,
+                       gender: Optional[str] = None, batch_size: int = 5_000) -> Iterator[List[Dict[str, Any]]]:
+        return self.legacy.iter_analytics(start_iso, end_iso, uf, municipio, gender, batch_size)
+
+    def get_analytics(self, start_iso: Optional[str] = None, end_iso: Optional[str] = None,
+                      uf: Optional[str] = None, municipio: Optional[str] = None,
+                      gender: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.legacy.get_analytics(start_iso, end_iso, uf, municipio, gender)
+
+    def get_analytics_frame(self, start_iso: Optional[str] = None, end_iso: Optional[str] = None,
+                            uf: Optional[str] = None, municipio: Optional[str] = None,
+                            gender: Optional[str] = None, batch_size: int = 50_000,
+                            with_requirements: bool = False):
+        return self.legacy.get_analytics_frame(start_iso, end_iso, uf, municipio, gender,
+                                               batch_size, with_requirements)
+
+    def get_analytics_aggregate(self, metric: str, group_by: Optional[List[str]] = None,
+                                filters: Optional[Dict[str, Any]] = None,
+                                top_n: Optional[int] = 10) -> Dict[str, Any]:
+        return self.legacy.get_analytics_aggregate(metric, group_by, filters, top_n)
+
+def _event_row(legacy: ModuleType, event: Dict[str, Any]) -> Tuple[Any, ...]:
+    """kwargs de log_event → linha normalizada (mesma normalização do db.py)."""
+    e = dict(event)
+    return legacy._event_row(e.pop("kind"), e.pop("policy", None), e.pop("uf", None),
+                             e.pop("municipio", None), e.pop("query", None), e.pop("gender", None),
+                             e.pop("met", None), e.pop("missing", None), e.pop("extras", None))
@@ -3,50 +3,103 @@
 
 # app/data_access/bridge_legacy_db.py
 # Carrega SEMPRE o db.py pelo caminho absoluto (sem depender do nome "db")
+# O db.py só é executado no primeiro acesso a uma função do banco (__getattr__ do módulo):
+# importar app.data_access não cria diretórios, pools nem threads.
 
 from __future__ import annotations
-from pathlib import Path
-import importlib.util
-import traceback
-
-ROOT = Path(__file__).resolve().parents[2]           # .../Matupiri_v1
-DB_FILE = ROOT / "db.py"
-
-def _load_db_module():
-    if not DB_FILE.exists():
-        raise RuntimeError(f"db.py não encontrado em {DB_FILE}")
-    try:
-        spec = importlib.util.spec_from_file_location("db_legacy", DB_FILE)
-        mod = importlib.util.module_from_spec(spec)  # type: ignore
-        assert spec and spec.loader
-        spec.loader.exec_module(mod)                 # type: ignore
-        return mod
-    except Exception:
-        raise RuntimeError(
-            "Falha ao carregar o db.py por caminho absoluto:\n" +
-            traceback.format_exc()
-        )
-
-_legacy = _load_db_module()
+import threading
+from types import ModuleType
+from typing import Any, Optional, Tuple
+
+from app.utils.cache import cached_resource
+
+def _load_db_module() -> ModuleType:
+    from app.data_access.backends.sqlite import load_legacy_module
+    return load_legacy_module("db_legacy")
+
+_LEGACY_LOCK = threading.Lock()
+_BACKEND_LOCK = threading.Lock()
+_LEGACY: Optional[ModuleType] = None
+_BACKEND: Any = None
+
+def _legacy_module() -> ModuleType:
+    """db.py legado, carregado uma única vez por processo."""
+    global _LEGACY
+    if _LEGACY is None:
+        with _LEGACY_LOCK:
+            if _LEGACY is None:
+                _LEGACY = _load_db_module()
+    return _LEGACY
+
+@cached_resource(show_spinner=False)
+def connection_pool(db_path: str):
+    """Pool de conexões único por processo (sobrevive a reruns e reloads do Streamlit)."""
+    return _legacy_module().ConnectionPool(db_path)
+
+@cached_resource(show_spinner=False)
+def database_backend():
+    """Backend configurado (DB_BACKEND / DATABASE_URL), único por processo."""
+    from app.data_access.backends import create_backend
+    return create_backend(legacy=_legacy_module())
+
+def _load() -> Tuple[ModuleType, Any]:
+    """Carrega (uma vez) o db.py legado e o backend configurado."""
+    global _BACKEND
+    if _BACKEND is None:
+        with _BACKEND_LOCK:
+            if _BACKEND is None:
+                legacy = _legacy_module()
+                backend = database_backend()
+                if backend.name == "sqlite" and hasattr(legacy, "set_pool"):
+                    legacy.set_pool(connection_pool(str(legacy.DB_PATH)))
+                _BACKEND = backend
+    return _legacy_module(), _BACKEND
+
+def is_loaded() -> bool:
+    """True se o db.py já foi executado neste processo."""
+    return _LEGACY is not None
 
 # Exponha as funções esperadas pelo restante do app:
 def _missing(*_a, **_k):
     raise RuntimeError("Função ausente no db.py legado.")
 
-init_db                   = getattr(_legacy, "init_db", _missing)
-migrate_db                = getattr(_legacy, "migrate_db", _missing)
-migrate_accounts          = getattr(_legacy, "migrate_accounts", _missing)
-migrate_analytics         = getattr(_legacy, "migrate_analytics", _missing)
+# Funções da interface de backend (SQLite ou PostgreSQL)
+_BACKEND_NAMES = (
+    "run_migrations", "pool_stats",
+    "log_event", "log_events", "get_analytics", "get_analytics_frame", "iter_analytics",
+    "get_analytics_aggregate",
+    "create_person_account", "create_collective_account",
+    "authenticate_person", "authenticate_collective",
+    "save_profile_for_account", "update_profile_for_account", "get_profiles_by_account",
+    "load_profile", "load_profile_entry", "profile_updated_at",
+)
+# Só existem no db.py
+_LEGACY_NAMES = ("flush_analytics", "analytics_writer_stats", "auth_hash_stats")
+# Migrações legadas; nos outros backends o esquema inteiro sai de run_migrations
+_MIGRATION_NAMES = ("init_db", "migrate_db", "migrate_accounts", "migrate_analytics")
 
-log_event                 = getattr(_legacy, "log_event", _missing)
-get_analytics             = getattr(_legacy, "get_analytics", _missing)
+def _resolve(name: str) -> Any:
+    legacy, backend = _load()
+    if name == "_legacy":
+        return legacy
+    if name == "_backend":
+        return backend
+    if name == "AuthBusyError":
+        return getattr(legacy, "AuthBusyError", RuntimeError)
+    if name in _BACKEND_NAMES:
+        return getattr(backend, name, _missing)
+    if name in _MIGRATION_NAMES:
+        if backend.name != "sqlite":
+            return backend.run_migrations
+        return getattr(legacy, name, _missing)
+    return getattr(legacy, name, _missing)
 
-create_person_account     = getattr(_legacy, "create_person_account", _missing)
-create_collective_account = getattr(_legacy, "create_collective_account", _missing)
-authenticate_person       = getattr(_legacy, "authenticate_person", _missing)
-authenticate_collective   = getattr(_legacy, "authenticate_collective", _missing)
+def __getattr__(name: str) -> Any:
+    if name not in _BACKEND_NAMES + _LEGACY_NAMES + _MIGRATION_NAMES + ("AuthBusyError", "_legacy", "_backend"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = _resolve(name)
+    globals()[name] = value  # próximos acessos não passam mais por aqui
+    return value
 
-save_profile_for_account   = getattr(_legacy, "save_profile_for_account", _missing)
-update_profile_for_account = getattr(_legacy, "update_profile_for_account", _missing)
-get_profiles_by_account    = getattr(_legacy, "get_profiles_by_account", _missing)
-load_profile               = getattr(_legacy, "load_profile", _missing)
+def __dir__():
+    return sorted(set(globals()) | set(_BACKEND_NAMES + _LEGACY_NAMES + _MIGRATION_NAMES) | {"AuthBusyError"})
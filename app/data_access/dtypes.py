@@ -0,0 +1,143 @@
+# app/data_access/dtypes.py
+from __future__ import annotations
+from typing import Any, Dict, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+# Política de dtypes dos frames de catálogo, geo e analytics. Os loaders leem tudo como
+# texto/object; aqui cada coluna conhecida ganha o tipo enxuto:
+#   - categóricas: strings de baixa cardinalidade repetidas em milhares de linhas
+#     (UF, nível, esfera...), guardadas como códigos inteiros + dicionário;
+#   - códigos IBGE: inteiros anuláveis (Int32; o CSV de municípios tem linhas sem código);
+#   - coordenadas: float32 (~1 m de precisão, suficiente para mapa);
+#   - demais colunas de texto: string com armazenamento pyarrow, quando disponível.
+# Menos memória por processo e menos bytes para o st.cache_data hashear a cada chamada.
+
+CATEGORY = "category"
+CODE = "code"
+COORD = "coord"
+STRING = "string"
+
+DTYPE_SCHEMA: Dict[str, str] = {
+    # catálogo de políticas / UCs / defesos
+    "uf": CATEGORY, "uf_sigla": CATEGORY, "uf_nome": CATEGORY,
+    "nivel": CATEGORY, "esfera": CATEGORY, "categoria": CATEGORY,
+    "tipo_beneficio": CATEGORY, "responsavel": CATEGORY,
+    # analytics
+    "kind": CATEGORY, "policy": CATEGORY, "municipio": CATEGORY, "gender": CATEGORY,
+    # códigos IBGE
+    "ibge_uf": CODE, "ibge_mun": CODE, "uf_id": CODE, "mun_id": CODE,
+    # coordenadas
+    "lat": COORD, "lon": COORD, "latitude": COORD, "longitude": COORD,
+}
+
+# Acima desta fração de valores distintos o categórico gasta mais que o texto
+CATEGORY_MAX_RATIO = 0.5
+
+def string_dtype() -> Any:
+    """
+    Dtype de texto enxuto: StringDtype com pyarrow mantendo NaN como ausente (os
+    consumidores comparam/filtram esperando NaN, não pd.NA). None sem pyarrow.
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    try:
+        return pd.StringDtype("pyarrow", na_value=np.nan)   # pandas >= 2.3
+    except TypeError:
+        pass
+    try:
+        return pd.StringDtype("pyarrow_numpy")              # pandas 2.1–2.2
+    except (TypeError, ValueError):
+        return pd.StringDtype("pyarrow")
+
+def _is_text(s: pd.Series) -> bool:
+    if isinstance(s.dtype, pd.StringDtype):
+        return True
+    return s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) in ("string", "empty")
+
+def _as_category(s: pd.Series) -> pd.Series:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return s
+    if not _is_text(s) or (len(s) and s.nunique(dropna=True) > CATEGORY_MAX_RATIO * len(s)):
+        return s
+    return s.astype("category")
+
+def _as_code(s: pd.Series) -> pd.Series:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        s = s.astype(object)
+    if not (pd.api.types.is_numeric_dtype(s) or _is_text(s)):
+        return s
+    num = pd.to_numeric(s, errors="coerce")
+    # só converte se nada se perde (códigos são inteiros; texto vazio vira <NA>)
+    lost = num.isna() & s.notna() & (s.astype(str).str.strip() != "")
+    if lost.any() or (num.dropna() % 1 != 0).any():
+        return s
+    return num.astype("Int64" if num.notna().any() and num.abs().max() >= 2**31 else "Int32")
+
+def _as_coord(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_float_dtype(s) or pd.api.types.is_integer_dtype(s):
+        return s.astype("float32")
+    if _is_text(s):
+        num = pd.to_numeric(s, errors="coerce")
+        if not (num.isna() & s.notna()).any():
+            return num.astype("float32")
+    return s
+
+def apply_dtypes(df: Optional[pd.DataFrame], schema: Optional[Mapping[str, str]] = None,
+                 strings: bool = True) -> Optional[pd.DataFrame]:
+    """
+    Aplica a política de dtypes (DTYPE_SCHEMA + `schema`) às colunas presentes. Colunas de
+    texto fora do esquema viram string pyarrow (strings=False desliga). Colunas que não
+    convertem sem perda (texto num código, categórico de alta cardinalidade) ficam como estão.
+    """
+    if df is None or not len(df.columns):
+        return df
+    rules = {**DTYPE_SCHEMA, **(schema or {})}
+    text = string_dtype() if strings else None
+    out: Dict[Any, pd.Series] = {}
+    for col in df.columns:
+        s = df[col]
+        rule = rules.get(str(col))
+        if rule == CATEGORY:
+            s = _as_category(s)
+        elif rule == CODE:
+            s = _as_code(s)
+        elif rule == COORD:
+            s = _as_coord(s)
+        if text is not None and rule != CATEGORY and _is_text(s) and s.dtype != text:
+            s = s.astype(text)
+        out[col] = s
+    return pd.DataFrame(out, index=df.index, columns=df.columns)
+
+def frame_nbytes(df: Optional[pd.DataFrame]) -> int:
+    """Memória do frame incluindo o conteúdo das strings (deep)."""
+    return 0 if df is None else int(df.memory_usage(deep=True, index=True).sum())
+
+def memory_report(frames: Mapping[str, pd.DataFrame],
+                  schema: Optional[Mapping[str, str]] = None) -> pd.DataFrame:
+    """
+    Memória de cada frame antes/depois de apply_dtypes:
+    colunas frame, rows, before_kb, after_kb, saved_pct.
+    """
+    rows = []
+    for name, df in frames.items():
+        before = frame_nbytes(df)
+        after = frame_nbytes(apply_dtypes(df, schema))
+        rows.append({"frame": name, "rows": 0 if df is None else len(df),
+                     "before_kb": round(before / 1024, 1), "after_kb": round(after / 1024, 1),
+                     "saved_pct": round(100.0 * (before - after) / before, 1) if before else 0.0})
+    return pd.DataFrame(rows, columns=["frame", "rows", "before_kb", "after_kb", "saved_pct"])
+
+def column_report(df: pd.DataFrame, schema: Optional[Mapping[str, str]] = None) -> pd.DataFrame:
+    """Antes/depois por coluna (dtype e bytes), para investigar um frame específico."""
+    typed = apply_dtypes(df, schema)
+    before = df.memory_usage(deep=True, index=False)
+    after = typed.memory_usage(deep=True, index=False)
+    return pd.DataFrame({"dtype_before": df.dtypes.astype(str), "dtype_after": typed.dtypes.astype(str),
+                         "before_kb": (before / 1024).round(1), "after_kb": (after / 1024).round(1)})
+
+__all__ = ["CATEGORY", "CODE", "COORD", "DTYPE_SCHEMA", "STRING", "apply_dtypes", "column_report",
+           "frame_nbytes", "memory_report", "string_dtype"]
@@ -0,0 +1,230 @@
+# app/data_access/manifest.py
+from __future__ import annotations
+import fnmatch
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from app.data_access.storage import data_dir, processed_dir
+
+# Manifesto dos dados (data/processed/manifest.json), gerado pela ETL (etl.build_manifest):
+# um registro por dataset com caminho canônico, formato, linhas, esquema, sha256 e
+# horário de build. O app resolve datasets por ele (busca em dicionário, sem exists/glob)
+# e usa o sha256 como chave de cache. Sem manifesto, os loaders sondam o disco como antes.
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+DATASET_FORMATS = {".csv": "csv", ".xlsx": "xlsx", ".parquet": "parquet", ".json": "json", ".geojson": "geojson"}
+# fora do manifesto: fontes brutas, intermediários e perfis salvos pelos usuários
+_SKIP_DIRS = {"raw", "interim", "profiles"}
+
+@dataclass(frozen=True)
+class DatasetEntry:
+    key: str                  # caminho relativo a data/ (ex.: "processed/policies.xlsx")
+    path: str
+    format: str
+    rows: Optional[int]
+    schema: Dict[str, str]
+    sha256: str
+    size: int
+    mtime_ns: int
+    built_at: str
+
+    @property
+    def stem(self) -> str:
+        return self.key.rsplit(".", 1)[0]
+
+def manifest_path() -> Path:
+    env = os.environ.get("DATA_MANIFEST")
+    return Path(env) if env else processed_dir() / MANIFEST_NAME
+
+# -------------------- Build (ETL) --------------------
+
+def _file_sha256(p: Path) -> str:
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _describe(p: Path, fmt: str) -> Tuple[Optional[int], Dict[str, str]]:
+    """Linhas e esquema (coluna → dtype) do dataset."""
+    if fmt in ("json", "geojson"):
+        obj = json.loads(p.read_text(encoding="utf-8"))
+        if isinstance(obj, dict) and isinstance(obj.get("features"), list):
+            props = (obj["features"][0].get("properties") or {}) if obj["features"] else {}
+            return len(obj["features"]), {k: type(v).__name__ for k, v in props.items()}
+        if isinstance(obj, list):
+            return len(obj), ({k: type(v).__name__ for k, v in obj[0].items()}
+                              if obj and isinstance(obj[0], dict) else {})
+        return None, {}
+    if fmt == "csv":
+        df = pd.read_csv(p, low_memory=False)
+    elif fmt == "parquet":
+        df = pd.read_parquet(p)
+    else:
+        from app.data_access.storage import read_excel
+        df = read_excel(str(p))
+    return len(df), {str(c): str(t) for c, t in df.dtypes.items()}
+
+def _iter_datasets(root: Path) -> Iterable[Path]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in _SKIP_DIRS and not d.startswith("."))
+        for name in sorted(filenames):
+            p = Path(dirpath) / name
+            if not name.startswith(".") and p.suffix.lower() in DATASET_FORMATS and name != MANIFEST_NAME:
+                yield p
+
+def build_manifest(root: Optional[Path] = None, out: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    Varre `root` (padrão: data/) e grava o manifesto. Arquivos com mesmo tamanho/mtime
+    do manifesto anterior reaproveitam hash, linhas e esquema.
+    """
+    root = Path(root or data_dir())
+    out = Path(out or manifest_path())
+    previous: Dict[str, Any] = {}
+    try:
+        previous = json.loads(out.read_text(encoding="utf-8")).get("datasets", {})
+    except (OSError, ValueError):
+        pass
+    now = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    datasets: Dict[str, Any] = {}
+    for p in _iter_datasets(root):
+        key = p.relative_to(root).as_posix()
+        st = p.stat()
+        old = previous.get(key)
+        if old and old.get("size") == st.st_size and old.get("mtime_ns") == st.st_mtime_ns:
+            datasets[key] = old
+            continue
+        fmt = DATASET_FORMATS[p.suffix.lower()]
+        try:
+            rows, schema = _describe(p, fmt)
+        except Exception:  # arquivo ilegível ainda entra (com hash), só sem esquema
+            rows, schema = None, {}
+        datasets[key] = {"path": key, "format": fmt, "rows": rows, "schema": schema,
+                         "sha256": _file_sha256(p), "size": st.st_size,
+                         "mtime_ns": st.st_mtime_ns, "built_at": now}
+    manifest = {"version": MANIFEST_VERSION, "built_at": now, "datasets": datasets}
+    out.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=out.name, dir=out.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, out)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return manifest
+
+# -------------------- Leitura (app) --------------------
+
+class DataManifest:
+    """Manifesto carregado: busca por caminho ou por nome (sem extensão) em O(1)."""
+
+    def __init__(self, payload: Dict[str, Any], root: Path):
+        self.root = root
+        self.built_at = payload.get("built_at", "")
+        self.entries: Dict[str, DatasetEntry] = {}
+        self._by_stem: Dict[str, List[DatasetEntry]] = {}
+        for key, d in (payload.get("datasets") or {}).items():
+            e = DatasetEntry(key=key, path=d.get("path", key), format=d.get("format", ""),
+                             rows=d.get("rows"), schema=dict(d.get("schema") or {}),
+                             sha256=d.get("sha256", ""), size=int(d.get("size") or 0),
+                             mtime_ns=int(d.get("mtime_ns") or 0), built_at=d.get("built_at", ""))
+            self.entries[key] = e
+            self._by_stem.setdefault(e.stem, []).append(e)
+
+    def path_of(self, entry: DatasetEntry) -> Path:
+        return self.root / entry.path
+
+    def lookup(self, path: str) -> Optional[DatasetEntry]:
+        """Entrada de um caminho relativo (a data/, ao projeto ou a data/processed)."""
+        key = Path(path).as_posix()
+        if key.startswith("data/"):
+            key = key[len("data/"):]
+        return self.entries.get(key) or self.entries.get(f"processed/{key}")
+
+    def find(self, names: Iterable[str], formats: Iterable[str]) -> List[DatasetEntry]:
+        """
+        Datasets para nomes relativos a data/ sem extensão ("processed/policies"), na ordem
+        dos nomes e depois dos formatos. Curingas (*, ?, [) casam com o início do nome.
+        """
+        order = {f.lstrip("."): i for i, f in enumerate(formats)}
+        out: List[DatasetEntry] = []
+        seen = set()
+        for name in names:
+            if any(ch in name for ch in "*?["):
+                found = [e for stem, es in self._by_stem.items() if fnmatch.fnmatchcase(stem, name + "*")
+                         for e in es]
+            else:
+                found = list(self._by_stem.get(name, []))
+            for e in sorted(found, key=lambda e: (order.get(e.format, len(order)), e.key)):
+                if e.format in order and e.key not in seen:
+                    seen.add(e.key)
+                    out.append(e)
+        return out
+
+    def version_of(self, path: str) -> Optional[str]:
+        e = self.lookup(path)
+        return e.sha256 if e else None
+
+_LOCK = Lock()
+_CACHE: Dict[str, Tuple[Tuple[int, int], Optional[DataManifest]]] = {}
+
+def load_manifest(path: Optional[Path] = None) -> Optional[DataManifest]:
+    """Manifesto atual (relido só quando o arquivo muda); None se não existir."""
+    p = Path(path or manifest_path())
+    try:
+        st = p.stat()
+    except OSError:
+        return None
+    sig = (st.st_mtime_ns, st.st_size)
+    with _LOCK:
+        hit = _CACHE.get(str(p))
+        if hit and hit[0] == sig:
+            return hit[1]
+    try:
+        payload = json.loads(p.read_text(encoding="utf-8"))
+        manifest = DataManifest(payload, data_dir()) if payload.get("version") == MANIFEST_VERSION else None
+    except (OSError, ValueError):
+        manifest = None
+    with _LOCK:
+        _CACHE[str(p)] = (sig, manifest)
+    return manifest
+
+def resolve_path(path: str) -> Optional[Path]:
+    """Caminho canônico de um dataset pelo manifesto (None se ausente/sem manifesto)."""
+    m = load_manifest()
+    e = m.lookup(path) if m else None
+    return m.path_of(e) if m and e else None
+
+def dataset_version(path: str) -> str:
+    """sha256 do dataset no manifesto, para chave de cache ("" sem manifesto)."""
+    m = load_manifest()
+    return (m.version_of(path) or "") if m else ""
+
+def known_sha256(p: Path) -> Optional[str]:
+    """sha256 do manifesto para `p`, se o arquivo não mudou desde o build (tamanho/mtime)."""
+    m = load_manifest()
+    if m is None:
+        return None
+    try:
+        key = p.resolve().relative_to(m.root.resolve()).as_posix()
+        st = p.stat()
+    except (ValueError, OSError):
+        return None
+    e = m.entries.get(key)
+    return e.sha256 if e and e.size == st.st_size and e.mtime_ns == st.st_mtime_ns else None
+
+__all__ = ["DataManifest", "DatasetEntry", "build_manifest", "dataset_version", "known_sha256",
+           "load_manifest", "manifest_path", "resolve_path"]
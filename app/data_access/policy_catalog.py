@@ -0,0 +1,396 @@
+# app/data_access/policy_catalog.py
+from __future__ import annotations
+import hashlib
+import os
+import pickle
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from app.data_access.storage import data_dir, processed_dir, read_excel
+from app.utils.cache import cached_resource
+
+# Pacote binário do catálogo de políticas (as 9 planilhas já normalizadas e indexadas),
+# compilado pela ETL (etl.build_policy_catalog) ou sob demanda, e identificado pelos
+# sha256 das planilhas de origem. As páginas de resultado leem daqui em vez do Excel.
+# Os requisitos vão também pré-analisados (app.services.requirement_rules): operador,
+# limiar numérico, listas do `in` e regex validadas já na compilação.
+
+BUNDLE_FORMAT = 2
+BUNDLE_NAME = "policy_catalog.bundle.pkl"
+
+SOURCE_FILES = (
+    "policies.xlsx",
+    "policy_requirements.xlsx",
+    "policy_contacts.xlsx",
+    "policy_documents.xlsx",
+    "policy_financial_params.xlsx",
+    "policy_regions.xlsx",
+    "policy_regulations_all.xlsx",
+    "policy_subprograms.xlsx",
+    "policy_requirements_contacts.xlsx",
+)
+
+_TRUE = ("1", "true", "sim", "yes")
+_CONTACT_ALIASES = [
+    ("org_name", "org_name"), ("organization", "org_name"), ("org", "org_name"),
+    ("phone", "phone"), ("telefone", "phone"), ("contato", "phone"),
+    ("email", "email"),
+    ("url", "url"), ("site", "url"),
+    ("notes", "notes"), ("obs", "notes"),
+]
+
+@dataclass
+class PolicyCatalog:
+    """Tabelas do catálogo + índices por política. Compartilhado entre sessões: não altere."""
+    version: str                                   # hash das fontes (muda quando qualquer planilha muda)
+    source_dir: str                                # só informativo: a validade do pacote é a versão
+    sources: Dict[str, str]                        # arquivo → sha256 ("" = ausente)
+    built_at: str
+    policies_df: pd.DataFrame
+    reqs_df: pd.DataFrame
+    info_df: pd.DataFrame
+    contacts_df: pd.DataFrame                      # contatos gerais da política
+    all_contacts_df: pd.DataFrame                  # gerais + contatos por requisito (Resultado automático)
+    req_contacts_df: pd.DataFrame
+    docs_by_policy: Dict[Any, List[Tuple[str, bool]]] = field(default_factory=dict)
+    req_contacts_index: Dict[Tuple[Any, str], List[Dict[str, Any]]] = field(default_factory=dict)
+    reqs_by_policy: Dict[Any, pd.DataFrame] = field(default_factory=dict)
+    info_by_policy: Dict[Any, pd.DataFrame] = field(default_factory=dict)
+    contacts_by_policy: Dict[Any, pd.DataFrame] = field(default_factory=dict)
+    all_contacts_by_policy: Dict[Any, pd.DataFrame] = field(default_factory=dict)
+    rules: Dict[Any, Tuple[Any, ...]] = field(default_factory=dict)   # policy_id → RequirementRule, na ordem
+
+# -------------------- Fontes --------------------
+
+def source_dirs() -> List[Path]:
+    """Onde procurar as planilhas, em ordem: data/raw/policies_source e data/processed."""
+    env = os.environ.get("POLICIES_SOURCE_DIR")
+    if env:
+        return [Path(env)]
+    return [data_dir() / "raw" / "policies_source", processed_dir()]
+
+def find_source_dir(candidates: Optional[List[Path]] = None) -> Optional[Path]:
+    for d in candidates or source_dirs():
+        if (d / "policies.xlsx").exists():
+            return d
+    return None
+
+def bundle_path() -> Path:
+    env = os.environ.get("POLICY_CATALOG_BUNDLE")
+    return Path(env) if env else processed_dir() / BUNDLE_NAME
+
+def _file_sha256(p: Path) -> str:
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def source_hashes(src: Path) -> Dict[str, str]:
+    """sha256 das planilhas (do manifesto da ETL quando o arquivo não mudou desde o build)."""
+    from app.data_access.manifest import known_sha256
+
+    out: Dict[str, str] = {}
+    for name in SOURCE_FILES:
+        p = src / name
+        out[name] = (known_sha256(p) or _file_sha256(p)) if p.exists() else ""
+    return out
+
+def _stat_signature(src: Path) -> Tuple[Any, ...]:
+    """Assinatura barata (mtime/tamanho) para decidir se vale recalcular os hashes."""
+    sig: List[Any] = [str(src)]
+    for name in SOURCE_FILES:
+        try:
+            st = (src / name).stat()
+            sig.append((name, st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            sig.append((name, None, None))
+    return tuple(sig)
+
+def _version(sources: Dict[str, str]) -> str:
+    h = hashlib.sha256(f"format={BUNDLE_FORMAT}".encode())
+    for name in SOURCE_FILES:
+        h.update(f"\n{name}={sources.get(name, '')}".encode())
+    return h.hexdigest()[:16]
+
+# -------------------- Compilação --------------------
+
+def _read(p: Path) -> pd.DataFrame:
+    return read_excel(str(p)) if p.exists() else pd.DataFrame()  # passa pelo sidecar Feather
+
+def _flag(v: Any) -> bool:
+    return str(v).strip().lower() in _TRUE
+
+def _rename_contacts(df: pd.DataFrame, extra: Optional[List[Tuple[Any, str]]] = None) -> pd.DataFrame:
+    low = {c.lower(): c for c in df.columns}
+    colmap = {}
+    for src, dst in [("policy_id", "policy_id")] + (extra or []) + _CONTACT_ALIASES:
+        if isinstance(src, str) and src in low:
+            colmap[low[src]] = dst
+    return df.rename(columns=colmap)
+
+def _col(df: pd.DataFrame, name: Optional[str], default: Any = None) -> List[Any]:
+    return df[name].tolist() if name and name in df.columns else [default] * len(df)
+
+def _groups(df: Optional[pd.DataFrame]) -> Dict[Any, pd.DataFrame]:
+    if df is None or df.empty or "policy_id" not in df.columns:
+        return {}
+    return {pid: g for pid, g in df.groupby("policy_id")}
+
+def compile_catalog(src: Path, sources: Optional[Dict[str, str]] = None) -> PolicyCatalog:
+    """Lê as planilhas de `src` e monta tabelas normalizadas e índices por política."""
+    from app.services.requirement_rules import parse_requirements
+
+    t = {name: _read(src / name) for name in SOURCE_FILES}
+    df_policies = t["policies.xlsx"]
+    df_requirements = t["policy_requirements.xlsx"]
+    df_docs = t["policy_documents.xlsx"]
+    df_fin = t["policy_financial_params.xlsx"]
+    df_regions = t["policy_regions.xlsx"]
+    df_regs_all = t["policy_regulations_all.xlsx"]
+    df_subprograms = t["policy_subprograms.xlsx"]
+    sources = sources if sources is not None else source_hashes(src)
+    empty = pd.DataFrame()
+    catalog = PolicyCatalog(
+        version=_version(sources), source_dir=str(src), sources=dict(sources),
+        built_at=time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        policies_df=empty, reqs_df=empty, info_df=empty, contacts_df=empty,
+        all_contacts_df=empty, req_contacts_df=empty,
+    )
+    if df_policies.empty:
+        return catalog
+
+    # ----- policies -----
+    low = {c.lower(): c for c in df_policies.columns}
+    rename = {}
+    for a, b in [
+        ("name", "policy_name"), ("nome", "policy_name"), ("titulo", "policy_name"), ("título", "policy_name"),
+        ("description", "description"), ("descricao", "description"), ("descrição", "description"), ("resumo", "description"),
+    ]:
+        if a in low: rename[low[a]] = b
+    if "policy_id" not in low and "id" in low:
+        rename[low["id"]] = "policy_id"
+    policies_df = df_policies.rename(columns=rename).copy()
+    if "policy_id" not in policies_df.columns:
+        policies_df["policy_id"] = range(1, len(policies_df) + 1)
+    if "policy_name" not in policies_df.columns:
+        raise ValueError("policies.xlsx precisa ter 'policy_name' (ou Nome/Título).")
+
+    # ----- requirements -----
+    reqs_df = pd.DataFrame(columns=["policy_id", "attribute", "operator", "value", "mandatory_flag"])
+    if not df_requirements.empty:
+        low = {c.lower(): c for c in df_requirements.columns}
+        colmap = {
+            low.get("policy_id", "policy_id"): "policy_id",
+            low.get("attribute", "attribute"): "attribute",
+            low.get("operator", "operator"): "operator",
+            low.get("value", "value"): "value",
+        }
+        reqs_df = df_requirements.rename(columns=colmap)
+        if "mandatory_flag" not in reqs_df.columns:
+            for cand in ["mandatory_flag", "obrigatorio", "obrigatório", "required"]:
+                if cand in low:
+                    reqs_df["mandatory_flag"] = df_requirements[low[cand]]
+                    break
+            else:
+                reqs_df["mandatory_flag"] = True
+        reqs_df["mandatory_flag"] = reqs_df["mandatory_flag"].astype(str).str.lower().isin(list(_TRUE))
+
+    # ----- info agregada + documentos exigidos -----
+    info_rows: List[Tuple[Any, str, str]] = []
+    docs_by_policy: Dict[Any, List[Tuple[str, bool]]] = {}
+    if not df_docs.empty:
+        low = {c.lower(): c for c in df_docs.columns}
+        k_doc = low.get("doc_name") or low.get("documento") or low.get("doc")
+        k_mand = low.get("mandatory_flag") or low.get("obrigatorio") or low.get("obrigatório") or low.get("required")
+        for pid, doc, mand in zip(_col(df_docs, "policy_id"), _col(df_docs, k_doc), _col(df_docs, k_mand, "false")):
+            dname = str(doc or "").strip()
+            if dname:
+                mand = _flag(mand)
+                docs_by_policy.setdefault(pid, []).append((dname, mand))
+                info_rows.append((pid, "Documento exigido", dname + (" (obrigatório)" if mand else "")))
+
+    if not df_fin.empty:
+        low = {c.lower(): c for c in df_fin.columns}
+        kcol = low.get("param_name") or low.get("param") or low.get("chave")
+        vcol = low.get("param_value") or low.get("valor") or low.get("value")
+        for pid, k, v in zip(_col(df_fin, "policy_id"), _col(df_fin, kcol), _col(df_fin, vcol)):
+            info_rows.append((pid, str(k or "Parâmetro financeiro"), str(v or "")))
+
+    if not df_regions.empty:
+        nm = "region_name" if "region_name" in df_regions.columns else ("uf" if "uf" in df_regions.columns else None)
+        if nm:
+            for pid, g in df_regions.groupby("policy_id"):
+                regs = ", ".join(sorted({str(x) for x in g[nm] if pd.notna(x)}))
+                if regs:
+                    info_rows.append((pid, "Abrangência", regs))
+
+    if not df_regs_all.empty:
+        nm = "regulation" if "regulation" in df_regs_all.columns else ("lei" if "lei" in df_regs_all.columns else None)
+        if nm:
+            for pid, g in df_regs_all.groupby("policy_id"):
+                bases = "; ".join(str(x) for x in g[nm] if pd.notna(x))
+                if bases:
+                    info_rows.append((pid, "Base legal", bases))
+
+    if not df_subprograms.empty:
+        nm = ("subprogram_name" if "subprogram_name" in df_subprograms.columns
+              else ("nome_subprograma" if "nome_subprograma" in df_subprograms.columns else None))
+        if nm:
+            for pid, g in df_subprograms.groupby("policy_id"):
+                subs = ", ".join(str(x) for x in g[nm] if pd.notna(x))
+                if subs:
+                    info_rows.append((pid, "Subprogramas", subs))
+
+    info_df = pd.DataFrame(info_rows, columns=["policy_id", "info_key", "info_value"]) if info_rows else pd.DataFrame()
+
+    # ----- contatos gerais e por requisito -----
+    df_contacts = t["policy_contacts.xlsx"]
+    df_reqs_contacts = t["policy_requirements_contacts.xlsx"]
+    contacts_df = pd.DataFrame(columns=["policy_id", "org_name", "phone", "email", "url", "notes"])
+    if not df_contacts.empty:
+        contacts_df = _rename_contacts(df_contacts)
+    all_contacts_df = contacts_df
+    if not df_reqs_contacts.empty:
+        all_contacts_df = pd.concat([contacts_df, _rename_contacts(df_reqs_contacts)],
+                                    ignore_index=True).drop_duplicates()
+
+    req_contacts_df = pd.DataFrame(columns=["policy_id", "requirement_key", "org_name", "phone", "email", "url", "notes"])
+    req_contacts_index: Dict[Tuple[Any, str], List[Dict[str, Any]]] = {}
+    if not df_reqs_contacts.empty:
+        low = {c.lower(): c for c in df_reqs_contacts.columns}
+        # tanto atributo quanto documento servem de chave do requisito
+        rkey_col = (low.get("requirement_key") or low.get("attribute") or low.get("doc_name")
+                    or low.get("documento") or low.get("requisito") or "requirement_key")
+        colmap = {low.get("policy_id", "policy_id"): "policy_id"}
+        for src_col, dst in [(rkey_col, "requirement_key")] + _CONTACT_ALIASES:
+            if isinstance(src_col, str) and src_col in low:
+                colmap[src_col] = dst
+        req_contacts_df = df_reqs_contacts.rename(columns=colmap)
+        cols = {c: _col(req_contacts_df, c) for c in ("policy_id", "requirement_key", "org_name",
+                                                     "phone", "email", "url", "notes")}
+        for i, pid in enumerate(cols["policy_id"]):
+            rk = str(cols["requirement_key"][i] or "").strip().lower()
+            if pid and rk:
+                req_contacts_index.setdefault((pid, rk), []).append(
+                    {k: cols[k][i] for k in ("org_name", "phone", "email", "url", "notes")})
+
+    catalog.policies_df = policies_df
+    catalog.reqs_df = reqs_df
+    catalog.info_df = info_df
+    catalog.contacts_df = contacts_df
+    catalog.all_contacts_df = all_contacts_df
+    catalog.req_contacts_df = req_contacts_df
+    catalog.docs_by_policy = docs_by_policy
+    catalog.req_contacts_index = req_contacts_index
+    catalog.reqs_by_policy = _groups(reqs_df)
+    catalog.info_by_policy = _groups(info_df)
+    catalog.contacts_by_policy = _groups(contacts_df)
+    catalog.all_contacts_by_policy = _groups(all_contacts_df)
+    catalog.rules = parse_requirements(reqs_df)
+    return catalog
+
+# -------------------- Pacote em disco --------------------
+
+def write_bundle(catalog: PolicyCatalog, path: Optional[Path] = None) -> Path:
+    """Grava o pacote de forma atômica (arquivo temporário + rename)."""
+    out = Path(path or bundle_path())
+    out.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=out.name, dir=out.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({"format": BUNDLE_FORMAT, "catalog": catalog}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, out)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return out
+
+def read_bundle(path: Optional[Path] = None) -> Optional[PolicyCatalog]:
+    """Pacote gravado (None se ausente, ilegível ou de outro formato)."""
+    p = Path(path or bundle_path())
+    try:
+        with open(p, "rb") as f:
+            payload = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if not isinstance(payload, dict) or payload.get("format") != BUNDLE_FORMAT:
+        return None
+    return payload.get("catalog")
+
+def build_bundle(src: Optional[Path] = None, out: Optional[Path] = None,
+                 force: bool = False) -> Tuple[Optional[PolicyCatalog], bool]:
+    """Compila e grava o pacote se as fontes mudaram. Retorna (catálogo, recompilou?)."""
+    src = src or find_source_dir()
+    if src is None:
+        return None, False
+    sources = source_hashes(src)
+    current = None if force else read_bundle(out)
+    # só a versão (hash do conteúdo): um pacote gerado em outro checkout/diretório continua válido
+    if current is not None and current.version == _version(sources):
+        return current, False
+    catalog = compile_catalog(src, sources)
+    write_bundle(catalog, out)
+    return catalog, True
+
+# -------------------- Acesso pelo app --------------------
+
+class PolicyCatalogStore:
+    """
+    Catálogo do processo: a cada get() compara mtime/tamanho das planilhas (stat, barato);
+    se algo mudou, recalcula os hashes e reaproveita o pacote em disco ou recompila.
+    """
+
+    def __init__(self, candidates: Optional[List[Path]] = None, bundle: Optional[Path] = None):
+        self.candidates = candidates
+        self.bundle = bundle
+        self._lock = Lock()
+        self._catalog: Optional[PolicyCatalog] = None
+        self._signature: Optional[Tuple[Any, ...]] = None
+        self._stats = {"hits": 0, "bundle_loads": 0, "builds": 0}
+
+    def get(self) -> Optional[PolicyCatalog]:
+        src = find_source_dir(self.candidates)
+        if src is None:
+            return None
+        sig = _stat_signature(src)
+        with self._lock:
+            if self._catalog is not None and sig == self._signature:
+                self._stats["hits"] += 1
+                return self._catalog
+            sources = source_hashes(src)
+            version = _version(sources)
+            if self._catalog is None or self._catalog.version != version:
+                catalog = read_bundle(self.bundle)
+                if catalog is not None and catalog.version == version:
+                    self._stats["bundle_loads"] += 1
+                else:
+                    catalog = compile_catalog(src, sources)
+                    self._stats["builds"] += 1
+                    try:
+                        write_bundle(catalog, self.bundle)
+                    except OSError:
+                        pass  # diretório só leitura: segue com o catálogo em memória
+                self._catalog = catalog
+            self._signature = sig
+            return self._catalog
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+@cached_resource(show_spinner=False)
+def policy_catalog_store() -> PolicyCatalogStore:
+    """Store único por processo (sobrevive a reruns do Streamlit)."""
+    return PolicyCatalogStore()
+
+def load_policy_catalog() -> Optional[PolicyCatalog]:
+    """Catálogo atual (recompilado automaticamente quando as planilhas mudam)."""
+    return policy_catalog_store().get()
@@ -0,0 +1,95 @@
+# app/data_access/profile_cache.py
+from __future__ import annotations
+import copy
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+
+Loader = Callable[[int], Optional[Tuple[Dict[str, Any], str]]]
+Stamp = Callable[[int], Optional[str]]
+
+class ProfileCache:
+    """
+    Cache LRU (read-through) de perfis por id, validado por updated_at.
+    - Todo acerto confere o updated_at (busca pela PK) e recarrega se mudou.
+    - revalidate_after_s > 0 (opt-in) serve entradas mais novas que isso sem conferir:
+      gravações de outros processos podem ficar invisíveis por até esse tempo.
+    - Gravações deste processo chamam invalidate(); o carimbo cobre as de outros processos.
+    - Cada invalidate() avança a geração do id: uma carga iniciada antes dele não é gravada.
+    Devolve sempre uma cópia: quem chama pode alterar o perfil à vontade.
+    """
+
+    def __init__(self, maxsize: int = 256, revalidate_after_s: float = 0.0):
+        self.maxsize = max(1, int(maxsize))
+        self.revalidate_after_s = float(revalidate_after_s)
+        self._items: "OrderedDict[int, Tuple[Dict[str, Any], str, float]]" = OrderedDict()
+        self._lock = Lock()
+        self._epoch = 0                      # avança no invalidate() sem argumento
+        self._generations: Dict[int, int] = {}
+        self._stats = {"hits": 0, "misses": 0, "revalidations": 0, "stale": 0,
+                       "invalidations": 0, "evictions": 0}
+
+    def get(self, profile_id: Any, load: Loader, stamp: Stamp) -> Dict[str, Any]:
+        pid = int(profile_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._items.get(pid)
+            if entry is not None:
+                self._items.move_to_end(pid)
+            generation = self._generation(pid)
+        if entry is not None:
+            profile, updated_at, checked = entry
+            if now - checked < self.revalidate_after_s:
+                self._bump("hits")
+                return copy.deepcopy(profile)
+            self._bump("revalidations")
+            if stamp(pid) == updated_at:
+                with self._lock:
+                    if self._items.get(pid) is entry and self._generation(pid) == generation:
+                        self._items[pid] = (profile, updated_at, now)
+                self._bump("hits")
+                return copy.deepcopy(profile)
+            self._bump("stale")
+
+        self._bump("misses")
+        loaded = load(pid)
+        if loaded is None:
+            self.invalidate(pid)
+            return {}
+        profile, updated_at = loaded
+        with self._lock:
+            if self._generation(pid) != generation:
+                # invalidate() durante a carga: o que foi lido pode ser anterior à gravação
+                return copy.deepcopy(profile)
+            self._items[pid] = (profile, updated_at, now)
+            self._items.move_to_end(pid)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self._stats["evictions"] += 1
+        return copy.deepcopy(profile)
+
+    def invalidate(self, profile_id: Any = None) -> None:
+        """Remove um perfil (ou tudo, sem argumento)."""
+        with self._lock:
+            if profile_id is None:
+                self._items.clear()
+                self._generations.clear()
+                self._epoch += 1
+            else:
+                pid = int(profile_id)
+                self._items.pop(pid, None)
+                self._generations[pid] = self._generations.get(pid, 0) + 1
+            self._stats["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "size": len(self._items), "maxsize": self.maxsize}
+
+    def _generation(self, pid: int) -> Tuple[int, int]:
+        # chamar com o lock
+        return self._epoch, self._generations.get(pid, 0)
+
+    def _bump(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
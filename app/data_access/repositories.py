@@ -1,8 +1,11 @@
 from __future__ import annotations
-from typing import Any, Dict, Iterable, Optional
+from typing import Any, Dict, Iterable, List, Optional
 import os
 import pandas as pd
 
+from app.data_access.dtypes import apply_dtypes
+from app.data_access.profile_cache import ProfileCache
+from app.data_access.shared_tables import shared_frame
 from app.data_access.storage import read_excel, read_csv, read_geojson, read_json, resolve, ensure_dirs
 from app.utils.config import paths
 
@@ -20,12 +23,21 @@ def boot_migrations() -> None:
         # opcional: definir um default aqui se quiser centralizar
         # os.environ["DB_PATH"] = str(resolve("pp_platform.db"))
         pass
-    DB.init_db()
-    DB.migrate_db()
-    DB.migrate_accounts()
-    DB.migrate_analytics()
+    # Versionado por PRAGMA user_version: com o esquema em dia é só uma leitura de pragma
+    DB.run_migrations()
+
+def db_pool_stats() -> Dict[str, Any]:
+    """Estatísticas do pool de conexões (abertas, reutilizadas, esperas, ociosas...)."""
+    return DB.pool_stats()
 
 # ------------- Autenticação -------------
+# O hash de senha roda num executor limitado; com a fila cheia, login/cadastro
+# levantam AuthBusyError na hora (a página mostra "tente de novo").
+# AuthBusyError vem do db.py: resolvida no primeiro acesso (ver __getattr__ no fim).
+
+def auth_hash_stats() -> Dict[str, Any]:
+    """Estatísticas do executor de hash de senha (enviados, recusados, timeouts)."""
+    return DB.auth_hash_stats()
 
 def create_person_account(display_name: str, username: str, password: str) -> Dict[str, Any]:
     return DB.create_person_account(display_name, username, password)
@@ -41,17 +53,37 @@ def authenticate_collective(cnpj: str, password: str) -> Optional[Dict[str, Any]
 
 # ------------- Perfis -------------
 
+# Cache de perfis do processo (compartilhado entre sessões do Streamlit)
+_PROFILE_CACHE = ProfileCache(
+    maxsize=int(os.environ.get("PROFILE_CACHE_SIZE") or 256),
+    revalidate_after_s=float(os.environ.get("PROFILE_CACHE_REVALIDATE_S") or 0),
+)
+
 def save_profile_for_account(owner_account_id: int, profile: Dict[str, Any]) -> int:
-    return DB.save_profile_for_account(owner_account_id, profile)
+    pid = DB.save_profile_for_account(owner_account_id, profile)
+    _PROFILE_CACHE.invalidate(pid)
+    return pid
 
 def update_profile_for_account(profile_id: int, owner_account_id: int, profile: Dict[str, Any]) -> bool:
-    return DB.update_profile_for_account(profile_id, owner_account_id, profile)
+    try:
+        return DB.update_profile_for_account(profile_id, owner_account_id, profile)
+    finally:
+        _PROFILE_CACHE.invalidate(profile_id)
 
 def get_profiles_by_account(owner_account_id: int) -> Iterable[Iterable[Any]]:
     return DB.get_profiles_by_account(owner_account_id)
 
 def load_profile(profile_id: int) -> Dict[str, Any]:
-    return DB.load_profile(profile_id)
+    """Perfil por id, via cache LRU validado por updated_at (reruns não relêem o JSON)."""
+    try:
+        pid = int(profile_id)
+    except (TypeError, ValueError):
+        return DB.load_profile(profile_id)
+    return _PROFILE_CACHE.get(pid, DB.load_profile_entry, DB.profile_updated_at)
+
+def profile_cache_stats() -> Dict[str, Any]:
+    """Contadores do cache de perfis (hits, misses, revalidations, evictions...)."""
+    return _PROFILE_CACHE.stats()
 
 # ------------- Analytics / Observatório -------------
 
@@ -65,6 +97,10 @@ def log_event(**kwargs) -> None:
     """
     DB.log_event(**kwargs)
 
+def flush_analytics(timeout: Optional[float] = None) -> bool:
+    """Grava eventos pendentes quando ANALYTICS_BUFFERED está ligado."""
+    return DB.flush_analytics(timeout)
+
 def get_analytics(start_iso: Optional[str] = None,
                   end_iso: Optional[str] = None,
                   uf: Optional[str] = None,
@@ -72,7 +108,41 @@ def get_analytics(start_iso: Optional[str] = None,
                   gender: Optional[str] = None) -> Iterable[Dict[str, Any]]:
     return DB.get_analytics(start_iso=start_iso, end_iso=end_iso, uf=uf, municipio=municipio, gender=gender)
 
+def iter_analytics(start_iso: Optional[str] = None,
+                   end_iso: Optional[str] = None,
+                   uf: Optional[str] = None,
+                   municipio: Optional[str] = None,
+                   gender: Optional[str] = None,
+                   batch_size: int = 5_000) -> Iterable[List[Dict[str, Any]]]:
+    """Lotes de eventos (memória constante) para exportações/agregações em streaming."""
+    return DB.iter_analytics(start_iso=start_iso, end_iso=end_iso, uf=uf, municipio=municipio,
+                             gender=gender, batch_size=batch_size)
+
+def get_analytics_frame(start_iso: Optional[str] = None,
+                        end_iso: Optional[str] = None,
+                        uf: Optional[str] = None,
+                        municipio: Optional[str] = None,
+                        gender: Optional[str] = None,
+                        with_requirements: bool = False) -> pd.DataFrame:
+    """Eventos como DataFrame tipado (ts datetime, kind/uf/gender categóricos, query string)."""
+    return apply_dtypes(DB.get_analytics_frame(start_iso=start_iso, end_iso=end_iso, uf=uf, municipio=municipio,
+                                               gender=gender, with_requirements=with_requirements))
+
+def get_analytics_aggregate(metric: str,
+                            group_by: Optional[Iterable[str]] = None,
+                            filters: Optional[Dict[str, Any]] = None,
+                            top_n: Optional[int] = 10) -> Dict[str, Any]:
+    """
+    Ranking + pesos por UF/município calculados no banco.
+      get_analytics_aggregate("views", ["policy"], {"uf": "PA"}, top_n=10)
+      get_analytics_aggregate("missing", ["uf", "municipio", "requirement"])
+    """
+    return DB.get_analytics_aggregate(metric, group_by=list(group_by or []), filters=filters or {}, top_n=top_n)
+
 # ------------- Dados de Catálogo (arquivos) -------------
+# Frames saem com a política de dtypes de app.data_access.dtypes (UF/nível/esfera
+# categóricos, códigos IBGE Int32, texto em string pyarrow). Sem path explícito, UCs e
+# defesos vêm das tabelas mapeadas compartilhadas (app.data_access.shared_tables).
 
 def load_policies_table(xlsx_path: Optional[str] = None) -> pd.DataFrame:
     """
@@ -97,23 +167,31 @@ def load_policies_table(xlsx_path: Optional[str] = None) -> pd.DataFrame:
         return df
     df.columns = [c.strip() for c in df.columns]
     keep = [c for c in cols if c in df.columns]
-    return df[keep].copy()
+    return apply_dtypes(df[keep])
 
 def load_defesos_csv(path: Optional[str] = None) -> pd.DataFrame:
     """
     Esperado: colunas ['especie','nome_popular','arte_pesca','uf','inicio','fim','fundamento_legal','esfera','link_oficial']
     """
+    if path is None:
+        shared = shared_frame("defesos")
+        if shared is not None:
+            return shared
     P = paths()
     _path = path or P.get("DEFESOS_CSV", "data/processed/defesos.csv")
-    return read_csv(_path, dtype=str)
+    return apply_dtypes(read_csv(_path, dtype=str))
 
 def load_ucs_csv(path: Optional[str] = None) -> pd.DataFrame:
     """
     Esperado: ['nome','categoria','esfera','uf','area_ha','link']
     """
+    if path is None:
+        shared = shared_frame("ucs")
+        if shared is not None:
+            return shared
     P = paths()
     _path = path or P.get("UCS_CSV", "data/processed/ucs.csv")
-    return read_csv(_path)
+    return apply_dtypes(read_csv(_path))
 
 def load_ucs_geojson(path: Optional[str] = None) -> dict:
     P = paths()
@@ -128,4 +206,10 @@ def load_profile_schema(path: Optional[str] = None) -> dict:
 def load_keyword_map(path: Optional[str] = None) -> dict:
     P = paths()
     _path = path or P.get("KEYWORD_MAP", "data/docs/keyword_map.json")
-    return read_json(_path)
\ No newline at end of file
+    return read_json(_path)
+
+def __getattr__(name: str) -> Any:
+    # Nomes do banco resolvidos sob demanda: importar este módulo não carrega o db.py
+    if name == "AuthBusyError":
+        return DB.AuthBusyError
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,226 @@
+# app/data_access/shared_tables.py
+from __future__ import annotations
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+
+from app.data_access.dtypes import apply_dtypes
+from app.data_access.manifest import known_sha256
+from app.data_access.storage import processed_dir, resolve
+from app.utils.cache import cached_resource
+from app.utils.config import paths
+
+# Tabelas de referência imutáveis (municípios, UFs, UCs, defesos, políticas) publicadas
+# uma vez como Arrow IPC (data/processed/shared/<nome>-<versão>.arrow) e abertas por
+# memory-map em cada processo do Streamlit: os buffers (texto incluso) apontam para o
+# arquivo mapeado, então o page cache do SO é compartilhado entre os workers em vez de
+# cada um ter a sua cópia. A versão vem do sha256 do manifesto da ETL (ou de
+# tamanho/mtime da fonte sem manifesto): um build novo gera outro arquivo e os processos
+# trocam de versão no próximo acesso. Os frames devolvidos são compartilhados: não altere.
+
+SHARED_FORMAT = 1
+SHARED_SUFFIX = ".arrow"
+
+@dataclass(frozen=True)
+class TableSpec:
+    name: str
+    path_key: str                              # chave de app.utils.config.paths()
+    reader: Callable[[Path], pd.DataFrame]     # fonte → frame já tipado
+
+# -------------------- Leitores das fontes --------------------
+
+POLICIES_MASTER_COLUMNS = [
+    "policy_id", "nome", "nivel", "tipo_beneficio", "responsavel",
+    "descricao", "criterios", "legislacao_titulo", "legislacao_url",
+    "info_url", "phone", "email", "contact_site", "financas_resumo", "subprogramas", "como_acessar",
+]
+
+def read_policies_master(p: Path) -> pd.DataFrame:
+    """policies_master.csv com as colunas esperadas pela página de políticas, ordenado."""
+    df = pd.read_csv(p, dtype=str).fillna("")
+    for c in POLICIES_MASTER_COLUMNS:
+        if c not in df.columns:
+            df[c] = ""
+    df = df.sort_values(["nivel", "responsavel", "nome", "policy_id"])
+    return apply_dtypes(df[POLICIES_MASTER_COLUMNS].reset_index(drop=True))
+
+def _read_geo_ufs(p: Path) -> pd.DataFrame:
+    return apply_dtypes(pd.read_csv(p, dtype={"ibge_uf": str}))
+
+def _read_geo_municipios(p: Path) -> pd.DataFrame:
+    return apply_dtypes(pd.read_csv(p, dtype={"ibge_mun": str}))
+
+def _read_ucs(p: Path) -> pd.DataFrame:
+    return apply_dtypes(pd.read_csv(p))
+
+def _read_defesos(p: Path) -> pd.DataFrame:
+    return apply_dtypes(pd.read_csv(p, dtype=str))
+
+TABLES: Dict[str, TableSpec] = {s.name: s for s in (
+    TableSpec("geo_ufs", "GEO_UFS", _read_geo_ufs),
+    TableSpec("geo_municipios", "GEO_MUN", _read_geo_municipios),
+    TableSpec("ucs", "UCS_CSV", _read_ucs),
+    TableSpec("defesos", "DEFESOS_CSV", _read_defesos),
+    TableSpec("policies_master", "POLICIES_MASTER_CSV", read_policies_master),
+)}
+
+# -------------------- Publicação (ETL) --------------------
+
+def shared_dir() -> Path:
+    env = os.environ.get("SHARED_TABLES_DIR")
+    return Path(env) if env else processed_dir() / "shared"
+
+def _enabled() -> bool:
+    return os.environ.get("SHARED_TABLES", "1").strip().lower() not in ("0", "false", "no", "off")
+
+def source_path(name: str) -> Path:
+    return resolve(paths()[TABLES[name].path_key])
+
+def table_version(src: Path) -> str:
+    """Versão da fonte: sha256 do manifesto se o arquivo não mudou; senão tamanho/mtime."""
+    digest = known_sha256(src)
+    if digest is None:
+        st = src.stat()
+        digest = hashlib.sha256(f"{src.resolve()}|{st.st_size}|{st.st_mtime_ns}".encode()).hexdigest()
+    return digest[:16]
+
+def table_file(name: str, version: str, out_dir: Optional[Path] = None) -> Path:
+    return Path(out_dir or shared_dir()) / f"{name}-{version}{SHARED_SUFFIX}"
+
+def _write_ipc(df: pd.DataFrame, out: Path, meta: Dict[str, str]) -> None:
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                           **{f"matupiri.{k}".encode(): v.encode() for k, v in meta.items()}})
+    out.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{out.name}", dir=out.parent)
+    try:
+        # sem compressão: o arquivo precisa ser mapeável sem decodificar
+        with os.fdopen(fd, "wb") as f, pa.ipc.new_file(f, table.schema) as writer:
+            writer.write_table(table)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, out)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+def _prune(name: str, keep: Path) -> None:
+    # processos com a versão antiga mapeada continuam lendo (o inode só some no munmap)
+    for old in keep.parent.glob(f"{name}-*{SHARED_SUFFIX}"):
+        if old != keep:
+            old.unlink(missing_ok=True)
+
+def publish_table(name: str, out_dir: Optional[Path] = None, force: bool = False) -> Optional[Path]:
+    """Publica a tabela na versão atual da fonte (no-op se já publicada). None sem fonte."""
+    src = source_path(name)
+    if not src.exists():
+        return None
+    version = table_version(src)
+    out = table_file(name, version, out_dir)
+    if force or not out.exists():
+        df = TABLES[name].reader(src)
+        _write_ipc(df, out, {"format": str(SHARED_FORMAT), "table": name, "version": version,
+                             "source": str(src)})
+    _prune(name, out)
+    return out
+
+def publish_all(out_dir: Optional[Path] = None, force: bool = False) -> Dict[str, Optional[Path]]:
+    return {name: publish_table(name, out_dir, force) for name in TABLES}
+
+# -------------------- Acesso pelo app --------------------
+
+def _map_ipc(path: Path) -> Tuple[Any, pd.DataFrame]:
+    import pyarrow as pa
+
+    table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+    # split_blocks evita consolidar colunas em blocos novos (o que copiaria os buffers)
+    return table, table.to_pandas(split_blocks=True)
+
+class SharedTableStore:
+    """
+    Tabelas mapeadas do processo. A cada acesso compara tamanho/mtime da fonte (stat,
+    barato); mudou → abre (ou publica) o arquivo da nova versão.
+    """
+
+    def __init__(self, out_dir: Optional[Path] = None):
+        self.out_dir = out_dir
+        self._lock = Lock()
+        self._open: Dict[str, Tuple[Tuple[int, int], str, Any, pd.DataFrame]] = {}
+        self._stats = {"hits": 0, "maps": 0, "publishes": 0, "fallbacks": 0}
+
+    def _entry(self, name: str) -> Optional[Tuple[Any, pd.DataFrame]]:
+        src = source_path(name)
+        try:
+            st = src.stat()
+        except OSError:
+            return None
+        sig = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            hit = self._open.get(name)
+            if hit and hit[0] == sig:
+                self._stats["hits"] += 1
+                return hit[2], hit[3]
+            version = table_version(src)
+            if hit and hit[1] == version:
+                self._open[name] = (sig, *hit[1:])
+                self._stats["hits"] += 1
+                return hit[2], hit[3]
+            path = table_file(name, version, self.out_dir)
+            try:
+                if not path.exists():
+                    publish_table(name, self.out_dir)
+                    self._stats["publishes"] += 1
+                table, df = _map_ipc(path)
+                self._stats["maps"] += 1
+            except (OSError, ImportError):
+                # sem pyarrow ou diretório só leitura: frame privado do processo
+                table, df = None, TABLES[name].reader(src)
+                self._stats["fallbacks"] += 1
+            self._open[name] = (sig, version, table, df)
+            return table, df
+
+    def frame(self, name: str) -> Optional[pd.DataFrame]:
+        entry = self._entry(name)
+        # cópia rasa: colunas novas no resultado não alteram o frame compartilhado
+        return None if entry is None else entry[1].copy(deep=False)
+
+    def table(self, name: str) -> Any:
+        """pyarrow.Table mapeada (None sem fonte ou sem pyarrow)."""
+        entry = self._entry(name)
+        return None if entry is None else entry[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["tables"] = {name: {"version": v, "mapped_bytes": t.nbytes if t is not None else 0}
+                             for name, (_, v, t, _) in self._open.items()}
+            return out
+
+@cached_resource(show_spinner=False)
+def shared_table_store() -> SharedTableStore:
+    """Store único por processo (sobrevive a reruns do Streamlit)."""
+    return SharedTableStore()
+
+def shared_frame(name: str) -> Optional[pd.DataFrame]:
+    """
+    Tabela de referência `name` (ver TABLES) como DataFrame sobre o arquivo mapeado.
+    None se a fonte não existe. Com SHARED_TABLES=0 lê a fonte direto (sem compartilhar).
+    """
+    if not _enabled():
+        src = source_path(name)
+        return TABLES[name].reader(src) if src.exists() else None
+    return shared_table_store().frame(name)
+
+def shared_table(name: str) -> Any:
+    """Mesma tabela como pyarrow.Table (zero-cópia), para quem consome Arrow direto."""
+    return shared_table_store().table(name) if _enabled() else None
+
+__all__ = ["SharedTableStore", "TABLES", "TableSpec", "publish_all", "publish_table", "read_policies_master",
+           "shared_dir", "shared_frame", "shared_table", "shared_table_store", "table_version"]
@@ -1,8 +1,11 @@
 from __future__ import annotations
 from pathlib import Path
-from typing import Any, Iterable, Optional
+from threading import Lock
+from typing import Any, Dict, Iterable, List, Optional
+import argparse
 import json
 import os
+import tempfile
 
 import pandas as pd
 
@@ -29,18 +32,24 @@ def ensure_dirs() -> None:
 
 def resolve(path_or_env: str) -> Path:
     """
-    Aceita um path literal ou o nome de uma env var. Se existir arquivo relativo ao projeto, usa.
-    Caso contrário, tenta em data/processed e data/.
+    Aceita um path literal ou o nome de uma env var. Datasets do manifesto resolvem direto
+    (se o arquivo ainda existe); senão, se existir arquivo relativo ao projeto, usa. Caso contrário, tenta em data/processed e data/.
     """
     # 1) Se for env var
     if path_or_env.isupper() and path_or_env in os.environ:
         return Path(os.environ[path_or_env]).resolve()
 
     p = Path(path_or_env)
+    # 2) Manifesto da ETL (data/processed/manifest.json): sem sondar diretórios
+    if not p.is_absolute():
+        from app.data_access.manifest import resolve_path
+        hit = resolve_path(path_or_env)
+        if hit is not None and hit.exists():   # entrada velha: segue para a sondagem
+            return hit
     if p.exists():
         return p.resolve()
 
-    # 2) Tenta em processed/ e data/
+    # 3) Tenta em processed/ e data/
     cand = [processed_dir() / path_or_env, data_dir() / path_or_env, project_root() / path_or_env]
     for c in cand:
         if c.exists():
@@ -53,8 +62,14 @@ def read_excel(path: str, sheet: int | str = 0, usecols: Optional[Iterable[str]]
     p = resolve(path)
     if not p.exists():
         return pd.DataFrame()
+    if _sidecar_enabled():
+        df = _read_sidecar(p, sheet, usecols)
+        if df is not None:
+            return df
     df = pd.read_excel(p, sheet_name=sheet)
     df.columns = [str(c).strip() for c in df.columns]
+    if _sidecar_enabled():
+        _write_sidecar(p, sheet, df)
     if usecols:
         keep = [c for c in usecols if c in df.columns]
         return df[keep].copy()
@@ -87,4 +102,140 @@ def write_json(obj: Any, path: str) -> Path:
     p = resolve(path)
     p.parent.mkdir(parents=True, exist_ok=True)
     p.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
-    return p
\ No newline at end of file
+    return p
+
+# -------------------- Sidecar colunar das planilhas --------------------
+# Na primeira leitura de um .xlsx gravamos a aba em Feather ao lado do arquivo
+# (.<nome>.xlsx.<aba>.feather), com caminho/mtime/tamanho/aba nos metadados.
+# As leituras seguintes mapeiam o Feather em memória e leem só as colunas pedidas.
+# Sidecar desatualizado (xlsx mudou) é regravado; pasta sem escrita = sem sidecar.
+# Desligue com EXCEL_SIDECAR=0.
+
+_SIDECAR_SUFFIX = ".feather"
+_SIDECAR_LOCK = Lock()
+_SIDECAR_STATS: Dict[str, int] = {"hits": 0, "misses": 0, "stale": 0, "writes": 0, "skipped": 0}
+
+def _sidecar_enabled() -> bool:
+    return os.environ.get("EXCEL_SIDECAR", "1").strip().lower() not in ("0", "false", "no", "off")
+
+def sidecar_path(p: Path, sheet: int | str = 0) -> Path:
+    tag = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in str(sheet))
+    return p.with_name(f".{p.name}.{tag}{_SIDECAR_SUFFIX}")
+
+def _source_key(p: Path, sheet: int | str) -> Dict[bytes, bytes]:
+    st = p.stat()
+    return {b"matupiri.source": str(p.resolve()).encode(),
+            b"matupiri.mtime_ns": str(st.st_mtime_ns).encode(),
+            b"matupiri.size": str(st.st_size).encode(),
+            b"matupiri.sheet": repr(sheet).encode()}
+
+def _count(key: str) -> None:
+    with _SIDECAR_LOCK:
+        _SIDECAR_STATS[key] += 1
+
+def _read_sidecar(p: Path, sheet: int | str, usecols: Optional[Iterable[str]]) -> Optional[pd.DataFrame]:
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    sc = sidecar_path(p, sheet)
+    if not sc.exists():
+        _count("misses")
+        return None
+    try:
+        with pa.memory_map(str(sc), "r") as source:
+            reader = pa.ipc.open_file(source)
+            meta = reader.schema.metadata or {}
+            if any(meta.get(k) != v for k, v in _source_key(p, sheet).items()):
+                _count("stale")
+                return None
+            names = reader.schema.names
+            json_cols = json.loads(meta.get(b"matupiri.json_columns", b"[]"))
+        cols = [c for c in usecols if c in names] if usecols else None
+        table = feather.read_table(str(sc), columns=cols, memory_map=True)
+    except (OSError, pa.ArrowException):
+        _count("misses")
+        return None
+    df = table.to_pandas()
+    # nulos de colunas texto voltam como NaN, igual ao pd.read_excel
+    for c in df.columns[df.dtypes == object]:
+        df[c] = df[c].where(df[c].notna(), np.nan)
+    for c in json_cols:
+        if c in df.columns:
+            df[c] = pd.Series([json.loads(v) for v in df[c]], index=df.index, dtype=object)
+    _count("hits")
+    return df
+
+def _write_sidecar(p: Path, sheet: int | str, df: pd.DataFrame) -> None:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    # colunas com tipos mistos (ex.: 1500 e "a confirmar") vão como JSON por célula
+    mixed: List[str] = []
+    for c in df.columns[df.dtypes == object]:
+        try:
+            pa.array(df[c], from_pandas=True)
+        except (pa.ArrowException, TypeError, ValueError):
+            mixed.append(c)
+    if any(not all(isinstance(v, (str, int, float, bool)) or v is None for v in df[c]) for c in mixed):
+        _count("skipped")  # tipo sem equivalente em JSON: fica só no Excel
+        return
+    out = df.copy() if mixed else df
+    for c in mixed:
+        out[c] = [json.dumps(v) for v in out[c]]
+    try:
+        table = pa.Table.from_pandas(out, preserve_index=False)
+    except (pa.ArrowException, TypeError, ValueError):
+        _count("skipped")
+        return
+    meta = {**(table.schema.metadata or {}), **_source_key(p, sheet),
+            b"matupiri.json_columns": json.dumps(mixed).encode()}
+    table = table.replace_schema_metadata(meta)
+    sc = sidecar_path(p, sheet)
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=sc.name, dir=sc.parent)
+        os.close(fd)
+        try:
+            feather.write_feather(table, tmp, compression="uncompressed")  # mapeável sem descompressão
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, sc)
+        finally:
+            Path(tmp).unlink(missing_ok=True)
+    except OSError:
+        _count("skipped")
+        return
+    _count("writes")
+
+def sidecar_stats() -> Dict[str, int]:
+    """Contadores do sidecar (hits, misses, stale, writes, skipped) deste processo."""
+    with _SIDECAR_LOCK:
+        return dict(_SIDECAR_STATS)
+
+def list_sidecars(root: Optional[Path] = None) -> List[Path]:
+    base = Path(root) if root else data_dir()
+    return sorted(base.rglob(f".*.xlsx.*{_SIDECAR_SUFFIX}"))
+
+def clear_sidecars(root: Optional[Path] = None) -> int:
+    """Apaga os sidecars sob `root` (padrão: data/). Retorna quantos."""
+    removed = 0
+    for sc in list_sidecars(root):
+        sc.unlink(missing_ok=True)
+        removed += 1
+    return removed
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m app.data_access.storage",
+                                 description="Sidecars Feather das planilhas (.xlsx)")
+    ap.add_argument("command", choices=["list", "clear"])
+    ap.add_argument("root", nargs="?", default=None, help="pasta (padrão: data/)")
+    args = ap.parse_args(argv)
+    root = Path(args.root) if args.root else None
+    if args.command == "list":
+        for sc in list_sidecars(root):
+            print(sc)
+    else:
+        print(f"{clear_sidecars(root)} sidecar(s) removido(s)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -15,22 +15,13 @@ except Exception:
     def header_nav(title, subtitle=""): st.title(title); st.caption(subtitle)
     def footer(): st.caption("")
 
-@st.cache_data(show_spinner=False)
+from app.data_access.shared_tables import shared_frame
+
 def load_master() -> pd.DataFrame:
-    csv = ROOT / "data" / "processed" / "policies_master.csv"
-    if not csv.exists():
-        return pd.DataFrame()
-    df = pd.read_csv(csv, dtype=str).fillna("")
-    needed = ["policy_id","nome","nivel","tipo_beneficio","responsavel",
-              "descricao","criterios","legislacao_titulo","legislacao_url",
-              "info_url","phone","email","contact_site","financas_resumo","subprogramas","como_acessar"]
-    for c in needed:
-        if c not in df.columns: df[c] = ""
-    # Garante níveis esperados
-    df["nivel"] = df["nivel"].where(df["nivel"].isin(["Nacional","Estadual","Regional"]), df["nivel"])
-    # Ordenação padrão agradável
-    df = df.sort_values(["nivel","responsavel","nome","policy_id"])
-    return df[needed]
+    # Tabela mapeada de data/processed/shared: uma cópia no page cache para todos os
+    # processos, trocada quando a ETL gera uma versão nova do policies_master.csv
+    df = shared_frame("policies_master")
+    return pd.DataFrame() if df is None else df
 
 # ---- estilo leve (sem HTML cru nos cards) ----
 st.markdown("""
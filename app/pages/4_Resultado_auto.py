@@ -1,6 +1,6 @@
 from __future__ import annotations
+import copy
 import json
-import re
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
@@ -27,7 +27,7 @@ DEBUG = st.toggle("🔎 Debug", value=False, help="Exibe estados para diagnósti
 # Integrações tolerantes (opcional; não exige login)
 # ===============================================================
 try:
-    from db import (get_profiles_by_account, load_profile)
+    from app.data_access.repositories import get_profiles_by_account, load_profile
 except Exception:
     def get_profiles_by_account(account_id: str) -> List[Dict[str, Any]]: return []
     def load_profile(profile_id: str) -> Dict[str, Any]: return {}
@@ -35,6 +35,8 @@ except Exception:
 # ===============================================================
 # IO helpers
 # ===============================================================
+from app.data_access.manifest import load_manifest
+
 def _normalize(df: Optional[pd.DataFrame]) -> pd.DataFrame:
     if df is None:
         return pd.DataFrame()
@@ -42,18 +44,18 @@ def _normalize(df: Optional[pd.DataFrame]) -> pd.DataFrame:
     df.columns = [str(c).strip() for c in df.columns]
     return df
 
-def _read_excel_if_exists(p: Path) -> Optional[pd.DataFrame]:
-    if p.exists():
-        try:
-            return pd.read_excel(p)
-        except Exception as e:
-            st.warning(f"Falha ao ler {p.name}: {e}")
-    return None
-
 def _load_first_available(rel_or_patterns: List[str]) -> Optional[pd.DataFrame]:
     exts = (".csv", ".parquet", ".json", ".xlsx")
     cand: List[Path] = []
+    manifest = load_manifest()
     for rel in rel_or_patterns:
+        if manifest is not None:
+            # manifesto da ETL: candidatos por busca em dicionário, sem glob(); nomes fora
+            # do manifesto (arquivo novo, raw/, interim/) ou entradas velhas caem na sondagem
+            hits = [p for p in (manifest.path_of(e) for e in manifest.find([rel], exts)) if p.exists()]
+            if hits:
+                cand.extend(hits)
+                continue
         base = DATA_DIR / rel
         for ext in exts:
             cand.append(base.with_suffix(ext))
@@ -75,161 +77,26 @@ def _load_first_available(rel_or_patterns: List[str]) -> Optional[pd.DataFrame]:
     return None
 
 # ===============================================================
-# Carregamento preferencial RAW (e estruturas auxiliares)
+# Catálogo pré-compilado (planilhas de data/raw/policies_source ou data/processed)
 # ===============================================================
-# guardaremos os documentos exigidos para checagem de presença
-docs_by_policy: Dict[Any, List[Tuple[str, bool]]] = {}
-
-def load_from_raw_source() -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    global docs_by_policy
-
-    df_policies      = _normalize(_read_excel_if_exists(RAW_DIR / "policies.xlsx"))
-    df_requirements  = _normalize(_read_excel_if_exists(RAW_DIR / "policy_requirements.xlsx"))
-    df_contacts      = _normalize(_read_excel_if_exists(RAW_DIR / "policy_contacts.xlsx"))
-    df_docs          = _normalize(_read_excel_if_exists(RAW_DIR / "policy_documents.xlsx"))
-    df_fin           = _normalize(_read_excel_if_exists(RAW_DIR / "policy_financial_params.xlsx"))
-    df_regions       = _normalize(_read_excel_if_exists(RAW_DIR / "policy_regions.xlsx"))
-    df_regs_all      = _normalize(_read_excel_if_exists(RAW_DIR / "policy_regulations_all.xlsx"))
-    df_subprograms   = _normalize(_read_excel_if_exists(RAW_DIR / "policy_subprograms.xlsx"))
-    df_reqs_contacts = _normalize(_read_excel_if_exists(RAW_DIR / "policy_requirements_contacts.xlsx"))
-
-    if df_policies.empty:
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-
-    # ----- Policies -----
-    low = {c.lower(): c for c in df_policies.columns}
-    rename = {}
-    for a, b in [
-        ("name","policy_name"), ("nome","policy_name"), ("titulo","policy_name"), ("título","policy_name"),
-        ("description","description"), ("descricao","description"), ("descrição","description"), ("resumo","description"),
-    ]:
-        if a in low: rename[low[a]] = b
-    if "policy_id" not in low and "id" in low:
-        rename[low["id"]] = "policy_id"
-    policies_df = df_policies.rename(columns=rename).copy()
-    if "policy_id" not in policies_df.columns:
-        policies_df["policy_id"] = range(1, len(policies_df) + 1)
-    if "policy_name" not in policies_df.columns:
-        raise ValueError("policies.xlsx precisa ter 'policy_name' (ou Nome/Título).")
-
-    # ----- Requirements -----
-    reqs_df = pd.DataFrame(columns=["policy_id","attribute","operator","value","mandatory_flag"])
-    if not df_requirements.empty:
-        low = {c.lower(): c for c in df_requirements.columns}
-        colmap = {
-            low.get("policy_id","policy_id"): "policy_id",
-            low.get("attribute","attribute"): "attribute",
-            low.get("operator","operator"): "operator",
-            low.get("value","value"): "value",
-        }
-        reqs_df = df_requirements.rename(columns=colmap)
-        if "mandatory_flag" not in reqs_df.columns:
-            for cand in ["mandatory_flag","obrigatorio","obrigatório","required"]:
-                if cand in low:
-                    reqs_df["mandatory_flag"] = df_requirements[low[cand]]
-                    break
-            else:
-                reqs_df["mandatory_flag"] = True
-        reqs_df["mandatory_flag"] = reqs_df["mandatory_flag"].astype(str).str.lower().isin(["1","true","sim","yes"])
-
-    # ----- Contacts (contacts + requirements_contacts) -----
-    contacts_df = pd.DataFrame(columns=["policy_id","org_name","phone","email","url","notes"])
-    if not df_contacts.empty:
-        low = {c.lower(): c for c in df_contacts.columns}
-        colmap = {}
-        for src, dst in [
-            ("policy_id","policy_id"),
-            ("org_name","org_name"), ("organization","org_name"), ("org","org_name"),
-            ("phone","phone"), ("telefone","phone"), ("contato","phone"),
-            ("email","email"),
-            ("url","url"), ("site","url"),
-            ("notes","notes"), ("obs","notes"),
-        ]:
-            if src in low: colmap[low[src]] = dst
-        contacts_df = df_contacts.rename(columns=colmap)
-    if not df_reqs_contacts.empty:
-        low = {c.lower(): c for c in df_reqs_contacts.columns}
-        colmap = {}
-        for src, dst in [
-            ("policy_id","policy_id"),
-            ("org_name","org_name"), ("organization","org_name"), ("org","org_name"),
-            ("phone","phone"), ("telefone","phone"), ("contato","phone"),
-            ("email","email"),
-            ("url","url"), ("site","url"),
-            ("notes","notes"), ("obs","notes"),
-        ]:
-            if src in low: colmap[low[src]] = dst
-        extra = df_reqs_contacts.rename(columns=colmap)
-        contacts_df = pd.concat([contacts_df, extra], ignore_index=True).drop_duplicates()
-
-    # ----- Info agregada + DOCS obrigatórios -----
-    info_rows: List[Tuple[Any, str, str]] = []
-    docs_by_policy = {}
-
-    if not df_docs.empty:
-        low = {c.lower(): c for c in df_docs.columns}
-        k_doc = low.get("doc_name") or low.get("documento") or low.get("doc")
-        k_mand = low.get("mandatory_flag") or low.get("obrigatorio") or low.get("obrigatório") or low.get("required")
-
-        for _, r in df_docs.iterrows():
-            pid = r.get("policy_id")
-            dname = str(r.get(k_doc) or "").strip()
-            mand = bool(str(r.get(k_mand, "false")).strip().lower() in ["1","true","sim","yes"])
-            if dname:
-                # guarda para checagem de presença no perfil
-                docs_by_policy.setdefault(pid, []).append((dname, mand))
-                # e também adiciona nas informações importantes (só para leitura)
-                info_rows.append((pid, "Documento exigido", dname + (" (obrigatório)" if mand else "")))
-
-    if not df_fin.empty:
-        low = {c.lower(): c for c in df_fin.columns}
-        kcol = low.get("param_name") or low.get("param") or low.get("chave")
-        vcol = low.get("param_value") or low.get("valor") or low.get("value")
-        for _, r in df_fin.iterrows():
-            info_rows.append((r.get("policy_id"), str(r.get(kcol) or "Parâmetro financeiro"), str(r.get(vcol) or "")))
-
-    if not df_regions.empty:
-        grp = df_regions.groupby("policy_id")
-        for pid, g in grp:
-            nm = "region_name" if "region_name" in g.columns else ("uf" if "uf" in g.columns else None)
-            if nm:
-                regs = ", ".join(sorted({str(x) for x in g[nm] if pd.notna(x)}))
-                if regs:
-                    info_rows.append((pid, "Abrangência", regs))
-
-    if not df_regs_all.empty:
-        grp = df_regs_all.groupby("policy_id")
-        nm = "regulation" if "regulation" in df_regs_all.columns else ("lei" if "lei" in df_regs_all.columns else None)
-        for pid, g in grp:
-            bases = "; ".join([str(x) for x in (g[nm] if nm else []) if pd.notna(x)]) if nm else ""
-            if bases:
-                info_rows.append((pid, "Base legal", bases))
-
-    if not df_subprograms.empty:
-        grp = df_subprograms.groupby("policy_id")
-        nm = "subprogram_name" if "subprogram_name" in df_subprograms.columns else ("nome_subprograma" if "nome_subprograma" in df_subprograms.columns else None)
-        for pid, g in grp:
-            subs = ", ".join([str(x) for x in (g[nm] if nm else []) if pd.notna(x)]) if nm else ""
-            if subs:
-                info_rows.append((pid, "Subprogramas", subs))
-
-    info_df = pd.DataFrame(info_rows, columns=["policy_id","info_key","info_value"]) if info_rows else pd.DataFrame()
-    return policies_df, reqs_df, info_df, contacts_df
-
-def raw_source_available() -> bool:
-    return RAW_DIR.exists() and any(RAW_DIR.glob("*.xlsx"))
+# Compilado uma vez por versão das planilhas (etl.build_policy_catalog ou sob demanda)
+# e compartilhado entre sessões: nada de reler Excel a cada rerun.
+from app.data_access.policy_catalog import load_policy_catalog
+from app.services.requirement_rules import compiled_rules, dependency_index, parse_requirements, patch_results
 
-# ===============================================================
-# Carregamento (RAW primeiro; depois fallback)
-# ===============================================================
-if raw_source_available():
-    try:
-        policies_df, reqs_df, info_df, contacts_df = load_from_raw_source()
-    except Exception as e:
-        st.error(f"Falha ao ler data/raw/policies_source: {e}")
-        policies_df = None
-        reqs_df = info_df = contacts_df = None
+docs_by_policy: Dict[Any, List[Tuple[str, bool]]] = {}
+catalog = None
+try:
+    catalog = load_policy_catalog()
+except Exception as e:
+    st.error(f"Falha ao ler o catálogo de políticas: {e}")
+
+if catalog is not None and not catalog.policies_df.empty:
+    policies_df, reqs_df, info_df, contacts_df = (
+        catalog.policies_df, catalog.reqs_df, catalog.info_df, catalog.all_contacts_df)
+    docs_by_policy = catalog.docs_by_policy
 else:
+    catalog = None
     policies_df = None
 
 if policies_df is None or policies_df.empty:
@@ -307,10 +174,15 @@ if 'contacts_df' not in locals() or contacts_df is None:
         contacts_df = tmp
 contacts_df = _normalize(contacts_df) if not contacts_df.empty else contacts_df
 
-# índices auxiliares
-reqs_by_policy: Dict[Any, pd.DataFrame] = {pid: g for pid, g in reqs_df.groupby("policy_id")} if len(reqs_df) else {}
-info_by_policy: Dict[Any, pd.DataFrame] = {pid: g for pid, g in (info_df.groupby("policy_id") if not info_df.empty else [])} if info_df is not None and len(info_df) else {}
-contacts_by_policy: Dict[Any, pd.DataFrame] = {pid: g for pid, g in (contacts_df.groupby("policy_id") if not contacts_df.empty else [])} if contacts_df is not None and len(contacts_df) else {}
+# índices auxiliares (prontos no catálogo; montados aqui só no fallback)
+if catalog is not None:
+    requirement_engine = compiled_rules(catalog.rules, catalog.version)
+    info_by_policy: Dict[Any, pd.DataFrame] = catalog.info_by_policy
+    contacts_by_policy: Dict[Any, pd.DataFrame] = catalog.all_contacts_by_policy
+else:
+    requirement_engine = compiled_rules(parse_requirements(reqs_df))
+    info_by_policy = {pid: g for pid, g in (info_df.groupby("policy_id") if not info_df.empty else [])} if info_df is not None and len(info_df) else {}
+    contacts_by_policy = {pid: g for pid, g in (contacts_df.groupby("policy_id") if not contacts_df.empty else [])} if contacts_df is not None and len(contacts_df) else {}
 
 # ===============================================================
 # Obter PERFIL (sem login obrigatório)
@@ -399,153 +271,133 @@ class PolicyMatch:
     score_passed: int
     score_total: int
 
-def _coerce_numeric(x: Any) -> Optional[float]:
-    try: return float(x)
-    except Exception: return None
-
-def _value_in(left: Any, right: Any) -> bool:
-    if isinstance(right, (list, tuple, set)): return left in right
-    if isinstance(right, str):
-        items = [s.strip() for s in re.split(r",|;|\|", right) if s.strip()]
-        return str(left) in items
-    return False
-
-def _contains_text(container: Any, needle: str) -> bool:
-    if container is None: return False
-    if isinstance(container, str): return needle.lower() in container.lower()
-    if isinstance(container, (list, tuple, set)):
-        return any(_contains_text(x, needle) for x in container)
-    return needle.lower() in str(container).lower()
-
-def _eval_operator(attr_value: Any, operator: str, expected: Any) -> bool:
-    op = (operator or "").strip().lower()
-    lv, rv = _coerce_numeric(attr_value), _coerce_numeric(expected)
-
-    if op in {"==","=","eq"}:  return str(attr_value) == str(expected)
-    if op in {"!=","<>","ne"}: return str(attr_value) != str(expected)
-    if op in {">=","ge"} and lv is not None and rv is not None: return lv >= rv
-    if op in {"<=","le"} and lv is not None and rv is not None: return lv <= rv
-    if op in {">","gt"} and lv is not None and rv is not None:  return lv >  rv
-    if op in {"<","lt"} and lv is not None and rv is not None:  return lv <  rv
-    if op in {"in","∈"}:      return _value_in(attr_value, expected)
-    if op in {"not in","∉"}:  return not _value_in(attr_value, expected)
-    if op in {"contains","has","∋"}:      return _contains_text(attr_value, str(expected))
-    if op in {"not contains","!contains"}: return not _contains_text(attr_value, str(expected))
-    if op in {"regex","match"}:
-        try:
-            pat = re.compile(str(expected))
-            return bool(pat.search(str(attr_value)))
-        except Exception:
-            return False
-    return False
-
-def evaluate_policies(profile: Dict[str, Any]) -> List[PolicyMatch]:
-    results: List[PolicyMatch] = []
-
+def evaluate_policy(row: pd.Series, profile: Dict[str, Any]) -> PolicyMatch:
     # docs presentes no perfil
     profile_docs: Dict[str, bool] = {k: bool(v) for k, v in (profile.get("docs") or {}).items()}
 
-    for _, row in policies_df.iterrows():
-        pid = row.get("policy_id")
-        pname = row.get("policy_name") or str(pid)
-        pdesc = row.get("description") or "(sem descrição)"
-
-        info_rows: List[Tuple[str, str]] = []
-        if pid in info_by_policy:
-            g = info_by_policy[pid]
-            kcol = "info_key" if "info_key" in g.columns else ("key" if "key" in g.columns else "label")
-            vcol = "info_value" if "info_value" in g.columns else ("value" if "value" in g.columns else "text")
-            for _, ir in g.iterrows():
-                k = str(ir.get(kcol) or "Informação")
-                v = str(ir.get(vcol) or "")
-                info_rows.append((k, v))
-
-        contacts: List[Dict[str, Any]] = []
-        if pid in contacts_by_policy:
-            g = contacts_by_policy[pid].rename(columns={
-                "organization": "org_name",
-                "org": "org_name",
-                "telefone": "phone",
-                "contato": "phone",
-                "site": "url",
-            }).copy()
-            for _, cr in g.iterrows():
-                contacts.append({
-                    "org_name": cr.get("org_name"),
-                    "phone": cr.get("phone"),
-                    "email": cr.get("email"),
-                    "url": cr.get("url"),
-                    "notes": cr.get("notes"),
-                })
-
-        missing: List[str] = []
-        details: List[str] = []
-        passed_count = 0
-        total_checks = 0
-        hard_fail = False  # se algum requisito obrigatório falhar
-
-        # 1) Requisitos declarados em policy_requirements
-        req_rows = reqs_by_policy.get(pid)
-        if req_rows is not None and len(req_rows):
-            for _, r in req_rows.iterrows():
-                attr = str(r.get("attribute") or "").strip()
-                op   = str(r.get("operator") or "").strip()
-                exp  = r.get("value")
-                mand = bool(r.get("mandatory_flag"))
-
-                val = profile.get(attr)
-                ok = _eval_operator(val, op, exp)
-                total_checks += 1
-                if ok:
-                    passed_count += 1
-                    details.append(f"✓ {attr} {op} {exp}")
-                else:
-                    details.append(f"✗ {attr} {op} {exp} (atual: {val})")
-                    if mand:
-                        hard_fail = True
-                        missing.append(f"{attr} {op} {exp}")
-
-        # 2) Documentos obrigatórios (do policy_documents.xlsx)
-        doc_reqs = docs_by_policy.get(pid, [])
-        for dname, mand in doc_reqs:
-            # checa presença exata pelo nome do catálogo do cadastro
-            has_doc = bool(profile_docs.get(dname, False))
-            total_checks += 1
-            if has_doc:
-                passed_count += 1
-                details.append(f"✓ doc: {dname}")
-            else:
-                details.append(f"✗ doc: {dname}")
-                if mand:
-                    hard_fail = True
-                    missing.append(f"Documento obrigatório: {dname}")
-
-        # decide status
-        eligible = (not hard_fail)
-        # "Quase lá" = falhou poucos obrigatórios (<=2) OU só docs faltando (até 2)
-        near_miss = False
-        if not eligible:
-            mand_missing = [m for m in missing if m.lower().startswith("documento obrigatório") or True]
-            if 0 < len(mand_missing) <= 2:
-                near_miss = True
-
-        results.append(PolicyMatch(
-            policy_id=pid,
-            policy_name=str(pname),
-            description=str(pdesc),
-            info_rows=info_rows,
-            contacts=contacts,
-            eligible=eligible,
-            near_miss=near_miss and not eligible,
-            missing=missing,
-            details=details,
-            score_passed=passed_count,
-            score_total=max(1, total_checks),
-        ))
-
-    return results
-
-matches = evaluate_policies(profile_data)
+    pid = row.get("policy_id")
+    pname = row.get("policy_name") or str(pid)
+    pdesc = row.get("description") or "(sem descrição)"
+
+    info_rows: List[Tuple[str, str]] = []
+    if pid in info_by_policy:
+        g = info_by_policy[pid]
+        kcol = "info_key" if "info_key" in g.columns else ("key" if "key" in g.columns else "label")
+        vcol = "info_value" if "info_value" in g.columns else ("value" if "value" in g.columns else "text")
+        for _, ir in g.iterrows():
+            k = str(ir.get(kcol) or "Informação")
+            v = str(ir.get(vcol) or "")
+            info_rows.append((k, v))
+
+    contacts: List[Dict[str, Any]] = []
+    if pid in contacts_by_policy:
+        g = contacts_by_policy[pid].rename(columns={
+            "organization": "org_name",
+            "org": "org_name",
+            "telefone": "phone",
+            "contato": "phone",
+            "site": "url",
+        }).copy()
+        for _, cr in g.iterrows():
+            contacts.append({
+                "org_name": cr.get("org_name"),
+                "phone": cr.get("phone"),
+                "email": cr.get("email"),
+                "url": cr.get("url"),
+                "notes": cr.get("notes"),
+            })
+
+    missing: List[str] = []
+    details: List[str] = []
+    passed_count = 0
+    total_checks = 0
+    hard_fail = False  # se algum requisito obrigatório falhar
+
+    # 1) Requisitos declarados em policy_requirements
+    for rule, ok, val in requirement_engine.evaluate(pid, profile):
+        attr, op, exp, mand = rule.attribute, rule.operator, rule.value, rule.mandatory
+        total_checks += 1
+        if ok:
+            passed_count += 1
+            details.append(f"✓ {attr} {op} {exp}")
+        else:
+            details.append(f"✗ {attr} {op} {exp} (atual: {val})")
+            if mand:
+                hard_fail = True
+                missing.append(f"{attr} {op} {exp}")
+
+    # 2) Documentos obrigatórios (do policy_documents.xlsx)
+    doc_reqs = docs_by_policy.get(pid, [])
+    for dname, mand in doc_reqs:
+        # checa presença exata pelo nome do catálogo do cadastro
+        has_doc = bool(profile_docs.get(dname, False))
+        total_checks += 1
+        if has_doc:
+            passed_count += 1
+            details.append(f"✓ doc: {dname}")
+        else:
+            details.append(f"✗ doc: {dname}")
+            if mand:
+                hard_fail = True
+                missing.append(f"Documento obrigatório: {dname}")
+
+    # decide status
+    eligible = (not hard_fail)
+    # "Quase lá" = falhou poucos obrigatórios (<=2) OU só docs faltando (até 2)
+    near_miss = False
+    if not eligible:
+        mand_missing = [m for m in missing if m.lower().startswith("documento obrigatório") or True]
+        if 0 < len(mand_missing) <= 2:
+            near_miss = True
+
+    return PolicyMatch(
+        policy_id=pid,
+        policy_name=str(pname),
+        description=str(pdesc),
+        info_rows=info_rows,
+        contacts=contacts,
+        eligible=eligible,
+        near_miss=near_miss and not eligible,
+        missing=missing,
+        details=details,
+        score_passed=passed_count,
+        score_total=max(1, total_checks),
+    )
+
+# linhas do catálogo na ordem de exibição (resultados ficam alinhados a elas)
+policy_rows: List[pd.Series] = [row for _, row in policies_df.iterrows()]
+policy_ids: List[Any] = [row.get("policy_id") for row in policy_rows]
+
+def evaluate_policies(profile: Dict[str, Any]) -> List[PolicyMatch]:
+    return [evaluate_policy(row, profile) for row in policy_rows]
+
+RESULTS_STATE_KEY = "_resultado_auto_cache"
+
+def evaluate_policies_incremental(profile: Dict[str, Any]) -> Tuple[List[PolicyMatch], int]:
+    """
+    Reaproveita o resultado do último rerun da sessão: com o mesmo catálogo, só reavalia
+    as políticas que dependem dos atributos/documentos alterados no perfil (índice de
+    dependências do motor). Retorna (resultados, nº de políticas reavaliadas).
+    """
+    version = catalog.version if catalog is not None else None
+    prev = st.session_state.get(RESULTS_STATE_KEY)
+    if (version is None or not prev or prev.get("version") != version
+            or prev.get("policy_ids") != policy_ids):
+        results, redone = evaluate_policies(profile), len(policy_rows)
+    else:
+        deps = dependency_index(catalog.rules, catalog.docs_by_policy, version)
+        affected = deps.affected_by(prev["profile"], profile)
+        results, positions = patch_results(prev["results"], policy_ids, affected,
+                                           lambda i: evaluate_policy(policy_rows[i], profile))
+        redone = len(positions)
+    # cópia: o Cadastro altera o dict do perfil da sessão no lugar
+    st.session_state[RESULTS_STATE_KEY] = {"version": version, "policy_ids": policy_ids,
+                                           "profile": copy.deepcopy(profile), "results": results}
+    return results, redone
+
+matches, reevaluated = evaluate_policies_incremental(profile_data)
+if DEBUG:
+    st.caption(f"Políticas reavaliadas neste rerun: {reevaluated} de {len(matches)}")
 
 # ===============================================================
 # Filtros & resumo
@@ -1,6 +1,5 @@
 from __future__ import annotations
 import json
-import re
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
@@ -26,6 +25,8 @@ DEBUG = st.toggle("🔎 Debug", value=False, help="Exibe estados para diagnósti
 # ===============================================================
 # IO helpers
 # ===============================================================
+from app.data_access.manifest import load_manifest
+
 def _normalize(df: Optional[pd.DataFrame]) -> pd.DataFrame:
     if df is None:
         return pd.DataFrame()
@@ -33,18 +34,18 @@ def _normalize(df: Optional[pd.DataFrame]) -> pd.DataFrame:
     df.columns = [str(c).strip() for c in df.columns]
     return df
 
-def _read_excel_if_exists(p: Path) -> Optional[pd.DataFrame]:
-    if p.exists():
-        try:
-            return pd.read_excel(p)
-        except Exception as e:
-            st.warning(f"Falha ao ler {p.name}: {e}")
-    return None
-
 def _load_first_available(rel_or_patterns: List[str]) -> Optional[pd.DataFrame]:
     exts = (".csv", ".parquet", ".json", ".xlsx")
     cand: List[Path] = []
+    manifest = load_manifest()
     for rel in rel_or_patterns:
+        if manifest is not None:
+            # manifesto da ETL: candidatos por busca em dicionário, sem glob(); nomes fora
+            # do manifesto (arquivo novo, raw/, interim/) ou entradas velhas caem na sondagem
+            hits = [p for p in (manifest.path_of(e) for e in manifest.find([rel], exts)) if p.exists()]
+            if hits:
+                cand.extend(hits)
+                continue
         base = DATA_DIR / rel
         for ext in exts:
             cand.append(base.with_suffix(ext))
@@ -66,187 +67,29 @@ def _load_first_available(rel_or_patterns: List[str]) -> Optional[pd.DataFrame]:
     return None
 
 # ===============================================================
-# Carregamento preferencial do RAW
+# Catálogo pré-compilado (planilhas de data/raw/policies_source ou data/processed)
 # ===============================================================
+# Compilado uma vez por versão das planilhas (etl.build_policy_catalog ou sob demanda)
+# e compartilhado entre sessões: nada de reler Excel a cada rerun.
+from app.data_access.policy_catalog import load_policy_catalog
+from app.services.requirement_rules import compiled_rules, parse_requirements
+
 # Estruturas globais auxiliares:
 docs_by_policy: Dict[Any, List[Tuple[str, bool]]] = {}           # {policy_id: [(doc_name, mandatory)]}
 req_contacts_index: Dict[Tuple[Any, str], List[Dict[str, Any]]] = {}  # {(policy_id, requirement_key): [contacts...]}
-
-def load_from_raw_source():
-    """
-    Retorna:
-      policies_df, reqs_df, info_df, contacts_df, req_contacts_df (normalizados)
-    E preenche docs_by_policy e req_contacts_index.
-    """
-    global docs_by_policy, req_contacts_index
-
-    df_policies      = _normalize(_read_excel_if_exists(RAW_DIR / "policies.xlsx"))
-    df_requirements  = _normalize(_read_excel_if_exists(RAW_DIR / "policy_requirements.xlsx"))
-    df_contacts      = _normalize(_read_excel_if_exists(RAW_DIR / "policy_contacts.xlsx"))
-    df_docs          = _normalize(_read_excel_if_exists(RAW_DIR / "policy_documents.xlsx"))
-    df_fin           = _normalize(_read_excel_if_exists(RAW_DIR / "policy_financial_params.xlsx"))
-    df_regions       = _normalize(_read_excel_if_exists(RAW_DIR / "policy_regions.xlsx"))
-    df_regs_all      = _normalize(_read_excel_if_exists(RAW_DIR / "policy_regulations_all.xlsx"))
-    df_subprograms   = _normalize(_read_excel_if_exists(RAW_DIR / "policy_subprograms.xlsx"))
-    df_reqs_contacts = _normalize(_read_excel_if_exists(RAW_DIR / "policy_requirements_contacts.xlsx"))
-
-    # ----- policies -----
-    if df_policies.empty:
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-    low = {c.lower(): c for c in df_policies.columns}
-    rename = {}
-    for a, b in [
-        ("name","policy_name"), ("nome","policy_name"), ("titulo","policy_name"), ("título","policy_name"),
-        ("description","description"), ("descricao","description"), ("descrição","description"), ("resumo","description"),
-    ]:
-        if a in low: rename[low[a]] = b
-    if "policy_id" not in low and "id" in low:
-        rename[low["id"]] = "policy_id"
-    policies_df = df_policies.rename(columns=rename).copy()
-    if "policy_id" not in policies_df.columns:
-        policies_df["policy_id"] = range(1, len(policies_df) + 1)
-    if "policy_name" not in policies_df.columns:
-        raise ValueError("policies.xlsx precisa ter 'policy_name' (ou Nome/Título).")
-
-    # ----- requirements -----
-    reqs_df = pd.DataFrame(columns=["policy_id","attribute","operator","value","mandatory_flag"])
-    if not df_requirements.empty:
-        low = {c.lower(): c for c in df_requirements.columns}
-        colmap = {
-            low.get("policy_id","policy_id"): "policy_id",
-            low.get("attribute","attribute"): "attribute",
-            low.get("operator","operator"): "operator",
-            low.get("value","value"): "value",
-        }
-        reqs_df = df_requirements.rename(columns=colmap)
-        if "mandatory_flag" not in reqs_df.columns:
-            for cand in ["mandatory_flag","obrigatorio","obrigatório","required"]:
-                if cand in low:
-                    reqs_df["mandatory_flag"] = df_requirements[low[cand]]
-                    break
-            else:
-                reqs_df["mandatory_flag"] = True
-        reqs_df["mandatory_flag"] = reqs_df["mandatory_flag"].astype(str).str.lower().isin(["1","true","sim","yes"])
-
-    # ----- info (agregada) -----
-    info_rows: List[Tuple[Any, str, str]] = []
-    if not df_docs.empty:
-        low = {c.lower(): c for c in df_docs.columns}
-        k_doc = low.get("doc_name") or low.get("documento") or low.get("doc")
-        k_mand = low.get("mandatory_flag") or low.get("obrigatorio") or low.get("obrigatório") or low.get("required")
-        for _, r in df_docs.iterrows():
-            pid = r.get("policy_id")
-            dname = str(r.get(k_doc) or "").strip()
-            mand = bool(str(r.get(k_mand, "false")).strip().lower() in ["1","true","sim","yes"])
-            if dname:
-                info_rows.append((pid, "Documento exigido", dname + (" (obrigatório)" if mand else "")))
-                docs_by_policy.setdefault(pid, []).append((dname, mand))
-
-    if not df_fin.empty:
-        low = {c.lower(): c for c in df_fin.columns}
-        kcol = low.get("param_name") or low.get("param") or low.get("chave")
-        vcol = low.get("param_value") or low.get("valor") or low.get("value")
-        for _, r in df_fin.iterrows():
-            info_rows.append((r.get("policy_id"), str(r.get(kcol) or "Parâmetro financeiro"), str(r.get(vcol) or "")))
-
-    if not df_regions.empty:
-        grp = df_regions.groupby("policy_id")
-        for pid, g in grp:
-            nm = "region_name" if "region_name" in g.columns else ("uf" if "uf" in g.columns else None)
-            if nm:
-                regs = ", ".join(sorted({str(x) for x in g[nm] if pd.notna(x)}))
-                if regs:
-                    info_rows.append((pid, "Abrangência", regs))
-
-    if not df_regs_all.empty:
-        grp = df_regs_all.groupby("policy_id")
-        nm = "regulation" if "regulation" in df_regs_all.columns else ("lei" if "lei" in df_regs_all.columns else None)
-        for pid, g in grp:
-            bases = "; ".join([str(x) for x in (g[nm] if nm else []) if pd.notna(x)]) if nm else ""
-            if bases:
-                info_rows.append((pid, "Base legal", bases))
-
-    if not df_subprograms.empty:
-        grp = df_subprograms.groupby("policy_id")
-        nm = "subprogram_name" if "subprogram_name" in df_subprograms.columns else ("nome_subprograma" if "nome_subprograma" in df_subprograms.columns else None)
-        for pid, g in grp:
-            subs = ", ".join([str(x) for x in (g[nm] if nm else []) if pd.notna(x)]) if nm else ""
-            if subs:
-                info_rows.append((pid, "Subprogramas", subs))
-
-    info_df = pd.DataFrame(info_rows, columns=["policy_id","info_key","info_value"]) if info_rows else pd.DataFrame()
-
-    # ----- contacts (gerais da política) -----
-    contacts_df = pd.DataFrame(columns=["policy_id","org_name","phone","email","url","notes"])
-    if not df_contacts.empty:
-        low = {c.lower(): c for c in df_contacts.columns}
-        colmap = {}
-        for src, dst in [
-            ("policy_id","policy_id"),
-            ("org_name","org_name"), ("organization","org_name"), ("org","org_name"),
-            ("phone","phone"), ("telefone","phone"), ("contato","phone"),
-            ("email","email"),
-            ("url","url"), ("site","url"),
-            ("notes","notes"), ("obs","notes"),
-        ]:
-            if src in low: colmap[low[src]] = dst
-        contacts_df = df_contacts.rename(columns=colmap)
-
-    # ----- requirement contacts (para requisitos faltantes específicos) -----
-    req_contacts_df = pd.DataFrame(columns=[
-        "policy_id", "requirement_key", "org_name", "phone", "email", "url", "notes"
-    ])
-    req_contacts_index = {}  # reset local
-
-    if not df_reqs_contacts.empty:
-        low = {c.lower(): c for c in df_reqs_contacts.columns}
-        # Tenta mapear tanto atributo quanto documento:
-        rkey_col = (low.get("requirement_key") or low.get("attribute") or low.get("doc_name")
-                    or low.get("documento") or low.get("requisito") or "requirement_key")
-        colmap = {low.get("policy_id","policy_id"): "policy_id"}
-        for src, dst in [
-            (rkey_col, "requirement_key"),
-            ("org_name","org_name"), ("organization","org_name"), ("org","org_name"),
-            ("phone","phone"), ("telefone","phone"), ("contato","phone"),
-            ("email","email"),
-            ("url","url"), ("site","url"),
-            ("notes","notes"), ("obs","notes"),
-        ]:
-            if isinstance(src, str) and src in low:
-                colmap[src] = dst
-        req_contacts_df = df_reqs_contacts.rename(columns=colmap)
-
-        # Monta índice {(policy_id, requirement_key_normalizado): [contatos...]}
-        def _norm_key(x: Any) -> str:
-            return str(x or "").strip().lower()
-
-        for _, r in req_contacts_df.iterrows():
-            pid = r.get("policy_id")
-            rk  = _norm_key(r.get("requirement_key"))
-            if pid and rk:
-                req_contacts_index.setdefault((pid, rk), []).append({
-                    "org_name": r.get("org_name"),
-                    "phone": r.get("phone"),
-                    "email": r.get("email"),
-                    "url": r.get("url"),
-                    "notes": r.get("notes"),
-                })
-
-    return policies_df, reqs_df, info_df, contacts_df, req_contacts_df
-
-def raw_source_available() -> bool:
-    return RAW_DIR.exists() and any(RAW_DIR.glob("*.xlsx"))
-
-# ===============================================================
-# Carregar dados (RAW primeiro; fallback)
-# ===============================================================
-if raw_source_available():
-    try:
-        policies_df, reqs_df, info_df, contacts_df, req_contacts_df = load_from_raw_source()
-    except Exception as e:
-        st.error(f"Falha ao ler data/raw/policies_source: {e}")
-        policies_df = None
+catalog = None
+try:
+    catalog = load_policy_catalog()
+except Exception as e:
+    st.error(f"Falha ao ler o catálogo de políticas: {e}")
+
+if catalog is not None and not catalog.policies_df.empty:
+    policies_df, reqs_df, info_df, contacts_df, req_contacts_df = (
+        catalog.policies_df, catalog.reqs_df, catalog.info_df, catalog.contacts_df, catalog.req_contacts_df)
+    docs_by_policy = catalog.docs_by_policy
+    req_contacts_index = catalog.req_contacts_index
 else:
+    catalog = None
     policies_df = None
 
 if policies_df is None or policies_df.empty:
@@ -294,9 +137,14 @@ if "mandatory_flag" not in reqs_df.columns and len(reqs_df):
 info_df = _normalize(info_df) if 'info_df' in locals() and info_df is not None else pd.DataFrame(columns=["policy_id","info_key","info_value"])
 contacts_df = _normalize(contacts_df) if 'contacts_df' in locals() and contacts_df is not None else pd.DataFrame(columns=["policy_id","org_name","phone","email","url","notes"])
 
-reqs_by_policy: Dict[Any, pd.DataFrame] = {pid: g for pid, g in reqs_df.groupby("policy_id")} if len(reqs_df) else {}
-info_by_policy: Dict[Any, pd.DataFrame] = {pid: g for pid, g in (info_df.groupby("policy_id") if not info_df.empty else [])} if info_df is not None and len(info_df) else {}
-contacts_by_policy: Dict[Any, pd.DataFrame] = {pid: g for pid, g in (contacts_df.groupby("policy_id") if not contacts_df.empty else [])} if contacts_df is not None and len(contacts_df) else {}
+if catalog is not None:
+    requirement_engine = compiled_rules(catalog.rules, catalog.version)
+    info_by_policy: Dict[Any, pd.DataFrame] = catalog.info_by_policy
+    contacts_by_policy: Dict[Any, pd.DataFrame] = catalog.contacts_by_policy
+else:
+    requirement_engine = compiled_rules(parse_requirements(reqs_df))
+    info_by_policy = {pid: g for pid, g in (info_df.groupby("policy_id") if not info_df.empty else [])} if info_df is not None and len(info_df) else {}
+    contacts_by_policy = {pid: g for pid, g in (contacts_df.groupby("policy_id") if not contacts_df.empty else [])} if contacts_df is not None and len(contacts_df) else {}
 
 # ===============================================================
 # Obter PERFIL (sem login obrigatório)
@@ -305,7 +153,7 @@ profile_data: Dict[str, Any] = {}
 
 # 1) ?profile_id=... (se houver db)
 try:
-    from db import load_profile  # opcional
+    from app.data_access.repositories import load_profile  # opcional (cache de perfis)
 except Exception:
     def load_profile(_): return {}
 
@@ -377,46 +225,6 @@ class EvalResult:
     score_passed: int
     score_total: int
 
-def _coerce_numeric(x: Any) -> Optional[float]:
-    try: return float(x)
-    except Exception: return None
-
-def _value_in(left: Any, right: Any) -> bool:
-    if isinstance(right, (list, tuple, set)): return left in right
-    if isinstance(right, str):
-        items = [s.strip() for s in re.split(r",|;|\|", right) if s.strip()]
-        return str(left) in items
-    return False
-
-def _contains_text(container: Any, needle: str) -> bool:
-    if container is None: return False
-    if isinstance(container, str): return needle.lower() in container.lower()
-    if isinstance(container, (list, tuple, set)):
-        return any(_contains_text(x, needle) for x in container)
-    return needle.lower() in str(container).lower()
-
-def _eval_operator(attr_value: Any, operator: str, expected: Any) -> bool:
-    op = (operator or "").strip().lower()
-    lv, rv = _coerce_numeric(attr_value), _coerce_numeric(expected)
-
-    if op in {"==","=","eq"}:  return str(attr_value) == str(expected)
-    if op in {"!=","<>","ne"}: return str(attr_value) != str(expected)
-    if op in {">=","ge"} and lv is not None and rv is not None: return lv >= rv
-    if op in {"<=","le"} and lv is not None and rv is not None: return lv <= rv
-    if op in {">","gt"} and lv is not None and rv is not None:  return lv >  rv
-    if op in {"<","lt"} and lv is not None and rv is not None:  return lv <  rv
-    if op in {"in","∈"}:      return _value_in(attr_value, expected)
-    if op in {"not in","∉"}:  return not _value_in(attr_value, expected)
-    if op in {"contains","has","∋"}:      return _contains_text(attr_value, str(expected))
-    if op in {"not contains","!contains"}: return not _contains_text(attr_value, str(expected))
-    if op in {"regex","match"}:
-        try:
-            pat = re.compile(str(expected))
-            return bool(pat.search(str(attr_value)))
-        except Exception:
-            return False
-    return False
-
 def evaluate_policy_for_profile(policy_id: Any, profile: Dict[str, Any]) -> EvalResult:
     profile_docs: Dict[str, bool] = {k: bool(v) for k, v in (profile.get("docs") or {}).items()}
 
@@ -427,23 +235,17 @@ def evaluate_policy_for_profile(policy_id: Any, profile: Dict[str, Any]) -> Eval
     hard_fail = False
 
     # 1) Requisitos (attributes)
-    if policy_id in reqs_by_policy:
-        for _, r in reqs_by_policy[policy_id].iterrows():
-            attr = str(r.get("attribute") or "").strip()
-            op   = str(r.get("operator") or "").strip()
-            exp  = r.get("value")
-            mand = bool(r.get("mandatory_flag"))
-            val  = profile.get(attr)
-            ok = _eval_operator(val, op, exp)
-            total_checks += 1
-            if ok:
-                passed_count += 1
-                details.append(f"✓ {attr} {op} {exp}")
-            else:
-                details.append(f"✗ {attr} {op} {exp} (atual: {val})")
-                if mand:
-                    hard_fail = True
-                    missing.append(f"{attr} {op} {exp}")
+    for rule, ok, val in requirement_engine.evaluate(policy_id, profile):
+        attr, op, exp, mand = rule.attribute, rule.operator, rule.value, rule.mandatory
+        total_checks += 1
+        if ok:
+            passed_count += 1
+            details.append(f"✓ {attr} {op} {exp}")
+        else:
+            details.append(f"✗ {attr} {op} {exp} (atual: {val})")
+            if mand:
+                hard_fail = True
+                missing.append(f"{attr} {op} {exp}")
 
     # 2) Documentos obrigatórios
     for dname, mand in docs_by_policy.get(policy_id, []):
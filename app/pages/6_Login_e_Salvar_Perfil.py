@@ -2,7 +2,7 @@ import streamlit as st
 from app.components.layout import header_nav, footer, apply_global_style
 from app.data_access.repositories import (
     boot_migrations, authenticate_person, authenticate_collective,
-    create_person_account, create_collective_account,
+    create_person_account, create_collective_account, AuthBusyError,
     save_profile_for_account,
 )
 
@@ -28,12 +28,16 @@ with tab1:
     u = st.text_input("Usuário", key="person_login_user")
     p = st.text_input("Senha", type="password", key="person_login_pass")
     if st.button("Entrar (PF)"):
-        acc = authenticate_person(u, p)
-        if acc:
-            st.session_state.account = acc
-            st.success(f"Bem-vindo(a), {acc.get('display_name') or acc.get('username')}!")
+        try:
+            acc = authenticate_person(u, p)
+        except AuthBusyError as e:
+            st.warning(str(e))
         else:
-            st.error("Usuário/senha inválidos.")
+            if acc:
+                st.session_state.account = acc
+                st.success(f"Bem-vindo(a), {acc.get('display_name') or acc.get('username')}!")
+            else:
+                st.error("Usuário/senha inválidos.")
 
     st.divider()
     st.subheader("Criar conta (Pessoa Física)")
@@ -52,12 +56,16 @@ with tab2:
     cnpj = st.text_input("CNPJ (somente números)")
     p2 = st.text_input("Senha", type="password")
     if st.button("Entrar (Coletivo)"):
-        acc = authenticate_collective(cnpj, p2)
-        if acc:
-            st.session_state.account = acc
-            st.success("Bem-vind@, coletivo!")
+        try:
+            acc = authenticate_collective(cnpj, p2)
+        except AuthBusyError as e:
+            st.warning(str(e))
         else:
-            st.error("CNPJ/senha inválidos.")
+            if acc:
+                st.session_state.account = acc
+                st.success("Bem-vind@, coletivo!")
+            else:
+                st.error("CNPJ/senha inválidos.")
 
     st.divider()
     st.subheader("Criar conta (Coletivo)")
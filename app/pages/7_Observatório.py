@@ -24,7 +24,7 @@ if str(ROOT) not in sys.path:
 # ------------------------------------------------
 
 from app.components.layout import header_nav, footer, apply_global_style
-from app.data_access.repositories import boot_migrations, get_analytics
+from app.data_access.repositories import boot_migrations, get_analytics_aggregate
 from app.services.geo import load_geo  # mantém tua função
 
 # --------------------------------------------------------------------------------------
@@ -145,58 +145,31 @@ elif period == "Últimos 30 dias":   start_iso, end_iso = (now - timedelta(days=
 elif period == "Últimos 90 dias":   start_iso, end_iso = (now - timedelta(days=90)).isoformat(), now.isoformat()
 else:                               start_iso, end_iso = None, None
 
-events = get_analytics(start_iso=start_iso, end_iso=end_iso, uf=uf_f, municipio=mun_f, gender=gen_f) or []
-ev = pd.DataFrame(events)
-if ev.empty:
-    st.info("Sem eventos para os filtros atuais.")
-    footer(); st.stop()
+filters = dict(start_iso=start_iso, end_iso=end_iso, uf=uf_f, municipio=mun_f, gender=gen_f)
+regional = uf_f is None and mun_f is None
 
 # --------------------------------------------------------------------------------------
-# Métricas (ranking e peso espacial por UF/Município)
+# Métricas (ranking e peso espacial por UF/Município) — agregadas no SQLite
 # --------------------------------------------------------------------------------------
-ranking_df, heat_source, heat_label = None, None, "Eventos"
-
-if metric == "Acessos":
-    view = ev[ev["kind"] == "view"].copy()
-    if not view.empty:
-        group_cols = (["uf","municipio","policy"] if (uf_f is None and mun_f is None) else ["policy"])
-        ranking_df = (view.groupby(group_cols).size().reset_index(name="acessos").sort_values("acessos", ascending=False).head(int(topn)))
-        heat_source = view.groupby(["uf","municipio"]).size().reset_index(name="weight")
-        heat_label = "Acessos"
-
-elif metric == "Elegíveis":
-    elig = ev[ev["kind"] == "eligible"].copy()
-    if not elig.empty:
-        group_cols = (["uf","municipio","policy"] if (uf_f is None and mun_f is None) else ["policy"])
-        ranking_df = (elig.groupby(group_cols).size().reset_index(name="adequações").sort_values("adequações", ascending=False).head(int(topn)))
-        heat_source = elig.groupby(["uf","municipio"]).size().reset_index(name="weight")
-        heat_label = "Adequações"
-
-elif metric == "Requisitos Ausentes":
-    mt = ev[(ev["kind"] == "matches") & ev["missing"].notna()].copy()
-    if not mt.empty:
-        expl = mt.explode("missing")
-        group_cols = (["uf","municipio","missing"] if (uf_f is None and mun_f is None) else ["missing"])
-        ranking_df = (expl.groupby(group_cols).size().reset_index(name="ocorrências").sort_values("ocorrências", ascending=False).head(int(topn)))
-        heat_source = expl.groupby(["uf","municipio"]).size().reset_index(name="weight")
-        heat_label = "Ocorrências"
-
-elif metric == "Requisitos Presentes":
-    mt = ev[(ev["kind"] == "matches") & ev["met"].notna()].copy()
-    if not mt.empty:
-        expl = mt.explode("met")
-        group_cols = (["uf","municipio","met"] if (uf_f is None and mun_f is None) else ["met"])
-        ranking_df = (expl.groupby(group_cols).size().reset_index(name="ocorrências").sort_values("ocorrências", ascending=False).head(int(topn)))
-        heat_source = expl.groupby(["uf","municipio"]).size().reset_index(name="weight")
-        heat_label = "Ocorrências"
-
-else:  # Requeridas por Gênero
-    vw = ev[ev["kind"] == "view"].copy()
-    if not vw.empty:
-        grp = ["gender","policy"] if (uf_f or mun_f) else ["uf","municipio","gender","policy"]
-        ranking_df = (vw.groupby(grp).size().reset_index(name="requeridas").sort_values("requeridas", ascending=False).head(int(topn)))
-        heat_source = vw.groupby(["uf","municipio"]).size().reset_index(name="weight")
-        heat_label = "Requisições"
+# métrica → (métrica do banco, coluna de contagem, rótulo do mapa, grupo sem filtro, grupo com filtro)
+METRICS = {
+    "Acessos":               ("views",    "acessos",     "Acessos",     ["uf","municipio","policy"],  ["policy"]),
+    "Elegíveis":             ("eligible", "adequações",  "Adequações",  ["uf","municipio","policy"],  ["policy"]),
+    "Requisitos Ausentes":   ("missing",  "ocorrências", "Ocorrências", ["uf","municipio","requirement"], ["requirement"]),
+    "Requisitos Presentes":  ("met",      "ocorrências", "Ocorrências", ["uf","municipio","requirement"], ["requirement"]),
+    "Requeridas por Gênero": ("views",    "requeridas",  "Requisições", ["uf","municipio","gender","policy"], ["gender","policy"]),
+}
+metric_key, count_col, heat_label, group_all, group_local = METRICS[metric]
+
+agg = get_analytics_aggregate(metric_key, group_by=(group_all if regional else group_local),
+                              filters=filters, top_n=int(topn))
+if not agg["total"]:
+    st.info("Sem eventos para os filtros atuais.")
+    footer(); st.stop()
+
+req_col = {"missing": "missing", "met": "met"}.get(metric_key, "requirement")
+ranking_df = pd.DataFrame(agg["ranking"]).rename(columns={"count": count_col, "requirement": req_col})
+heat_source = pd.DataFrame(agg["weights"], columns=["uf","municipio","weight"])
 
 # --------------------------------------------------------------------------------------
 # Ranking
@@ -294,9 +267,11 @@ if ufs_geojson:
 
 else:
     # ---------------- Fallback: Heatmap de pontos (como tua versão anterior) ----------------
-    if (heat_source is None or heat_source.empty) and not ev[ev["kind"] == "search"].empty:
-        heat_source = ev[ev["kind"] == "search"].groupby(["uf","municipio"]).size().reset_index(name="weight")
-        heat_label = "Buscas"
+    if heat_source is None or heat_source.empty:
+        searches = get_analytics_aggregate("searches", filters=filters, top_n=1)["weights"]
+        if searches:
+            heat_source = pd.DataFrame(searches, columns=["uf","municipio","weight"])
+            heat_label = "Buscas"
 
     if heat_source is None or heat_source.empty:
         st.info("Sem dados georreferenciados para o mapa.")
@@ -305,15 +280,16 @@ else:
     use_mun = lat_mun and lon_mun and ("nome_mun" in mun_df.columns)
     if use_mun:
         mun_aux = mun_df.copy()
-        mun_aux["_key"] = mun_aux["nome_mun"].map(_normalize_text) + "||" + mun_aux["uf"].map(_normalize_text)
-        heat_source["_key"] = heat_source["municipio"].map(_normalize_text) + "||" + heat_source["uf"].map(_normalize_text)
+        # astype(str): uf/municipio podem vir categóricos (load_geo, analytics) e não concatenam
+        mun_aux["_key"] = mun_aux["nome_mun"].astype(str).map(_normalize_text) + "||" + mun_aux["uf"].astype(str).map(_normalize_text)
+        heat_source["_key"] = heat_source["municipio"].astype(str).map(_normalize_text) + "||" + heat_source["uf"].astype(str).map(_normalize_text)
         heat_df = heat_source.merge(mun_aux[["_key", lat_mun, lon_mun, "nome_mun", "uf"]], on="_key", how="left").dropna(subset=[lat_mun, lon_mun])
         tooltip = {"html": f"<b>Município:</b> {{nome_mun}} {{uf}}<br/><b>{heat_label}:</b> {{weight}}"}
         lon_col, lat_col = lon_mun, lat_mun
     else:
         ufs_aux = ufs_df.copy()
-        ufs_aux["_key"] = ufs_aux["uf"].map(_normalize_text)
-        heat_source["_key"] = heat_source["uf"].map(_normalize_text)
+        ufs_aux["_key"] = ufs_aux["uf"].astype(str).map(_normalize_text)
+        heat_source["_key"] = heat_source["uf"].astype(str).map(_normalize_text)
         heat_df = heat_source.merge(ufs_aux[["_key", lat_uf, lon_uf, "uf"]], on="_key", how="left").dropna(subset=[lat_uf, lon_uf])
         tooltip = {"html": f"<b>UF:</b> {{uf}}<br/><b>{heat_label}:</b> {{weight}}"}
         lon_col, lat_col = lon_uf, lat_uf
@@ -2,6 +2,11 @@ from .policies_engine import (
     evaluate_requirements,
     load_keyword_map,
     batch_evaluate_policies,
+    PolicyRuleIndex,
+    policy_rule_index,
+    EligibilityMatrix,
+    evaluate_matrix,
+    matrix_results,
 )
 from .geo import load_geo, guess_latlon_cols, normalize_text
 from .uc_catalog import load_ucs, filter_ucs
@@ -12,6 +17,11 @@ __all__ = [
     "evaluate_requirements",
     "load_keyword_map",
     "batch_evaluate_policies",
+    "PolicyRuleIndex",
+    "policy_rule_index",
+    "EligibilityMatrix",
+    "evaluate_matrix",
+    "matrix_results",
     "load_geo",
     "guess_latlon_cols",
     "normalize_text",
@@ -18,7 +18,12 @@ def load_defesos(path: Optional[str] = None) -> pd.DataFrame:
     Esperado CSV com colunas mínimas:
     ['especie','nome_popular','arte_pesca','uf','inicio','fim','fundamento_legal','esfera','link_oficial']
     """
-    df = load_defesos_csv(path).fillna("")
+    df = load_defesos_csv(path)
+    # categóricas (uf, esfera): "" entra como categoria para manter o vazio de antes
+    for c in df.columns:
+        if isinstance(df[c].dtype, pd.CategoricalDtype) and "" not in df[c].cat.categories:
+            df[c] = df[c].cat.add_categories("")
+    df = df.fillna("")
     if not df.empty:
         df = _coerce_dates(df)
     return df
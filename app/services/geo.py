@@ -5,6 +5,7 @@ from typing import Tuple, Optional
 
 import pandas as pd
 
+from app.data_access.shared_tables import shared_frame
 from app.utils.config import paths
 
 def normalize_text(s: Optional[str]) -> str:
@@ -24,34 +25,30 @@ def guess_latlon_cols(df: pd.DataFrame) -> Tuple[Optional[str], Optional[str]]:
     return None, None
 
 @lru_cache(maxsize=1)
+def _load_mun_geojson(gj_path: str) -> Optional[dict]:
+    try:
+        with open(gj_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def _shared_or_empty(name: str) -> pd.DataFrame:
+    try:
+        df = shared_frame(name)
+    except Exception:
+        df = None
+    return pd.DataFrame() if df is None else df
+
 def load_geo():
     """
     Carrega referências geográficas:
     - ufs.csv (deve conter UF e lat/lon)
     - municipios.csv (deve conter nome_mun, UF e lat/lon)
     - municipios_simplificado.geojson (opcional)
-    Retorna (ufs_df, mun_df, mun_geojson|None)
+    Retorna (ufs_df, mun_df, mun_geojson|None), com UF categórica, códigos IBGE Int32
+    e lat/lon float32 (ver app.data_access.dtypes). As tabelas vêm mapeadas de
+    data/processed/shared (compartilhadas entre processos e trocadas a cada build da ETL).
     """
     P = paths()
-    ufs_path = P.get("GEO_UFS", "data/processed/geo/ufs.csv")
-    mun_path = P.get("GEO_MUN", "data/processed/geo/municipios.csv")
-    gj_path  = P.get("GEO_MUN_GJ", "data/processed/geo/municipios_simplificado.geojson")
-
-    try:
-        ufs = pd.read_csv(ufs_path, dtype={"ibge_uf": str})
-    except Exception:
-        ufs = pd.DataFrame()
-
-    try:
-        mun = pd.read_csv(mun_path, dtype={"ibge_mun": str})
-    except Exception:
-        mun = pd.DataFrame()
-
-    gj = None
-    try:
-        with open(gj_path, "r", encoding="utf-8") as f:
-            gj = json.load(f)
-    except Exception:
-        gj = None
-
-    return ufs, mun, gj
+    gj_path = P.get("GEO_MUN_GJ", "data/processed/geo/municipios_simplificado.geojson")
+    return _shared_or_empty("geo_ufs"), _shared_or_empty("geo_municipios"), _load_mun_geojson(gj_path)
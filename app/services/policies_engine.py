@@ -1,8 +1,16 @@
 from __future__ import annotations
-from typing import Any, Dict, Iterable, List, Tuple
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from threading import Lock
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
 from functools import lru_cache
 
+import numpy as np
+import pandas as pd
+
 # Reaproveita sua lógica madura no utils.py legado
+import utils as _utils
 from utils import evaluate_requirements as _evaluate_requirements  # noqa: F401
 from utils import load_keyword_map as _load_keyword_map  # noqa: F401
 
@@ -16,21 +24,262 @@ def evaluate_requirements(requirement_text: str, profile: Dict[str, Any], kw_map
 
 @lru_cache(maxsize=1)
 def load_keyword_map(path: str) -> Dict[str, Any]:
-    """Carrega e memoriza o keyword_map.json (usa função já validada no utils.py)."""
+    """
+    Carrega e memoriza o keyword_map.json (usa função já validada no utils.py). Devolve
+    sempre o mesmo dict, então o matcher compilado para ele também é reaproveitado.
+    """
     return _load_keyword_map(path) or {}
 
-def batch_evaluate_policies(df, profile: Dict[str, Any], kw_map: Dict[str, Any]) -> Tuple[List[Tuple[int, List[str], List[str]]], List[Tuple[int, List[str], List[str]]]]:
+# ------------------------------------------------------------
+# Índice de regras por política (independente do perfil)
+# ------------------------------------------------------------
+# Quais condições do keyword_map valem para uma política depende só do texto de
+# 'Acesso'. O índice guarda, por linha, as condições disparadas (deduplicadas por
+# field/type/op/value) com o rótulo de cada chave; avaliar um perfil é checar cada
+# condição distinta uma vez e montar met/missing por consulta.
+
+Evaluation = Tuple[List[Tuple[Any, List[str], List[str]]], List[Tuple[Any, List[str], List[str]]]]
+
+def condition_key(cond: Dict[str, Any]) -> str:
+    """Identidade de uma condição: o que check_condition lê (field, type, op, value)."""
+    return json.dumps([cond["field"], (cond.get("type") or "").lower(), cond.get("op"),
+                       cond.get("value", True)], sort_keys=True, default=str)
+
+@dataclass(frozen=True)
+class PolicyRuleIndex:
+    version: str
+    conditions: Tuple[Dict[str, Any], ...]                        # condições distintas disparadas
+    rules: Tuple[Tuple[Any, Tuple[Tuple[int, str], ...]], ...]    # (row_index, ((condição, rótulo), ...))
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, kw_map: Dict[str, Any], version: str = "") -> "PolicyRuleIndex":
+        matcher = _utils.compile_keyword_map(kw_map or {})
+        ids: Dict[str, int] = {}
+        conditions: List[Dict[str, Any]] = []
+        per_key: Dict[int, Tuple[int, str]] = {}
+        rules = []
+        for idx, text in df["Acesso"].items():
+            triggered = []
+            for k in matcher.keys_in(str(text)):          # ordem do mapa, como no laço legado
+                if k not in per_key:
+                    cond = matcher.conds[k]
+                    ck = condition_key(cond)
+                    if ck not in ids:
+                        ids[ck] = len(conditions)
+                        conditions.append(cond)
+                    per_key[k] = (ids[ck], cond.get("label", matcher.keys[k]))
+                triggered.append(per_key[k])
+            rules.append((idx, tuple(triggered)))
+        return cls(version, tuple(conditions), tuple(rules))
+
+    def check(self, profile: Dict[str, Any]) -> List[bool]:
+        """Resultado de cada condição distinta para o perfil."""
+        profile = profile or {}
+        return [_utils.check_condition(profile.get(c["field"]), c) for c in self.conditions]
+
+    def evaluate(self, profile: Dict[str, Any]) -> Evaluation:
+        """(eligible, nearly) como em batch_evaluate_policies."""
+        ok = self.check(profile)
+        eligible, nearly = [], []
+        for idx, triggered in self.rules:
+            if not triggered:
+                continue
+            met = [label for c, label in triggered if ok[c]]
+            missing = [label for c, label in triggered if not ok[c]]
+            (nearly if missing else eligible).append((idx, met, missing))
+        return eligible, nearly
+
+_INDEXES: "OrderedDict[Tuple[str, int, Tuple[str, ...]], Tuple[Dict[str, Any], PolicyRuleIndex]]" = OrderedDict()
+_INDEXES_LOCK = Lock()
+
+def _texts_version(df: pd.DataFrame) -> str:
+    """Impressão digital do índice + textos de 'Acesso' (quando não há versão do catálogo)."""
+    h = pd.util.hash_pandas_object(df["Acesso"].astype(str), index=True)
+    return f"h{len(h)}:{int(h.sum()) & 0xFFFFFFFFFFFFFFFF:x}"
+
+def policy_rule_index(df: pd.DataFrame, kw_map: Dict[str, Any], version: Optional[str] = None) -> PolicyRuleIndex:
+    """
+    Índice do catálogo `df`, montado uma vez por versão (ex.: PolicyCatalog.version) e mapa.
+    Sem `version`, a chave é um hash dos textos de 'Acesso', refeito a cada chamada.
+    """
+    version = version or _texts_version(df)
+    key = (version, id(kw_map), tuple(kw_map or {}))
+    with _INDEXES_LOCK:
+        hit = _INDEXES.get(key)
+        if hit is not None and hit[0] is kw_map:
+            _INDEXES.move_to_end(key)
+            return hit[1]
+    index = PolicyRuleIndex.build(df, kw_map, version)
+    with _INDEXES_LOCK:
+        _INDEXES[key] = (kw_map, index)
+        if len(_INDEXES) > 8:
+            _INDEXES.popitem(last=False)
+    return index
+
+def batch_evaluate_policies(df, profile: Dict[str, Any], kw_map: Dict[str, Any],
+                            version: Optional[str] = None,
+                            evaluate: Optional[Callable[[str, Dict[str, Any], Dict[str, Any]],
+                                                        Tuple[List[str], List[str]]]] = None) -> Evaluation:
     """
     Percorre um DataFrame de políticas (coluna 'Acesso') e separa
     em elegíveis (sem missing) e quase elegíveis (com missing).
     Retorna (eligible, nearly) onde cada item é (row_index, met, missing).
+    `version` (ex.: PolicyCatalog.version) é a chave do índice de regras reaproveitado; sem
+    ela a chave é um hash dos textos de 'Acesso', recalculado a cada chamada (O(n)).
+    `evaluate(texto, perfil, kw_map) -> (met, missing)` troca o motor (plug-ins): avalia
+    texto a texto, sem o índice; 'Acesso' vazio não dispara requisitos em nenhum dos caminhos.
     """
     eligible, nearly = [], []
     if df is None or df.empty or "Acesso" not in df.columns:
         return eligible, nearly
 
-    for idx, row in df.iterrows():
-        met, missing = evaluate_requirements(str(row.get("Acesso", "")), profile, kw_map)
+    if evaluate is None:
+        return policy_rule_index(df, kw_map, version).evaluate(profile)
+
+    for idx, text in df["Acesso"].items():
+        if pd.isna(text) or not str(text).strip():
+            continue
+        met, missing = evaluate(str(text), profile, kw_map)
         if met or missing:
             (nearly if missing else eligible).append((idx, met, missing))
     return eligible, nearly
+
+# ------------------------------------------------------------
+# Matriz de elegibilidade: muitos perfis × muitas políticas
+# ------------------------------------------------------------
+# Cada condição distinta do índice vira uma operação de coluna sobre todos os perfis
+# (números comparados em NumPy; bool/select_in/text avaliados nos valores distintos da
+# coluna e espalhados pelos códigos do factorize), com a mesma semântica de
+# utils.check_condition. Políticas com o mesmo conjunto de condições são agregadas juntas.
+# Célula ausente no frame de perfis (NaN/None/coluna inexistente) = campo ausente no perfil.
+
+class EligibilityMatrix(NamedTuple):
+    eligible: np.ndarray    # bool [P, N]: disparou condições e todas passaram
+    missing: np.ndarray     # bitset das condições (índices de PolicyRuleIndex.conditions) que falharam:
+                            # [P, N] uint8..uint64 até 64 condições; acima, [P, N, W] uint64
+    scores: np.ndarray      # [P, N] nº de rótulos atendidos (o total é len(rules[n][1]))
+
+_NUMBER_OPS = {"<=": np.less_equal, ">=": np.greater_equal, "==": np.equal}
+
+_UNIFORM = {"string", "boolean", "integer", "floating", "decimal", "empty"}
+
+def _factorize(s: pd.Series) -> Tuple[np.ndarray, List[Any]]:
+    """
+    Códigos + valores distintos (ausente → código -1). Em colunas object com tipos
+    misturados, 1/1.0/True são distintos (str() e norm() diferem para eles).
+    """
+    if s.dtype == object and pd.api.types.infer_dtype(s, skipna=True) not in _UNIFORM:
+        tagged = pd.Series([(type(v), v) for v in s.tolist()], dtype=object).where(s.notna().to_numpy())
+        codes, uniques = pd.factorize(tagged, use_na_sentinel=True)
+        return codes, [v for _, v in uniques]
+    codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    return codes, list(uniques)
+
+def _by_distinct(s: pd.Series, fn) -> np.ndarray:
+    """fn avaliada uma vez por valor distinto da coluna (ausentes → fn(None))."""
+    try:
+        codes, uniques = _factorize(s)
+    except TypeError:  # valores não hasheáveis (listas): um a um
+        absent = s.isna().to_numpy()
+        return np.fromiter((fn(None if m else v) for v, m in zip(s.tolist(), absent)),
+                           dtype=bool, count=len(s))
+    values = np.array([bool(fn(u)) for u in uniques] + [bool(fn(None))], dtype=bool)
+    return values[codes]  # código -1 (ausente) cai no último elemento
+
+def condition_column(s: pd.Series, cond: Dict[str, Any]) -> np.ndarray:
+    """utils.check_condition(valor, cond) para cada perfil da coluna, vetorizado."""
+    t = (cond.get("type") or "").lower()
+    expected = cond.get("value", True)
+    if t == "number" and pd.api.types.is_numeric_dtype(s):
+        op = _NUMBER_OPS.get(cond.get("op"))
+        try:
+            exp_v = float(expected)
+        except Exception:
+            op = None
+        if op is None:
+            return np.zeros(len(s), dtype=bool)
+        values = s.to_numpy(dtype="float64", na_value=np.nan)
+        with np.errstate(invalid="ignore"):
+            return op(values, exp_v) & ~np.isnan(values)
+    if t == "select_in":
+        exp_list = expected if isinstance(expected, (list, tuple, set)) else [expected]
+        allowed = sorted(set(map(str, exp_list)))
+        try:
+            codes, uniques = _factorize(s)
+        except TypeError:
+            return _by_distinct(s, lambda u: str(u) in allowed)
+        hits = pd.Series(uniques + [None], dtype=object).map(str).isin(allowed).to_numpy()
+        return hits[codes]
+    if t == "text":
+        target = _utils.norm(expected)
+        return _by_distinct(s, lambda u: _utils.norm(u) == target)
+    return _by_distinct(s, lambda u: _utils.check_condition(u, cond))
+
+def _bitset_layout(n_conditions: int) -> Tuple[Any, int]:
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if n_conditions <= np.dtype(dtype).itemsize * 8:
+            return dtype, 0
+    return np.uint64, -(-n_conditions // 64)
+
+def evaluate_matrix(profiles_df: pd.DataFrame, catalog: PolicyRuleIndex) -> EligibilityMatrix:
+    """
+    Avalia todos os perfis (linhas de `profiles_df`, colunas = campos do perfil) contra
+    todas as políticas do índice `catalog` (ver policy_rule_index). Resultado idêntico a
+    catalog.evaluate(perfil) linha a linha; matrix_results() remonta as listas.
+    """
+    n_profiles, n_policies = len(profiles_df), len(catalog.rules)
+    ok = np.empty((n_profiles, len(catalog.conditions)), dtype=bool)
+    for j, cond in enumerate(catalog.conditions):
+        field = cond["field"]
+        s = profiles_df[field] if field in profiles_df.columns else pd.Series([None] * n_profiles, dtype=object)
+        ok[:, j] = condition_column(s, cond)
+
+    dtype, words = _bitset_layout(len(catalog.conditions))
+    eligible = np.zeros((n_profiles, n_policies), dtype=bool)
+    missing = np.zeros((n_profiles, n_policies) + ((words,) if words else ()), dtype=dtype)
+    max_labels = max((len(t) for _, t in catalog.rules), default=0)
+    scores = np.zeros((n_profiles, n_policies), dtype=np.uint8 if max_labels < 256 else np.uint16)
+
+    groups: Dict[Tuple[Tuple[int, str], ...], List[int]] = {}
+    for n, (_, triggered) in enumerate(catalog.rules):
+        if triggered:
+            groups.setdefault(triggered, []).append(n)
+    for triggered, cols in groups.items():
+        conds = sorted({c for c, _ in triggered})
+        failed = ~ok[:, conds]
+        eligible[:, cols] = ~failed.any(axis=1)[:, None]
+        if words:
+            bits = np.zeros((n_profiles, words), dtype=np.uint64)
+            for k, c in enumerate(conds):
+                bits[:, c // 64] |= failed[:, k].astype(np.uint64) << np.uint64(c % 64)
+            missing[:, cols, :] = bits[:, None, :]
+        else:
+            bits = np.zeros(n_profiles, dtype=dtype)
+            for k, c in enumerate(conds):
+                bits |= failed[:, k].astype(dtype) << dtype(c)
+            missing[:, cols] = bits[:, None]
+        met = np.zeros(n_profiles, dtype=scores.dtype)
+        for c, _ in triggered:
+            met += ok[:, c]
+        scores[:, cols] = met[:, None]
+    return EligibilityMatrix(eligible, missing, scores)
+
+def missing_conditions(matrix: EligibilityMatrix, p: int, n: int) -> List[int]:
+    """Índices das condições que falharam na célula (perfil p, política n)."""
+    cell = matrix.missing[p, n]
+    if np.ndim(cell) == 0:
+        v = int(cell)
+        return [c for c in range(v.bit_length()) if v >> c & 1]
+    return [w * 64 + c for w, word in enumerate(cell.tolist()) for c in range(64) if word >> c & 1]
+
+def matrix_results(catalog: PolicyRuleIndex, matrix: EligibilityMatrix, p: int) -> Evaluation:
+    """(eligible, nearly) do perfil p, igual a catalog.evaluate(perfil)."""
+    eligible, nearly = [], []
+    for n, (idx, triggered) in enumerate(catalog.rules):
+        if not triggered:
+            continue
+        failed = set(missing_conditions(matrix, p, n))
+        met = [label for c, label in triggered if c not in failed]
+        missing = [label for c, label in triggered if c in failed]
+        (nearly if missing else eligible).append((idx, met, missing))
+    return eligible, nearly
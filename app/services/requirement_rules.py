@@ -0,0 +1,314 @@
+# app/services/requirement_rules.py
+from __future__ import annotations
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from enum import Enum
+from threading import Lock
+from typing import (Any, Callable, Collection, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set,
+                    Tuple, TypeVar)
+
+import pandas as pd
+
+# Regras de policy_requirements (attribute, operator, value, mandatory_flag) pré-analisadas:
+# a ETL (compile_catalog → pacote do catálogo) guarda cada linha já tipada — operador como
+# enum, limiar numérico convertido, lista do `in` como frozenset, regex validada — e o app
+# monta uma vez, por versão do catálogo, uma função de checagem por regra (regex compilada
+# uma vez). Semântica idêntica ao antigo _eval_operator das páginas de resultado.
+
+class Operator(str, Enum):
+    EQ = "=="
+    NE = "!="
+    GE = ">="
+    LE = "<="
+    GT = ">"
+    LT = "<"
+    IN = "in"
+    NOT_IN = "not in"
+    CONTAINS = "contains"
+    NOT_CONTAINS = "not contains"
+    REGEX = "regex"
+    UNKNOWN = "?"             # operador não reconhecido: a regra nunca passa
+
+OPERATOR_ALIASES: Dict[str, Operator] = {
+    "==": Operator.EQ, "=": Operator.EQ, "eq": Operator.EQ,
+    "!=": Operator.NE, "<>": Operator.NE, "ne": Operator.NE,
+    ">=": Operator.GE, "ge": Operator.GE,
+    "<=": Operator.LE, "le": Operator.LE,
+    ">": Operator.GT, "gt": Operator.GT,
+    "<": Operator.LT, "lt": Operator.LT,
+    "in": Operator.IN, "∈": Operator.IN,
+    "not in": Operator.NOT_IN, "∉": Operator.NOT_IN,
+    "contains": Operator.CONTAINS, "has": Operator.CONTAINS, "∋": Operator.CONTAINS,
+    "not contains": Operator.NOT_CONTAINS, "!contains": Operator.NOT_CONTAINS,
+    "regex": Operator.REGEX, "match": Operator.REGEX,
+}
+
+_NUMERIC = (Operator.GE, Operator.LE, Operator.GT, Operator.LT)
+_LIST_SPLIT = re.compile(r",|;|\|")
+
+@dataclass(frozen=True)
+class RequirementRule:
+    """Uma linha de policy_requirements, já analisada. Os campos crus ficam para exibição."""
+    policy_id: Any
+    attribute: str                              # campo do perfil
+    operator: str                               # operador como escrito na planilha
+    value: Any                                  # valor esperado como escrito na planilha
+    mandatory: bool
+    op: Operator
+    text: str = ""                              # str(value): ==, != e contains
+    threshold: Optional[float] = None           # >=, <=, >, <
+    items: Optional[Collection[Any]] = None     # in / not in
+    pattern: Optional[str] = None               # regex válida
+    error: Optional[str] = None                 # por que a regra nunca passa (operador, número, regex)
+
+    @property
+    def label(self) -> str:
+        return f"{self.attribute} {self.operator} {self.value}"
+
+def _coerce_numeric(x: Any) -> Optional[float]:
+    try: return float(x)
+    except Exception: return None
+
+def _items(expected: Any) -> Optional[Collection[Any]]:
+    if isinstance(expected, (list, tuple, set)):
+        try:
+            return frozenset(expected)
+        except TypeError:       # elementos não hasheáveis: busca linear
+            return tuple(expected)
+    if isinstance(expected, str):
+        return frozenset(s.strip() for s in _LIST_SPLIT.split(expected) if s.strip())
+    return None
+
+def parse_rule(policy_id: Any, attribute: Any, operator: Any, value: Any, mandatory: Any) -> RequirementRule:
+    """Analisa uma linha (mesma leitura de células que as páginas faziam)."""
+    attr = str(attribute or "").strip()
+    raw_op = str(operator or "").strip()
+    op = OPERATOR_ALIASES.get(raw_op.lower(), Operator.UNKNOWN)
+    fields: Dict[str, Any] = {"text": str(value)}
+    if op is Operator.UNKNOWN:
+        fields["error"] = f"operador desconhecido: {raw_op!r}"
+    elif op in _NUMERIC:
+        fields["threshold"] = _coerce_numeric(value)
+        if fields["threshold"] is None:
+            fields["error"] = f"valor não numérico: {value!r}"
+    elif op in (Operator.IN, Operator.NOT_IN):
+        fields["items"] = _items(value)
+    elif op is Operator.REGEX:
+        try:
+            re.compile(str(value))
+            fields["pattern"] = str(value)
+        except Exception as e:
+            fields["error"] = f"regex inválida: {e}"
+    return RequirementRule(policy_id, attr, raw_op, value, bool(mandatory), op, **fields)
+
+def parse_requirements(reqs_df: Optional[pd.DataFrame]) -> Dict[Any, Tuple[RequirementRule, ...]]:
+    """reqs_df (policy_id, attribute, operator, value, mandatory_flag) → regras por política, na ordem."""
+    out: Dict[Any, List[RequirementRule]] = {}
+    if reqs_df is None or reqs_df.empty or "policy_id" not in reqs_df.columns:
+        return {}
+    for r in reqs_df.to_dict("records"):
+        pid = r.get("policy_id")
+        if pd.isna(pid):        # como o groupby("policy_id") que montava reqs_by_policy
+            continue
+        out.setdefault(pid, []).append(parse_rule(pid, r.get("attribute"), r.get("operator"),
+                                                  r.get("value"), r.get("mandatory_flag")))
+    return {pid: tuple(rules) for pid, rules in out.items()}
+
+# -------------------- Checagem compilada --------------------
+
+Check = Callable[[Any], bool]
+
+def _never(_: Any) -> bool:
+    return False
+
+def _contains_text(container: Any, needle: str) -> bool:
+    # needle já em minúsculas
+    if container is None: return False
+    if isinstance(container, str): return needle in container.lower()
+    if isinstance(container, (list, tuple, set)):
+        return any(_contains_text(x, needle) for x in container)
+    return needle in str(container).lower()
+
+def compile_rule(rule: RequirementRule) -> Check:
+    """Função valor-do-perfil → passou? para a regra."""
+    op = rule.op
+    if rule.error is not None:
+        return _never
+    if op is Operator.EQ:
+        text = rule.text
+        return lambda v: str(v) == text
+    if op is Operator.NE:
+        text = rule.text
+        return lambda v: str(v) != text
+    if op in _NUMERIC:
+        t = rule.threshold
+        cmp = {Operator.GE: lambda lv: lv >= t, Operator.LE: lambda lv: lv <= t,
+               Operator.GT: lambda lv: lv > t, Operator.LT: lambda lv: lv < t}[op]
+
+        def numeric(v: Any) -> bool:
+            lv = _coerce_numeric(v)
+            return lv is not None and cmp(lv)
+        return numeric
+    if op in (Operator.IN, Operator.NOT_IN):
+        items, negate = rule.items, op is Operator.NOT_IN
+        if items is None:
+            return (lambda v: True) if negate else _never
+        as_text = isinstance(rule.value, str)    # lista escrita na célula: compara str(valor)
+
+        def member(v: Any) -> bool:
+            if as_text:
+                return str(v) in items
+            try:
+                return v in items
+            except TypeError:   # valor não hasheável contra frozenset
+                return any(v == x for x in items)
+        return (lambda v: not member(v)) if negate else member
+    if op in (Operator.CONTAINS, Operator.NOT_CONTAINS):
+        needle = rule.text.lower()
+        if op is Operator.NOT_CONTAINS:
+            return lambda v: not _contains_text(v, needle)
+        return lambda v: _contains_text(v, needle)
+    if op is Operator.REGEX:
+        search = re.compile(rule.pattern or "").search
+        return lambda v: bool(search(str(v)))
+    return _never
+
+@dataclass(frozen=True)
+class CompiledRequirement:
+    rule: RequirementRule
+    check: Check
+
+class CompiledRules:
+    """Regras por política com as funções de checagem prontas. Compartilhado: não altere."""
+
+    def __init__(self, rules: Dict[Any, Tuple[RequirementRule, ...]], version: Optional[str] = None):
+        self.version = version
+        self.by_policy: Dict[Any, Tuple[CompiledRequirement, ...]] = {
+            pid: tuple(CompiledRequirement(r, compile_rule(r)) for r in rs) for pid, rs in rules.items()}
+
+    def __contains__(self, policy_id: Any) -> bool:
+        return policy_id in self.by_policy
+
+    def evaluate(self, policy_id: Any, profile: Dict[str, Any]) -> List[Tuple[RequirementRule, bool, Any]]:
+        """(regra, passou?, valor do perfil) para cada requisito da política, na ordem da planilha."""
+        out = []
+        for c in self.by_policy.get(policy_id, ()):
+            val = profile.get(c.rule.attribute)
+            out.append((c.rule, c.check(val), val))
+        return out
+
+def eval_operator(attr_value: Any, operator: str, expected: Any) -> bool:
+    """Avaliação avulsa (sem cache) de um operador: mesma resposta do motor compilado."""
+    return compile_rule(parse_rule(None, "", operator, expected, True))(attr_value)
+
+_CACHE: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+_CACHE_LOCK = Lock()
+_CACHE_MAX = 8
+
+def _versioned(kind: str, version: str, build: Callable[[], Any]) -> Any:
+    key = (kind, version)
+    with _CACHE_LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None:
+            _CACHE.move_to_end(key)
+            return hit
+    value = build()
+    with _CACHE_LOCK:
+        _CACHE[key] = value
+        while len(_CACHE) > _CACHE_MAX:
+            _CACHE.popitem(last=False)
+    return value
+
+def compiled_rules(rules: Dict[Any, Tuple[RequirementRule, ...]], version: Optional[str] = None) -> CompiledRules:
+    """
+    Motor compilado das regras. Com `version` (ex.: PolicyCatalog.version) é montado uma
+    vez por versão e compartilhado entre sessões; sem versão, monta a cada chamada.
+    """
+    if version is None:
+        return CompiledRules(rules)
+    return _versioned("rules", version, lambda: CompiledRules(rules, version))
+
+# -------------------- Reavaliação incremental --------------------
+
+DOCS_FIELD = "docs"     # perfil["docs"] = {nome do documento: marcado?}
+
+class DependencyIndex:
+    """
+    Quem depende de quê: atributo do perfil → políticas com requisito sobre ele, e nome de
+    documento → políticas que o exigem. Com o diff entre dois perfis, diz quais políticas
+    precisam ser reavaliadas; as demais mantêm o resultado anterior.
+    """
+
+    def __init__(self, rules: Dict[Any, Tuple[RequirementRule, ...]],
+                 docs_by_policy: Optional[Dict[Any, List[Tuple[str, bool]]]] = None):
+        by_attribute: Dict[str, set] = {}
+        by_document: Dict[str, set] = {}
+        for pid, rs in rules.items():
+            for r in rs:
+                by_attribute.setdefault(r.attribute, set()).add(pid)
+        for pid, docs in (docs_by_policy or {}).items():
+            for dname, _ in docs:
+                by_document.setdefault(dname, set()).add(pid)
+        self.by_attribute: Dict[str, FrozenSet[Any]] = {k: frozenset(v) for k, v in by_attribute.items()}
+        self.by_document: Dict[str, FrozenSet[Any]] = {k: frozenset(v) for k, v in by_document.items()}
+
+    def affected(self, attributes: Iterable[str] = (), documents: Iterable[str] = ()) -> Set[Any]:
+        out: Set[Any] = set()
+        for a in attributes:
+            out |= self.by_attribute.get(a, frozenset())
+        for d in documents:
+            out |= self.by_document.get(d, frozenset())
+        return out
+
+    def affected_by(self, old: Dict[str, Any], new: Dict[str, Any]) -> Set[Any]:
+        """Políticas cujo resultado pode mudar de `old` para `new`."""
+        return self.affected(*profile_changes(old, new))
+
+def _same(a: Any, b: Any) -> bool:
+    # mesmo tipo e igual: 1 e 1.0 avaliam diferente em `==` (compara str); NaN conta como mudança
+    if a is b:
+        return True
+    try:
+        return type(a) is type(b) and bool(a == b)
+    except Exception:
+        return False
+
+def profile_changes(old: Dict[str, Any], new: Dict[str, Any]) -> Tuple[Set[str], Set[str]]:
+    """(atributos alterados, documentos com marcação alterada) entre dois perfis."""
+    old, new = old or {}, new or {}
+    attributes = {k for k in old.keys() | new.keys() if not _same(old.get(k), new.get(k))}
+    old_docs, new_docs = old.get(DOCS_FIELD) or {}, new.get(DOCS_FIELD) or {}
+    documents = {d for d in old_docs.keys() | new_docs.keys()
+                 if bool(old_docs.get(d, False)) != bool(new_docs.get(d, False))}
+    return attributes, documents
+
+def dependency_index(rules: Dict[Any, Tuple[RequirementRule, ...]],
+                     docs_by_policy: Optional[Dict[Any, List[Tuple[str, bool]]]] = None,
+                     version: Optional[str] = None) -> DependencyIndex:
+    """Índice de dependências, um por versão do catálogo (sem versão, monta a cada chamada)."""
+    if version is None:
+        return DependencyIndex(rules, docs_by_policy)
+    return _versioned("deps", version, lambda: DependencyIndex(rules, docs_by_policy))
+
+R = TypeVar("R")
+
+def patch_results(previous: Sequence[R], policy_ids: Sequence[Any], affected: Set[Any],
+                  evaluate: Callable[[int], R]) -> Tuple[List[R], List[int]]:
+    """
+    Resultados novos a partir dos anteriores (alinhados com `policy_ids`): só as posições
+    de políticas em `affected` passam por evaluate(posição). Retorna (resultados, posições refeitas).
+    """
+    results = list(previous)
+    redone = [i for i, pid in enumerate(policy_ids) if pid in affected]
+    for i in redone:
+        results[i] = evaluate(i)
+    return results, redone
+
+def rule_errors(rules: Dict[Any, Tuple[RequirementRule, ...]]) -> List[RequirementRule]:
+    """Regras que nunca passam por defeito na planilha (para o log da ETL)."""
+    return [r for rs in rules.values() for r in rs if r.error is not None]
+
+__all__ = ["CompiledRequirement", "CompiledRules", "DependencyIndex", "OPERATOR_ALIASES", "Operator",
+           "RequirementRule", "compile_rule", "compiled_rules", "dependency_index", "eval_operator",
+           "parse_requirements", "parse_rule", "patch_results", "profile_changes", "rule_errors"]
@@ -9,6 +9,7 @@ _DEFAULTS: Dict[str, str] = {
     "POLICIES_XLSX": "data/processed/politicas_publicas.xlsx",
     "PROFILE_SCHEMA": "data/docs/profile_schema.json",
     "KEYWORD_MAP": "data/docs/keyword_map.json",
+    "POLICIES_MASTER_CSV": "data/processed/policies_master.csv",
     # Geo
     "GEO_UFS": "data/processed/geo/ufs.csv",
     "GEO_MUN": "data/processed/geo/municipios.csv",
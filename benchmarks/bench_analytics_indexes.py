@@ -0,0 +1,192 @@
+# benchmarks/bench_analytics_indexes.py
+r"""
+Benchmark dos filtros do Observatório: esquema legado (sem índices, filtros com
+UPPER/LOWER(COALESCE(...)) e ts em texto) vs. esquema migrado (chaves *_norm,
+ts_ms e índices compostos).
+
+Para cada volume gera N eventos sintéticos num SQLite temporário, mostra o
+EXPLAIN QUERY PLAN e o tempo de cada consulta típica antes e depois de
+migrate_analytics(), e a agregação do Observatório lendo eventos brutos vs. rollups.
+
+Uso:
+    python benchmarks/bench_analytics_indexes.py --events 1000000 10000000
+    python benchmarks/bench_analytics_indexes.py --events 200000 --repeat 5
+"""
+from __future__ import annotations
+import argparse
+import importlib.util
+import json
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+DB_FILE = ROOT / "db.py"
+
+UFS = ["PA", "AP", "MA", "AM", "PI", "CE", "RN", "PB", "PE", "AL", "SE", "BA"]
+MUNICIPIOS = [f"Município {i:03d}" for i in range(300)]
+KINDS = ["search", "view", "matches", "eligible"]
+GENDERS = ["Mulher", "Homem", "Outro/Prefere não dizer", None]
+POLICIES = [f"Política {i:02d}" for i in range(80)]
+# tráfego real é concentrado em poucos municípios/políticas: pesos tipo Zipf
+MUN_WEIGHTS = [1 / (i + 1) for i in range(len(MUNICIPIOS))]
+POL_WEIGHTS = [1 / (i + 1) for i in range(len(POLICIES))]
+
+LEGACY_SQL = """
+    SELECT ts, kind, policy, uf, municipio, query, gender, met_json, missing_json, extras_json
+      FROM analytics_events
+     WHERE 1=1 {where}
+     ORDER BY ts DESC
+"""
+
+def _load_db(db_path: Path):
+    os.environ["DB_PATH"] = str(db_path)
+    spec = importlib.util.spec_from_file_location(f"db_bench_{db_path.stem}", DB_FILE)
+    mod = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(mod)
+    return mod
+
+def _create_legacy(db_path: Path, n: int, days: int, seed: int) -> None:
+    """Cria a tabela no formato legado e popula com n eventos espalhados em `days` dias."""
+    rnd = random.Random(seed)
+    cn = sqlite3.connect(db_path)
+    cn.execute("PRAGMA journal_mode=WAL")
+    cn.execute("PRAGMA synchronous=OFF")
+    cn.execute("""
+        CREATE TABLE analytics_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts TEXT NOT NULL, kind TEXT NOT NULL, policy TEXT, uf TEXT, municipio TEXT,
+            query TEXT, gender TEXT, met_json TEXT, missing_json TEXT, extras_json TEXT
+        )
+    """)
+    now = datetime.now(timezone.utc)
+    span = days * 86400
+    batch = []
+    for _ in range(n):
+        ts = (now - timedelta(seconds=rnd.randrange(span))).isoformat()
+        kind = rnd.choice(KINDS)
+        met = json.dumps(rnd.sample(["cpf", "rgp", "cadunico", "caf"], 2)) if kind == "matches" else "[]"
+        miss = json.dumps(rnd.sample(["nis", "cnpj", "associado"], 1)) if kind == "matches" else "[]"
+        pol = rnd.choices(POLICIES, POL_WEIGHTS)[0]
+        mun = rnd.choices(MUNICIPIOS, MUN_WEIGHTS)[0]
+        batch.append((ts, kind, pol, rnd.choice(UFS), mun,
+                      None, rnd.choice(GENDERS), met, miss, "{}"))
+        if len(batch) >= 50_000:
+            cn.executemany("""INSERT INTO analytics_events
+                (ts, kind, policy, uf, municipio, query, gender, met_json, missing_json, extras_json)
+                VALUES (?,?,?,?,?,?,?,?,?,?)""", batch)
+            batch.clear()
+    if batch:
+        cn.executemany("""INSERT INTO analytics_events
+            (ts, kind, policy, uf, municipio, query, gender, met_json, missing_json, extras_json)
+            VALUES (?,?,?,?,?,?,?,?,?,?)""", batch)
+    cn.commit()
+    cn.close()
+
+def _legacy_where(start_iso=None, end_iso=None, uf=None, municipio=None, gender=None):
+    sql, args = "", []
+    if start_iso: sql += " AND ts >= ?"; args.append(start_iso)
+    if end_iso: sql += " AND ts <= ?"; args.append(end_iso)
+    if uf: sql += " AND UPPER(COALESCE(uf,'')) = ?"; args.append(uf.strip().upper())
+    if municipio: sql += " AND LOWER(COALESCE(municipio,'')) = ?"; args.append(municipio.strip().lower())
+    if gender: sql += " AND LOWER(COALESCE(gender,'')) = ?"; args.append(gender.strip().lower())
+    return sql, args
+
+def _scenarios():
+    now = datetime.now(timezone.utc)
+    d7, d30, d90 = (now - timedelta(days=d) for d in (7, 30, 90))
+    return [
+        ("7d", dict(start_iso=d7.isoformat(), end_iso=now.isoformat())),
+        ("30d + UF", dict(start_iso=d30.isoformat(), end_iso=now.isoformat(), uf="PA")),
+        ("90d + UF + município", dict(start_iso=d90.isoformat(), end_iso=now.isoformat(),
+                                      uf="PA", municipio="Município 007")),
+        ("tudo + gênero", dict(gender="mulher")),
+    ]
+
+def _timeit(cn, sql, args, repeat):
+    samples, rows = [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = sum(1 for _ in cn.execute(sql, args))
+        samples.append(time.perf_counter() - t0)
+    return statistics.median(samples), rows
+
+def _plan(cn, sql, args):
+    return " | ".join(r[3] for r in cn.execute("EXPLAIN QUERY PLAN " + sql, args))
+
+def run(n: int, days: int, repeat: int, workdir: Path, seed: int) -> None:
+    db_path = workdir / f"bench_{n}.db"
+    for suffix in ("", "-wal", "-shm"):
+        Path(str(db_path) + suffix).unlink(missing_ok=True)
+
+    print(f"\n=== {n:,} eventos ({days} dias) ===")
+    t0 = time.perf_counter()
+    _create_legacy(db_path, n, days, seed)
+    print(f"carga sintética: {time.perf_counter() - t0:.1f}s")
+
+    cn = sqlite3.connect(db_path)
+    legacy = {}
+    for name, f in _scenarios():
+        where, args = _legacy_where(**f)
+        sql = LEGACY_SQL.format(where=where)
+        legacy[name] = _timeit(cn, sql, args, repeat)
+        print(f"[legado ] {name:<24} plano: {_plan(cn, sql, args)}")
+    cn.close()
+
+    db = _load_db(db_path)
+    t0 = time.perf_counter()
+    db.migrate_analytics()
+    print(f"migrate_analytics (backfill + índices): {time.perf_counter() - t0:.1f}s")
+
+    with db._read_conn() as cn:
+        for name, f in _scenarios():
+            where, args = db._analytics_filters(**f)
+            sql = (f"SELECT ts, kind, policy, uf, municipio, query, gender, met_json, missing_json, "
+                   f"extras_json FROM analytics_events WHERE 1=1 {where} ORDER BY ts_ms DESC, id DESC")
+            new_t, new_rows = _timeit(cn, sql, args, repeat)
+            old_t, old_rows = legacy[name]
+            print(f"[indexado] {name:<24} plano: {_plan(cn, sql, args)}")
+            print(f"           linhas {old_rows:>9,} → {new_rows:>9,} | "
+                  f"{old_t * 1000:9.1f} ms → {new_t * 1000:9.1f} ms  (x{old_t / max(new_t, 1e-9):.1f})")
+
+    t0 = time.perf_counter()
+    db.refresh_rollups()
+    print(f"refresh_rollups (carga inicial): {time.perf_counter() - t0:.1f}s")
+    for name, f in _scenarios():
+        times = {}
+        for use_rollups in (False, True):
+            samples = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                db.get_analytics_aggregate("views", ["uf", "municipio", "policy"], f, use_rollups=use_rollups)
+                samples.append(time.perf_counter() - t0)
+            times[use_rollups] = statistics.median(samples)
+        print(f"[agregado] {name:<24} eventos {times[False] * 1000:9.1f} ms → rollups "
+              f"{times[True] * 1000:9.1f} ms  (x{times[False] / max(times[True], 1e-9):.1f})")
+    db.get_pool().close()
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--events", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--workdir", type=Path, default=None,
+                    help="Diretório para os .db temporários (padrão: tmp do sistema)")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="matupiri_bench_") as tmp:
+        workdir = args.workdir or Path(tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        for n in args.events:
+            run(n, args.days, args.repeat, workdir, args.seed)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+# benchmarks/bench_dtypes.py
+r"""
+Relatório de memória da política de dtypes (app.data_access.dtypes): cada frame de
+catálogo/geo lido "cru" (texto como object, como os loaders faziam) e depois de
+apply_dtypes, mais um log de analytics sintético com N eventos.
+
+Uso:
+    python benchmarks/bench_dtypes.py
+    python benchmarks/bench_dtypes.py --events 200000 --columns
+"""
+from __future__ import annotations
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.data_access.dtypes import apply_dtypes, column_report, memory_report  # noqa: E402
+
+FRAMES = {
+    "geo/municipios": "data/processed/geo/municipios.csv",
+    "geo/ufs": "data/processed/geo/ufs.csv",
+    "ibge/municipios": "data/ibge/municipios.csv",
+    "processed/municipios": "data/processed/municipios.csv",
+    "ucs": "data/processed/ucs.csv",
+    "defesos": "data/processed/defesos.csv",
+    "policies_master": "data/processed/policies_master.csv",
+}
+
+UFS = ["PA", "AM", "AP", "MA", "BA", "PE", "CE", "RN", "PB", "SC", "RS", "SP", "RJ"]
+KINDS = ["search", "view", "matches", "eligible"]
+
+def _as_object(df: pd.DataFrame) -> pd.DataFrame:
+    """Texto como object (o comportamento anterior, independente da versão do pandas)."""
+    return df.astype({c: object for c in df.columns if pd.api.types.is_string_dtype(df[c])})
+
+def _events(n: int, seed: int = 7) -> pd.DataFrame:
+    rnd = random.Random(seed)
+    muns = [f"Município {i}" for i in range(300)]
+    pols = [f"Política {i}" for i in range(40)]
+    return pd.DataFrame({
+        "ts": pd.date_range("2025-01-01", periods=n, freq="min", tz="UTC"),
+        "kind": [rnd.choice(KINDS) for _ in range(n)],
+        "policy": [rnd.choice(pols) for _ in range(n)],
+        "uf": [rnd.choice(UFS) for _ in range(n)],
+        "municipio": [rnd.choice(muns) for _ in range(n)],
+        "query": [rnd.choice(["pronaf", "seguro defeso", "bolsa família", None]) for _ in range(n)],
+        "gender": [rnd.choice(["feminino", "masculino", None]) for _ in range(n)],
+    }, dtype=object).astype({"ts": "datetime64[ns, UTC]"})
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=100_000, help="eventos sintéticos de analytics")
+    ap.add_argument("--columns", action="store_true", help="detalha antes/depois por coluna")
+    args = ap.parse_args(argv)
+
+    frames = {}
+    for name, rel in FRAMES.items():
+        p = ROOT / rel
+        if p.exists():
+            frames[name] = _as_object(pd.read_csv(p, low_memory=False))
+    if args.events:
+        frames["analytics (sintético)"] = _events(args.events)
+
+    t0 = time.perf_counter()
+    report = memory_report(frames)
+    elapsed = time.perf_counter() - t0
+    total_before, total_after = report["before_kb"].sum(), report["after_kb"].sum()
+    with pd.option_context("display.width", 120, "display.max_columns", 10):
+        print(report.to_string(index=False))
+        print(f"\ntotal: {total_before:,.1f} KB -> {total_after:,.1f} KB "
+              f"({100 * (1 - total_after / total_before):.1f}% a menos); relatório em {elapsed:.2f}s")
+        if args.columns:
+            for name, df in frames.items():
+                print(f"\n== {name}")
+                print(column_report(df).to_string())
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
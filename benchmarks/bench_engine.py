@@ -0,0 +1,129 @@
+# benchmarks/bench_engine.py
+r"""
+Benchmark do motor de elegibilidade: batch_evaluate_policies para vários perfis contra o
+catálogo, comparando o laço antigo (norm + `key in req` para cada chave, a cada perfil),
+o matcher compilado do utils (compile_keyword_map: trie/laço + memo por texto) e o índice
+de regras (PolicyRuleIndex: cada condição distinta checada uma vez por perfil); depois
+mede evaluate_matrix (todos os perfis de uma vez, em colunas NumPy).
+
+Os textos de requisito vêm de policies_master.csv (critérios + como acessar); --extra-keys
+acrescenta chaves sintéticas ao keyword_map para ver o custo com mapas maiores.
+
+Uso:
+    python benchmarks/bench_engine.py
+    python benchmarks/bench_engine.py --profiles 200 --policies 2000 --extra-keys 300
+"""
+from __future__ import annotations
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import utils  # noqa: E402
+from app.services import policies_engine as pe  # noqa: E402
+
+def _legacy_evaluate(requirement_text: str, profile: Dict[str, Any],
+                     kw_map: Dict[str, Dict[str, Any]]) -> Tuple[List[str], List[str]]:
+    """O utils.evaluate_requirements anterior ao matcher."""
+    req = utils.norm(requirement_text)
+    met, missing = [], []
+    for key, cond in kw_map.items():
+        if key in req:
+            ok = utils.check_condition(profile.get(cond["field"]), cond)
+            (met if ok else missing).append(cond.get("label", key))
+    return met, missing
+
+def _legacy_batch(df: pd.DataFrame, profile: Dict[str, Any], kw_map: Dict[str, Any]):
+    eligible, nearly = [], []
+    for idx, row in df.iterrows():
+        met, missing = _legacy_evaluate(str(row.get("Acesso", "")), profile, kw_map)
+        if met or missing:
+            (nearly if missing else eligible).append((idx, met, missing))
+    return eligible, nearly
+
+def _matcher_batch(df: pd.DataFrame, profile: Dict[str, Any], kw_map: Dict[str, Any]):
+    """Texto a texto pelo matcher compilado (sem o índice de regras)."""
+    eligible, nearly = [], []
+    for idx, text in df["Acesso"].items():
+        met, missing = utils.evaluate_requirements(str(text), profile, kw_map)
+        if met or missing:
+            (nearly if missing else eligible).append((idx, met, missing))
+    return eligible, nearly
+
+def _profiles(n: int, fields: List[str], seed: int = 11) -> List[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    return [{f: rnd.random() < 0.5 for f in fields} for _ in range(n)]
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--profiles", type=int, default=50)
+    ap.add_argument("--policies", type=int, default=300, help="linhas do catálogo (textos repetidos)")
+    ap.add_argument("--matrix-profiles", type=int, default=100_000, help="perfis da evaluate_matrix")
+    ap.add_argument("--extra-keys", type=int, default=0, help="chaves sintéticas além do keyword_map.json")
+    args = ap.parse_args(argv)
+
+    master = pd.read_csv(ROOT / "data/processed/policies_master.csv", dtype=str).fillna("")
+    texts = (master["criterios"] + " " + master["como_acessar"]).tolist()
+    df = pd.DataFrame({"Acesso": [texts[i % len(texts)] for i in range(args.policies)]})
+
+    kw_map = dict(utils.load_keyword_map(str(ROOT / "data/docs/keyword_map.json")))
+    rnd = random.Random(5)
+    vocab = sorted({w for t in texts for w in utils.norm(t).split() if len(w) > 3})
+    for w in rnd.sample(vocab, min(args.extra_keys, len(vocab))):
+        kw_map.setdefault(w, {"field": "extra", "type": "bool", "op": "==", "value": True})
+    profiles = _profiles(args.profiles, sorted({c["field"] for c in kw_map.values()}))
+    print(f"{len(df)} políticas ({len(texts)} textos distintos) × {len(profiles)} perfis, "
+          f"{len(kw_map)} chaves")
+
+    results = {}
+    for name, batch in (("laço antigo", _legacy_batch), ("matcher", _matcher_batch),
+                        ("índice de regras", lambda d, p, k: pe.batch_evaluate_policies(d, p, k, version="bench"))):
+        t0 = time.perf_counter()
+        results[name] = [batch(df, p, kw_map) for p in profiles]
+        dt = time.perf_counter() - t0
+        print(f"  {name:<17} {dt * 1000:8.1f} ms  ({dt * 1000 / len(profiles):.3f} ms/perfil)")
+    assert all(r == results["laço antigo"] for r in results.values()), "resultados divergentes"
+    index = pe.policy_rule_index(df, kw_map, "bench")
+    print(f"  índice: {len(index.rules)} políticas, {len(index.conditions)} condições distintas")
+
+    # matriz: todos os perfis × todas as políticas de uma vez
+    rng = np.random.default_rng(3)
+    fields = sorted({c["field"] for c in kw_map.values()})
+    frame = pd.DataFrame({f: rng.random(args.matrix_profiles) < 0.5 for f in fields})
+    if "renda" in frame:
+        frame["renda"] = rng.integers(0, 5000, args.matrix_profiles).astype(float)
+    t0 = time.perf_counter()
+    matrix = pe.evaluate_matrix(frame, index)
+    dt = time.perf_counter() - t0
+    nbytes = sum(a.nbytes for a in matrix)
+    print(f"  evaluate_matrix {len(frame):,} × {len(index.rules)}: {dt:.2f} s "
+          f"({nbytes / 2**20:.0f} MB; eligible {matrix.eligible.mean():.1%} das células)")
+    sample = range(0, len(frame), max(1, len(frame) // 200))
+    assert all(pe.matrix_results(index, matrix, p) == index.evaluate(frame.iloc[p].to_dict()) for p in sample)
+    t0 = time.perf_counter()
+    for p in sample:
+        index.evaluate(frame.iloc[p].to_dict())
+    per = (time.perf_counter() - t0) / len(sample)
+    print(f"  perfil a perfil (estimado p/ {len(frame):,}): {per * len(frame):.1f} s")
+
+    matcher = utils.compile_keyword_map(kw_map)
+    one = df["Acesso"].map(utils.norm).tolist()
+    for label, fn in (("in por chave", lambda r: tuple(i for i, k in enumerate(matcher.keys) if k in r)),
+                      ("trie (1 passada)", utils.KeywordMatcher(kw_map, trie_min_keys=1).scan)):
+        t0 = time.perf_counter()
+        for r in one:
+            fn(r)
+        print(f"  varredura {label:<17} {(time.perf_counter() - t0) * 1e6 / len(one):6.1f} µs/texto")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,89 @@
+# benchmarks/bench_import.py
+r"""
+Tempo de import (estilo `python -X importtime`) de módulos que NÃO usam o banco.
+
+Para cada módulo, roda N processos novos com `-X importtime` e mede:
+  - preguiçoso: só o import (o bridge não executa o db.py);
+  - ansioso:    import + primeiro acesso ao bridge (equivale ao bridge antigo,
+                que executava o db.py — pool, diretório infra/, threads — no import).
+Mostra a mediana do tempo cumulativo do módulo (µs, como o importtime), o tempo
+total do processo e os imports mais caros que só aparecem no modo ansioso.
+
+Uso:
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --runs 15 --modules app.services.uc_catalog
+"""
+from __future__ import annotations
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+DEFAULT_MODULES = [
+    "app.data_access.repositories",
+    "app.services.uc_catalog",
+    "app.services.defeso_calendar",
+]
+
+def _run(module: str, eager: bool, workdir: Path):
+    code = f"import {module}\n"
+    if eager:
+        code += ("import time\nfrom app.data_access import bridge_legacy_db as B\n"
+                 "t0 = time.perf_counter(); B.log_event\n"
+                 "print(int((time.perf_counter() - t0) * 1e6))\n")
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+    env.pop("DB_PATH", None)  # padrão relativo ao cwd: infra/pp_platform.db
+    t0 = time.perf_counter()
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=workdir, env=env,
+                         capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - t0
+    imports = {}
+    for m in _LINE.finditer(out.stderr):
+        self_us, cum_us, indent, name = int(m.group(1)), int(m.group(2)), m.group(3), m.group(4)
+        imports[name] = (self_us, cum_us, len(indent))
+    load_us = int(out.stdout.strip() or 0)  # execução do db.py (no bridge antigo, parte do import)
+    return imports, load_us, wall
+
+def run(modules, runs: int, top: int) -> None:
+    print(f"=== {runs} processos por medição, Python {sys.version.split()[0]} ===")
+    print(f"{'módulo':<34} {'modo':<10} {'import (ms)':>12} {'processo (ms)':>14} {'infra/ criado':>14}")
+    for module in modules:
+        extra = {}
+        for eager in (False, True):
+            cum, walls, created = [], [], False
+            for _ in range(runs):
+                with tempfile.TemporaryDirectory(prefix="matupiri_import_") as tmp:
+                    imports, load_us, wall = _run(module, eager, Path(tmp))
+                    created = created or (Path(tmp) / "infra").exists()
+                cum.append((imports.get(module, (0, 0, 0))[1] + load_us) / 1000)
+                walls.append(wall * 1000)
+                if eager:
+                    for name, (self_us, _c, _i) in imports.items():
+                        extra.setdefault(name, []).append(self_us)
+                else:
+                    lazy_names = set(imports)
+            print(f"{module:<34} {'ansioso' if eager else 'preguiçoso':<10} "
+                  f"{statistics.median(cum):12.1f} {statistics.median(walls):14.1f} {str(created):>14}")
+        only_eager = sorted(((statistics.median(v), n) for n, v in extra.items() if n not in lazy_names),
+                            reverse=True)[:top]
+        if only_eager:
+            print("   só no modo ansioso: " + ", ".join(f"{n} {us / 1000:.1f}ms" for us, n in only_eager))
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    ap.add_argument("--runs", type=int, default=9)
+    ap.add_argument("--top", type=int, default=5, help="Imports extras do modo ansioso a listar")
+    args = ap.parse_args(argv)
+    run(args.modules, args.runs, args.top)
+
+if __name__ == "__main__":
+    sys.exit(main())
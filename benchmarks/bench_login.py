@@ -0,0 +1,136 @@
+# benchmarks/bench_login.py
+r"""
+Benchmark de login sob rajada: N logins simultâneos (threads, como sessões do
+Streamlit no mesmo servidor) enquanto outras sessões fazem leituras leves.
+
+Compara o caminho antigo (PBKDF2 direto na thread de cada sessão, sem limite)
+com o executor limitado do db.py (AUTH_HASH_WORKERS + AUTH_HASH_QUEUE, recusa
+imediata com AuthBusyError quando a fila enche). Mostra p50/p99 dos logins,
+quantos foram recusados e a latência das leituras leves concorrentes.
+
+Uso:
+    python benchmarks/bench_login.py --logins 50
+    python benchmarks/bench_login.py --logins 50 --workers 2 4 --queue 16 64
+"""
+from __future__ import annotations
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+DB_FILE = ROOT / "db.py"
+
+def _load_db(db_path: Path):
+    os.environ["DB_PATH"] = str(db_path)
+    spec = importlib.util.spec_from_file_location(f"db_bench_{db_path.stem}", DB_FILE)
+    mod = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(mod)
+    return mod
+
+def _pct(values, q):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+def _legacy_authenticate(db, username, password):
+    """authenticate_person como era: PBKDF2 na própria thread da sessão."""
+    with db._read_conn() as cn:
+        row = cn.execute("SELECT id, password_hash FROM accounts WHERE kind='person' AND username=?",
+                         (username,)).fetchone()
+    return row if row and db._verify_password(password, row["password_hash"]) else None
+
+def _burst(login, n_logins: int, n_readers: int, read):
+    lat, rejected, read_lat = [], [], []
+    lock = threading.Lock()
+    start = threading.Event()
+    done = threading.Event()
+
+    def user(i):
+        start.wait()
+        t0 = time.perf_counter()
+        try:
+            ok = login(f"user{i % 10}", "s3nha")
+            assert ok
+            with lock:
+                lat.append(time.perf_counter() - t0)
+        except Exception as e:  # AuthBusyError: recusa rápida
+            with lock:
+                rejected.append((time.perf_counter() - t0, type(e).__name__))
+
+    def reader():
+        start.wait()
+        while not done.is_set():
+            t0 = time.perf_counter()
+            read()
+            with lock:
+                read_lat.append(time.perf_counter() - t0)
+            time.sleep(0.005)
+
+    users = [threading.Thread(target=user, args=(i,)) for i in range(n_logins)]
+    readers = [threading.Thread(target=reader) for _ in range(n_readers)]
+    for t in users + readers: t.start()
+    t0 = time.perf_counter()
+    start.set()
+    for t in users: t.join()
+    wall = time.perf_counter() - t0
+    done.set()
+    for t in readers: t.join()
+    return lat, rejected, read_lat, wall
+
+def run(n_logins: int, workers_list, queue_list, readers: int, workdir: Path) -> None:
+    db_path = workdir / "login.db"
+    for suffix in ("", "-wal", "-shm", ".migrate.lock"):
+        Path(str(db_path) + suffix).unlink(missing_ok=True)
+    db = _load_db(db_path)
+    db.run_migrations()
+    for i in range(10):
+        db.create_person_account(f"Pessoa {i}", f"user{i}", "s3nha")
+
+    def read():
+        with db._read_conn() as cn:
+            cn.execute("SELECT COUNT(*) FROM accounts").fetchone()
+
+    print(f"\n=== {n_logins} logins simultâneos, {readers} sessões lendo, {os.cpu_count()} CPUs, "
+          f"PBKDF2 {db._PBKDF2_ITER:,} iterações ===")
+
+    def report(label, res):
+        lat, rejected, read_lat, wall = res
+        rej = f"{len(rejected):>3} recusados (p50 {_pct([r[0] for r in rejected], 0.5):6.1f} ms)" \
+            if rejected else "  0 recusados"
+        print(f"{label:<26} logins p50 {_pct(lat, 0.5):7.1f} ms p99 {_pct(lat, 0.99):7.1f} ms | {rej} | "
+              f"leituras p50 {_pct(read_lat, 0.5):6.2f} ms p99 {_pct(read_lat, 0.99):6.2f} ms | {wall:5.2f}s")
+
+    report("[antigo] thread da sessão", _burst(lambda u, p: _legacy_authenticate(db, u, p),
+                                               n_logins, readers, read))
+    for workers in workers_list:
+        for queue_max in queue_list:
+            db._HASHER = db._HashExecutor(workers=workers, queue_max=queue_max)
+            report(f"[executor] w={workers} fila={queue_max}",
+                   _burst(db.authenticate_person, n_logins, readers, read))
+            db._HASHER.shutdown()
+    db.get_pool().close()
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--logins", type=int, default=50)
+    ap.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    ap.add_argument("--queue", type=int, nargs="+", default=[16, 64])
+    ap.add_argument("--readers", type=int, default=4)
+    ap.add_argument("--workdir", type=Path, default=None,
+                    help="Diretório para os .db temporários (padrão: tmp do sistema)")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="matupiri_bench_") as tmp:
+        workdir = args.workdir or Path(tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        run(args.logins, args.workers, args.queue, args.readers, workdir)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+# benchmarks/bench_profiles.py
+r"""
+Benchmark de perfis: salvar nova versão e listar versões por conta, com N contas.
+
+Compara o caminho legado (sem índices em profiles; MAX(version) em Python sob
+um lock global do processo) com o atual (índices únicos (owner_account_id, version DESC) /
+(user_id, version DESC) e INSERT ... SELECT MAX+1 atômico), no mesmo banco,
+antes e depois do passo de migração que cria os índices.
+
+Uso:
+    python benchmarks/bench_profiles.py --accounts 100000
+    python benchmarks/bench_profiles.py --accounts 20000 --ops 500 --threads 4
+"""
+from __future__ import annotations
+import argparse
+import importlib.util
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+DB_FILE = ROOT / "db.py"
+
+_LEGACY_LOCK = threading.Lock()  # o antigo _DB_LOCK do db.py
+
+PROFILE = {"nome": "Fulana", "estado": "PA", "municipio": "Bragança", "cpf_ok": True, "rgp": True,
+           "cadunico": False, "renda": 1200, "atividades": ["pesca", "mariscagem"]}
+
+def _load_db(db_path: Path):
+    os.environ["DB_PATH"] = str(db_path)
+    spec = importlib.util.spec_from_file_location(f"db_bench_{db_path.stem}", DB_FILE)
+    mod = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(mod)
+    return mod
+
+def _populate(db, n_accounts: int, per_account: int, seed: int) -> None:
+    """Cria contas (hash fixo: o custo do PBKDF2 não interessa aqui) e versões de perfil."""
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc).isoformat()
+    body = json.dumps(PROFILE, ensure_ascii=False)
+    with db._conn() as cn:
+        cn.executemany(
+            "INSERT INTO accounts (kind, username, display_name, password_hash, created_at) VALUES (?,?,?,?,?)",
+            (("person", f"user{i}", f"Pessoa {i}", "pbkdf2$x$y$z", now) for i in range(n_accounts)))
+        rows = []
+        for acc in range(1, n_accounts + 1):
+            for v in range(1, rnd.randint(1, per_account) + 1):
+                rows.append(("", body, v, now, now, acc))
+        cn.executemany("""INSERT INTO profiles (user_id, profile_json, version, created_at, updated_at, owner_account_id)
+                          VALUES (?,?,?,?,?,?)""", rows)
+
+def _legacy_save(db, owner: int, profile) -> int:
+    """save_profile_for_account como era antes (MAX em Python sob o lock global)."""
+    now = db._now_iso()
+    with _LEGACY_LOCK:
+        with db._conn() as cn:
+            last = cn.execute("SELECT COALESCE(MAX(version),0) FROM profiles WHERE owner_account_id=?",
+                              (owner,)).fetchone()[0]
+            cur = cn.execute("""
+                INSERT INTO profiles (user_id, profile_json, version, created_at, updated_at, owner_account_id)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, ("", json.dumps(profile, ensure_ascii=False), int(last or 0) + 1, now, now, owner))
+            return int(cur.lastrowid)
+
+def _timed(fn, owners, threads: int):
+    """Executa fn(owner) para cada owner (dividido entre threads); retorna (ops/s, p50 ms, p95 ms)."""
+    lat: list = []
+    lock = threading.Lock()
+
+    def worker(chunk):
+        local = []
+        for o in chunk:
+            t0 = time.perf_counter()
+            fn(o)
+            local.append(time.perf_counter() - t0)
+        with lock:
+            lat.extend(local)
+
+    chunks = [owners[i::threads] for i in range(threads)]
+    t0 = time.perf_counter()
+    ts = [threading.Thread(target=worker, args=(c,)) for c in chunks]
+    for t in ts: t.start()
+    for t in ts: t.join()
+    wall = time.perf_counter() - t0
+    lat.sort()
+    return len(owners) / wall, statistics.median(lat) * 1000, lat[int(len(lat) * 0.95) - 1] * 1000
+
+def _check_unique(db) -> int:
+    with db._read_conn() as cn:
+        return cn.execute("""SELECT COUNT(*) FROM (SELECT owner_account_id, version FROM profiles
+                              WHERE owner_account_id IS NOT NULL
+                              GROUP BY 1, 2 HAVING COUNT(*) > 1)""").fetchone()[0]
+
+def run(n_accounts: int, per_account: int, ops: int, threads: int, workdir: Path, seed: int) -> None:
+    db_path = workdir / f"profiles_{n_accounts}.db"
+    for suffix in ("", "-wal", "-shm", ".migrate.lock"):
+        Path(str(db_path) + suffix).unlink(missing_ok=True)
+    db = _load_db(db_path)
+    # esquema até a versão anterior aos índices de perfis
+    with db._conn() as cn:
+        for version, step in db._MIGRATIONS:
+            if step is not db._step_profile_versions:
+                step(cn)
+
+    print(f"\n=== {n_accounts:,} contas (até {per_account} versões cada), {ops} operações, {threads} thread(s) ===")
+    t0 = time.perf_counter()
+    _populate(db, n_accounts, per_account, seed)
+    print(f"carga sintética: {time.perf_counter() - t0:.1f}s")
+
+    rnd = random.Random(seed)
+    owners = [rnd.randint(1, n_accounts) for _ in range(ops)]
+
+    def report(label, fn):
+        rate, p50, p95 = _timed(fn, owners, threads)
+        print(f"{label:<32} {rate:9.0f} ops/s | p50 {p50:8.2f} ms | p95 {p95:8.2f} ms")
+
+    report("[legado ] salvar versão", lambda o: _legacy_save(db, o, PROFILE))
+    report("[legado ] listar versões", db.get_profiles_by_account)
+
+    t0 = time.perf_counter()
+    with db._conn() as cn:
+        db._step_profile_versions(cn)
+        cn.execute(f"PRAGMA user_version = {db.SCHEMA_VERSION}")
+    print(f"migração (renumeração + índices únicos): {time.perf_counter() - t0:.1f}s")
+
+    report("[indexado] salvar versão", lambda o: db.save_profile_for_account(o, PROFILE))
+    report("[indexado] listar versões", db.get_profiles_by_account)
+    print(f"versões duplicadas após o teste: {_check_unique(db)}")
+    db.get_pool().close()
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--accounts", type=int, nargs="+", default=[100_000])
+    ap.add_argument("--per-account", type=int, default=5)
+    ap.add_argument("--ops", type=int, default=2_000)
+    ap.add_argument("--threads", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--workdir", type=Path, default=None,
+                    help="Diretório para os .db temporários (padrão: tmp do sistema)")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="matupiri_bench_") as tmp:
+        workdir = args.workdir or Path(tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        for n in args.accounts:
+            run(n, args.per_account, args.ops, args.threads, workdir, args.seed)
+
+if __name__ == "__main__":
+    sys.exit(main())
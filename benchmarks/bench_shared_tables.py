@@ -0,0 +1,103 @@
+# benchmarks/bench_shared_tables.py
+r"""
+Memória de K processos "workers" com as tabelas de referência: cada um lendo a sua cópia
+(SHARED_TABLES=0, o comportamento anterior) vs. mapeando o Arrow IPC publicado
+(app.data_access.shared_tables). Mede PSS (/proc/<pid>/smaps_rollup), que reparte as
+páginas compartilhadas entre os processos: a soma é a memória real do host.
+
+As tabelas reais são pequenas; --scale replica as linhas de ucs.csv e policies_master.csv
+num diretório temporário para simular catálogos maiores.
+
+Uso (Linux):
+    python benchmarks/bench_shared_tables.py
+    python benchmarks/bench_shared_tables.py --workers 8 --scale 200
+"""
+from __future__ import annotations
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+TABLES = {"ucs": ("UCS_CSV", "data/processed/ucs.csv"),
+          "policies_master": ("POLICIES_MASTER_CSV", "data/processed/policies_master.csv")}
+
+def _pss_kb(key: str = "Pss") -> int:
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith(key + ":"):
+                return int(line.split()[1])
+    return 0
+
+def _touch(df: pd.DataFrame) -> None:
+    """Lê todos os valores sem materializar cópias (páginas mapeadas entram no PSS)."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    for c in df.columns:
+        s = df[c]
+        if isinstance(s.dtype, pd.StringDtype):
+            pc.sum(pc.utf8_length(pa.chunked_array(s.array.__arrow_array__())))
+        elif isinstance(s.dtype, pd.CategoricalDtype):
+            int(s.cat.codes.sum())
+        else:
+            s.sum()
+
+def _worker(env, barrier, queue) -> None:
+    os.environ.update(env)
+    from app.data_access.shared_tables import shared_frame
+
+    base = _pss_kb()
+    for name in TABLES:
+        _touch(shared_frame(name))
+    barrier.wait()          # todos carregados antes de medir (páginas compartilhadas contam)
+    queue.put(_pss_kb() - base)
+    barrier.wait()
+
+def _run(env, workers: int) -> int:
+    ctx = mp.get_context("spawn")
+    barrier, queue = ctx.Barrier(workers), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(env, barrier, queue)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    total = sum(queue.get() for _ in procs)
+    for p in procs:
+        p.join()
+    return total
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--scale", type=int, default=100, help="réplicas das linhas de cada tabela")
+    args = ap.parse_args(argv)
+    if not Path("/proc/self/smaps_rollup").exists():
+        print("precisa de /proc/self/smaps_rollup (Linux)")
+        return 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {"SHARED_TABLES_DIR": str(Path(tmp) / "shared"), "PYTHONPATH": str(ROOT)}
+        for name, (key, rel) in TABLES.items():
+            df = pd.read_csv(ROOT / rel, dtype=str)
+            out = Path(tmp) / f"{name}.csv"
+            pd.concat([df] * args.scale, ignore_index=True).to_csv(out, index=False)
+            env[key] = str(out)
+            print(f"{name}: {len(df) * args.scale:,} linhas ({out.stat().st_size / 2**20:.1f} MB csv)")
+
+        private = _run({**env, "SHARED_TABLES": "0"}, args.workers)
+        _run({**env, "SHARED_TABLES": "1"}, 1)              # publica antes de medir
+        shared = _run({**env, "SHARED_TABLES": "1"}, args.workers)
+
+    print(f"\n{args.workers} workers, PSS somado das tabelas:")
+    print(f"  cópia por processo: {private / 1024:8.1f} MB")
+    print(f"  Arrow mapeado:      {shared / 1024:8.1f} MB  ({100 * (1 - shared / private):.0f}% a menos)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
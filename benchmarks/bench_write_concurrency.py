@@ -0,0 +1,126 @@
+# benchmarks/bench_write_concurrency.py
+r"""
+Stress de escrita com vários processos no mesmo SQLite (como vários servidores
+Streamlit atrás de um balanceador).
+
+Cada processo carrega o db.py e executa uma mistura de log_event (com e sem
+requisitos), save_profile_for_account e update_profile_for_account. No fim,
+confere se todo evento confirmado está no banco (eventos perdidos = 0) e se
+nenhuma operação falhou com "database is locked".
+
+Modos:
+    atual   BEGIN IMMEDIATE + busy_timeout + novas tentativas com jitter
+    legado  transações DEFERRED (como antes; o lock do processo não vale entre processos)
+
+Uso:
+    python benchmarks/bench_write_concurrency.py --procs 8 --ops 2000
+    python benchmarks/bench_write_concurrency.py --procs 1 2 4 8 --mode atual legado
+"""
+from __future__ import annotations
+import argparse
+import importlib.util
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+DB_FILE = ROOT / "db.py"
+
+PROFILE = {"nome": "Fulana", "estado": "PA", "municipio": "Bragança", "rgp": True}
+
+def _load_db(db_path: Path, tag: str):
+    os.environ["DB_PATH"] = str(db_path)
+    spec = importlib.util.spec_from_file_location(f"db_bench_{tag}", DB_FILE)
+    mod = importlib.util.module_from_spec(spec)
+    assert spec and spec.loader
+    spec.loader.exec_module(mod)
+    return mod
+
+def _worker(db_path: str, mode: str, account_id: int, profile_id: int, ops: int, seed: int, start, out) -> None:
+    db = _load_db(Path(db_path), f"w{account_id}")
+    if mode == "legado":
+        db._begin_immediate = lambda cn: None  # volta ao BEGIN implícito (DEFERRED) do sqlite3
+    rnd = random.Random(seed)
+    done = {"events": 0, "profiles": 0, "updates": 0, "errors": 0}
+    start.wait()
+    t0 = time.perf_counter()
+    for i in range(ops):
+        r = rnd.random()
+        try:
+            if r < 0.7:
+                db.log_event(kind="matches" if i % 2 else "view", policy=f"P{i % 7}", uf="PA",
+                             municipio="Bragança", missing=["rgp"] if i % 2 else None)
+                done["events"] += 1
+            elif r < 0.9:
+                db.save_profile_for_account(account_id, PROFILE)
+                done["profiles"] += 1
+            else:
+                db.update_profile_for_account(profile_id, account_id, {**PROFILE, "i": i})
+                done["updates"] += 1
+        except Exception as e:  # conta e segue: o objetivo é medir falhas
+            done["errors"] += 1
+            done.setdefault("last_error", repr(e))
+    done["elapsed"] = time.perf_counter() - t0
+    db.get_pool().close()
+    out.put(done)
+
+def run(procs: int, ops: int, mode: str, workdir: Path, seed: int) -> None:
+    db_path = workdir / f"writes_{mode}_{procs}.db"
+    for suffix in ("", "-wal", "-shm", ".migrate.lock"):
+        Path(str(db_path) + suffix).unlink(missing_ok=True)
+    db = _load_db(db_path, "main")
+    db.run_migrations()
+    accounts = [db.create_person_account(f"Pessoa {i}", f"user{i}", "pbkdf2$x$y$z") for i in range(procs)]
+    profiles = [db.save_profile_for_account(a, PROFILE) for a in accounts]
+
+    ctx = mp.get_context("spawn")
+    start = ctx.Event()
+    out = ctx.Queue()
+    ps = [ctx.Process(target=_worker, args=(str(db_path), mode, a, p, ops, seed + i, start, out))
+          for i, (a, p) in enumerate(zip(accounts, profiles))]
+    for p in ps: p.start()
+    time.sleep(1.0)  # todos carregados antes da largada
+    t0 = time.perf_counter()
+    start.set()
+    results = [out.get() for _ in ps]
+    wall = time.perf_counter() - t0
+    for p in ps: p.join()
+
+    events = sum(r["events"] for r in results)
+    total_ops = sum(r["events"] + r["profiles"] + r["updates"] for r in results)
+    errors = sum(r["errors"] for r in results)
+    with db._read_conn() as cn:
+        stored = cn.execute("SELECT COUNT(*) FROM analytics_events").fetchone()[0]
+        dup = cn.execute("""SELECT COUNT(*) FROM (SELECT owner_account_id, version FROM profiles
+                            GROUP BY 1, 2 HAVING COUNT(*) > 1)""").fetchone()[0]
+    db.get_pool().close()
+    print(f"[{mode:<6}] {procs:>2} processos | {total_ops / wall:8.0f} ops/s | erros {errors:>5} | "
+          f"eventos confirmados {events:>7} gravados {stored:>7} perdidos {events - stored:>3} | "
+          f"versões duplicadas {dup}")
+    last = next((r["last_error"] for r in results if "last_error" in r), None)
+    if last:
+        print(f"         último erro: {last}")
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--procs", type=int, nargs="+", default=[8])
+    ap.add_argument("--ops", type=int, default=2_000, help="Operações por processo")
+    ap.add_argument("--mode", nargs="+", choices=["atual", "legado"], default=["legado", "atual"])
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--workdir", type=Path, default=None,
+                    help="Diretório para os .db temporários (padrão: tmp do sistema)")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="matupiri_bench_") as tmp:
+        workdir = args.workdir or Path(tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        for n in args.procs:
+            for mode in args.mode:
+                run(n, args.ops, mode, workdir, args.seed)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,37 +4,240 @@ from __future__ import annotations
 import os
 import hmac
 import json
+import heapq
+import queue
+import random
+import atexit
 import binascii
 import sqlite3
-from threading import Lock
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from threading import Condition, Event, Lock, Semaphore, Thread
 from pathlib import Path
 from datetime import datetime, timezone
 from contextlib import contextmanager
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 # ------------------------------------------------------------
 # Config
 # ------------------------------------------------------------
 DB_PATH = Path(os.environ.get("DB_PATH") or "infra/pp_platform.db")
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-_DB_LOCK = Lock()
+
+# Escritas: BEGIN IMMEDIATE (lock de escrita do próprio SQLite, vale entre processos)
+# com busy_timeout e, se ainda assim o banco estiver ocupado, novas tentativas com jitter
+_WRITE_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS") or 5_000)
+_WRITE_RETRIES = int(os.environ.get("DB_WRITE_RETRIES") or 8)
+_WRITE_BACKOFF_MS = float(os.environ.get("DB_WRITE_BACKOFF_MS") or 25)
+
+# Tamanho do pool e ajustes das conexões somente-leitura (sobrescrevíveis via env)
+_POOL_MAX_WRITERS = int(os.environ.get("DB_POOL_WRITERS") or 2)
+_POOL_MAX_READERS = int(os.environ.get("DB_POOL_READERS") or 8)
+_POOL_TIMEOUT_S = float(os.environ.get("DB_POOL_TIMEOUT") or 30)
+_READ_MMAP_BYTES = int(os.environ.get("DB_READ_MMAP_MB") or 256) * 1024 * 1024
+_READ_CACHE_KB = int(os.environ.get("DB_READ_CACHE_MB") or 64) * 1024
+
+# Ingestão de analytics em lote (opcional; desligada por padrão)
+_ANALYTICS_BUFFERED = (os.environ.get("ANALYTICS_BUFFERED") or "").strip().lower() in {"1", "true", "sim", "yes"}
+_ANALYTICS_BATCH_SIZE = int(os.environ.get("ANALYTICS_BATCH_SIZE") or 200)
+_ANALYTICS_FLUSH_MS = int(os.environ.get("ANALYTICS_FLUSH_MS") or 500)
+_ANALYTICS_QUEUE_MAX = int(os.environ.get("ANALYTICS_QUEUE_MAX") or 10_000)
+_ANALYTICS_BACKPRESSURE = (os.environ.get("ANALYTICS_BACKPRESSURE") or "block").strip().lower()  # block|drop|spill
+_ANALYTICS_SPILL_PATH = os.environ.get("ANALYTICS_SPILL_PATH")  # padrão: <DB_PATH>.events.jsonl
+
+# Partições mensais de analytics: meses fechados saem do banco principal para arquivos mortos
+_ANALYTICS_ARCHIVE_DIR = os.environ.get("ANALYTICS_ARCHIVE_DIR")  # padrão: <pasta do DB>/analytics_archive
+_ANALYTICS_HOT_MONTHS = int(os.environ.get("ANALYTICS_HOT_MONTHS") or 2)  # mês atual + anterior
+_ANALYTICS_RETENTION_MONTHS = int(os.environ.get("ANALYTICS_RETENTION_MONTHS") or 0)  # 0 = sem limite
 
 # ------------------------------------------------------------
-# Conexão
+# Conexão (pool de conexões persistentes)
 # ------------------------------------------------------------
+class ConnectionPool:
+    """
+    Pool limitado de conexões SQLite de vida longa.
+    - "write": conexões de escrita (WAL, synchronous=NORMAL, foreign_keys).
+    - "read": conexões somente-leitura (query_only, mmap e cache maiores).
+    As PRAGMAs são emitidas uma única vez, na abertura de cada conexão.
+    """
+
+    MODES = ("write", "read")
+
+    def __init__(self, path: Path | str, max_writers: int = _POOL_MAX_WRITERS,
+                 max_readers: int = _POOL_MAX_READERS, timeout: float = _POOL_TIMEOUT_S):
+        self.path = Path(path)
+        self.timeout = timeout
+        self._limits = {"write": max(1, max_writers), "read": max(1, max_readers)}
+        self._idle: Dict[str, List[sqlite3.Connection]] = {m: [] for m in self.MODES}
+        self._open_count = {m: 0 for m in self.MODES}
+        self._in_use = {m: 0 for m in self.MODES}
+        self._stats = {"opened": 0, "reused": 0, "waits": 0, "discarded": 0, "closed": 0}
+        self._cond = Condition(Lock())
+        self._closed = False
+
+    def _open(self, mode: str) -> sqlite3.Connection:
+        cn = sqlite3.connect(self.path, check_same_thread=False, timeout=self.timeout)
+        cn.row_factory = sqlite3.Row
+        if mode == "write":
+            cn.execute("PRAGMA journal_mode=WAL;")
+            cn.execute("PRAGMA synchronous=NORMAL;")
+            cn.execute("PRAGMA foreign_keys=ON;")
+            cn.execute(f"PRAGMA busy_timeout={_WRITE_BUSY_TIMEOUT_MS};")
+        else:
+            cn.execute("PRAGMA query_only=ON;")
+            cn.execute(f"PRAGMA mmap_size={_READ_MMAP_BYTES};")
+            cn.execute(f"PRAGMA cache_size=-{_READ_CACHE_KB};")
+        return cn
+
+    def acquire(self, mode: str = "write") -> sqlite3.Connection:
+        if mode not in self.MODES:
+            raise ValueError(f"Modo de conexão inválido: {mode!r}")
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Pool de conexões já foi fechado.")
+            waited = False
+            while not self._idle[mode] and self._open_count[mode] >= self._limits[mode]:
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                if not self._cond.wait(timeout=self.timeout):
+                    raise TimeoutError(f"Sem conexão '{mode}' livre após {self.timeout}s.")
+            if self._idle[mode]:
+                self._stats["reused"] += 1
+                self._in_use[mode] += 1
+                return self._idle[mode].pop()
+            self._open_count[mode] += 1
+            self._in_use[mode] += 1
+        try:
+            cn = self._open(mode)
+        except Exception:
+            with self._cond:
+                self._open_count[mode] -= 1
+                self._in_use[mode] -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["opened"] += 1
+        return cn
+
+    def release(self, cn: sqlite3.Connection, mode: str = "write", broken: bool = False) -> None:
+        if not broken and cn.in_transaction:
+            try:
+                cn.rollback()
+            except sqlite3.Error:
+                broken = True
+        with self._cond:
+            self._in_use[mode] -= 1
+            if broken or self._closed:
+                self._open_count[mode] -= 1
+                self._stats["discarded" if broken else "closed"] += 1
+                cn.close()
+            else:
+                self._idle[mode].append(cn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, mode: str = "write") -> Iterator[sqlite3.Connection]:
+        cn = self.acquire(mode)
+        broken = False
+        try:
+            yield cn
+        except sqlite3.DatabaseError as e:
+            # conexões com erro de banco/arquivo (ex.: imagem corrompida) não voltam para o pool
+            broken = not isinstance(e, (sqlite3.IntegrityError, sqlite3.ProgrammingError,
+                                        sqlite3.OperationalError))
+            raise
+        finally:
+            self.release(cn, mode, broken=broken)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "path": str(self.path),
+                **self._stats,
+                "open": dict(self._open_count),
+                "in_use": dict(self._in_use),
+                "idle": {m: len(v) for m, v in self._idle.items()},
+                "limits": dict(self._limits),
+            }
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            for mode, conns in self._idle.items():
+                for cn in conns:
+                    cn.close()
+                    self._stats["closed"] += 1
+                self._open_count[mode] -= len(conns)
+                conns.clear()
+            self._cond.notify_all()
+
+_POOL: Optional[ConnectionPool] = None
+_POOL_LOCK = Lock()
+
+def get_pool() -> ConnectionPool:
+    """Pool do processo; recriado se DB_PATH mudar (ex.: testes)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None or _POOL.path != Path(DB_PATH):
+            if _POOL is not None:
+                _POOL.close()
+            _POOL = ConnectionPool(DB_PATH)
+        return _POOL
+
+def set_pool(pool: ConnectionPool) -> None:
+    """Instala um pool externo (ex.: st.cache_resource no bridge)."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None and _POOL is not pool:
+            _POOL.close()
+        _POOL = pool
+
+def pool_stats() -> Dict[str, Any]:
+    return get_pool().stats()
+
 @contextmanager
 def _conn():
-    cn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    cn.row_factory = sqlite3.Row
-    # PRAGMAs para desempenho e integridade
-    cn.execute("PRAGMA journal_mode=WAL;")
-    cn.execute("PRAGMA synchronous=NORMAL;")
-    cn.execute("PRAGMA foreign_keys=ON;")
-    try:
+    """Conexão de escrita do pool; commit ao sair, rollback em erro."""
+    with get_pool().connection("write") as cn:
+        try:
+            yield cn
+            cn.commit()
+        except BaseException:
+            cn.rollback()
+            raise
+
+def _is_busy(e: sqlite3.OperationalError) -> bool:
+    msg = str(e).lower()
+    return "locked" in msg or "busy" in msg
+
+def _begin_immediate(cn: sqlite3.Connection) -> None:
+    """
+    Abre a transação já com o lock de escrita. O busy_timeout cobre a espera comum;
+    se estourar, tenta de novo com backoff exponencial e jitter (evita rajadas em fila).
+    """
+    for attempt in range(_WRITE_RETRIES + 1):
+        try:
+            cn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e) or attempt == _WRITE_RETRIES:
+                raise
+            time.sleep(random.uniform(0, _WRITE_BACKOFF_MS * (2 ** min(attempt, 6))) / 1000)
+
+@contextmanager
+def _write():
+    """Transação de escrita (BEGIN IMMEDIATE); commit ao sair, rollback em erro."""
+    with _conn() as cn:
+        _begin_immediate(cn)
+        yield cn
+
+@contextmanager
+def _read_conn():
+    """Conexão somente-leitura do pool (query_only)."""
+    with get_pool().connection("read") as cn:
         yield cn
-        cn.commit()
-    finally:
-        cn.close()
 
 # ------------------------------------------------------------
 # Util: tempo e normalização
@@ -45,10 +248,100 @@ def _now_iso() -> str:
 def _norm_str(s: Optional[str]) -> Optional[str]:
     return s.strip() if isinstance(s, str) else s
 
+def _iso_to_ms(iso: Optional[str]) -> Optional[int]:
+    """ISO-8601 → epoch em milissegundos (sem fuso = UTC)."""
+    if not iso:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(iso).strip())
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+# Chaves de filtro do Observatório (mesma normalização na escrita e na consulta)
+def _key_upper(s: Optional[str]) -> str:
+    return s.strip().upper() if isinstance(s, str) else ""
+
+def _key_lower(s: Optional[str]) -> str:
+    return s.strip().lower() if isinstance(s, str) else ""
+
 # ------------------------------------------------------------
 # Util: senha PBKDF2
 # ------------------------------------------------------------
-_PBKDF2_ITER = 130_000
+_PBKDF2_ITER = int(os.environ.get("PBKDF2_ITER") or 130_000)
+
+# Hash de senha fora da thread do script, com concorrência limitada (sobrescrevíveis via env):
+# AUTH_HASH_WORKERS hashes em paralelo, até AUTH_HASH_QUEUE esperando; além disso, AuthBusyError.
+_AUTH_HASH_WORKERS = int(os.environ.get("AUTH_HASH_WORKERS") or min(4, os.cpu_count() or 1))
+_AUTH_HASH_QUEUE = int(os.environ.get("AUTH_HASH_QUEUE") or 32)
+_AUTH_HASH_WAIT_S = float(os.environ.get("AUTH_HASH_WAIT_S") or 10)
+
+class AuthBusyError(RuntimeError):
+    """Muitos logins/cadastros simultâneos: a fila de hash de senha está cheia."""
+
+class _HashExecutor:
+    """
+    Executor limitado para o PBKDF2 (o hashlib libera o GIL durante o cálculo).
+    Vagas = workers + fila; sem vaga, recusa na hora em vez de enfileirar sem fim.
+    """
+
+    def __init__(self, workers: int = _AUTH_HASH_WORKERS, queue_max: int = _AUTH_HASH_QUEUE,
+                 wait_s: float = _AUTH_HASH_WAIT_S):
+        self.workers = max(1, int(workers))
+        self.wait_s = float(wait_s)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pbkdf2")
+        self._slots = Semaphore(self.workers + max(0, int(queue_max)))
+        self._lock = Lock()
+        self._stats = {"submitted": 0, "rejected": 0, "timeouts": 0}
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise AuthBusyError("Servidor ocupado validando senhas; tente novamente em instantes.")
+
+        def task() -> Any:
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()  # antes do resultado: quem recebe já encontra a vaga livre
+
+        try:
+            fut = self._pool.submit(task)
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats["submitted"] += 1
+        try:
+            return fut.result(timeout=self.wait_s)
+        except FutureTimeoutError:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            raise AuthBusyError("Tempo esgotado validando a senha; tente novamente em instantes.")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "workers": self.workers}
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+_HASHER: Optional[_HashExecutor] = None
+_HASHER_LOCK = Lock()
+
+def _hasher() -> _HashExecutor:
+    global _HASHER
+    with _HASHER_LOCK:
+        if _HASHER is None:
+            _HASHER = _HashExecutor()
+            atexit.register(_HASHER.shutdown)
+        return _HASHER
+
+def auth_hash_stats() -> Dict[str, Any]:
+    return _hasher().stats()
 
 def _pbkdf2(password: str, salt: bytes, iters: int = _PBKDF2_ITER) -> bytes:
     from hashlib import pbkdf2_hmac
@@ -56,7 +349,7 @@ def _pbkdf2(password: str, salt: bytes, iters: int = _PBKDF2_ITER) -> bytes:
 
 def _hash_password(password: str) -> str:
     salt = os.urandom(16)
-    dk = _pbkdf2(password, salt)
+    dk = _pbkdf2(password, salt, _PBKDF2_ITER)
     return f"pbkdf2${_PBKDF2_ITER}${binascii.hexlify(salt).decode()}${binascii.hexlify(dk).decode()}"
 
 def _verify_password(password: str, stored: str) -> bool:
@@ -75,133 +368,437 @@ def _verify_password(password: str, stored: str) -> bool:
 def _is_pbkdf2_hash(s: str) -> bool:
     return isinstance(s, str) and s.startswith("pbkdf2$")
 
+def _needs_rehash(stored: str) -> bool:
+    """Hash gravado com outro número de iterações (ex.: _PBKDF2_ITER aumentou)."""
+    try:
+        return int(stored.split("$")[1]) != _PBKDF2_ITER
+    except (IndexError, ValueError):
+        return False
+
 # ------------------------------------------------------------
 # Schema & Migrações
 # ------------------------------------------------------------
-def init_db() -> None:
+def _step_base_schema(cn: sqlite3.Connection) -> None:
     """Cria tabelas base (idempotente)."""
-    with _conn() as cn:
-        cur = cn.cursor()
-
-        # Usuários "legados" (se usados por alguma parte do app)
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id TEXT PRIMARY KEY,
-            name TEXT,
-            created_at TEXT
-        )
-        """)
+    cur = cn.cursor()
 
-        # Contas (pessoa/collectivo) para login
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS accounts (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            kind TEXT CHECK(kind IN ('person','collective')) NOT NULL,
-            username TEXT UNIQUE,        -- login pessoa
-            display_name TEXT,           -- nome exibido para pessoa
-            cnpj TEXT UNIQUE,            -- login coletivo
-            contact TEXT,                -- contato coletivo
-            password_hash TEXT NOT NULL,
-            created_at TEXT
-        )
-        """)
+    # Usuários "legados" (se usados por alguma parte do app)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        created_at TEXT
+    )
+    """)
 
-        # Perfis salvos (dados de cadastro)
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS profiles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT,                -- legado (pode ficar vazio)
-            profile_json TEXT,
-            version INTEGER DEFAULT 1,
-            created_at TEXT,
-            updated_at TEXT,
-            owner_account_id INTEGER     -- vínculo com accounts.id
-        )
-        """)
+    # Contas (pessoa/collectivo) para login
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS accounts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT CHECK(kind IN ('person','collective')) NOT NULL,
+        username TEXT UNIQUE,        -- login pessoa
+        display_name TEXT,           -- nome exibido para pessoa
+        cnpj TEXT UNIQUE,            -- login coletivo
+        contact TEXT,                -- contato coletivo
+        password_hash TEXT NOT NULL,
+        created_at TEXT
+    )
+    """)
 
-        # Resultados de elegibilidade (opcional)
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS eligibility_results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT,
-            profile_id INTEGER,
-            desired_policy TEXT,
-            matched_policies_json TEXT,
-            gaps_json TEXT,
-            created_at TEXT
-        )
+    # Perfis salvos (dados de cadastro)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS profiles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT,                -- legado (pode ficar vazio)
+        profile_json TEXT,
+        version INTEGER DEFAULT 1,
+        created_at TEXT,
+        updated_at TEXT,
+        owner_account_id INTEGER     -- vínculo com accounts.id
+    )
+    """)
+
+    # Resultados de elegibilidade (opcional)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS eligibility_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id TEXT,
+        profile_id INTEGER,
+        desired_policy TEXT,
+        matched_policies_json TEXT,
+        gaps_json TEXT,
+        created_at TEXT
+    )
+    """)
+
+    # Analytics para Observatório
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS analytics_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts TEXT NOT NULL,
+        kind TEXT NOT NULL,          -- 'search','view','matches','eligible'
+        policy TEXT,
+        uf TEXT,
+        municipio TEXT,
+        query TEXT,
+        gender TEXT,
+        met_json TEXT,               -- legado: requisitos agora em analytics_event_requirements
+        missing_json TEXT,
+        extras_json TEXT,
+        ts_ms INTEGER,               -- ts em epoch (ms) para filtros por intervalo
+        uf_norm TEXT,                -- chaves normalizadas (gravadas no log_event)
+        municipio_norm TEXT,
+        gender_norm TEXT
+    )
+    """)
+    cur.execute(_EVENT_REQUIREMENTS_DDL)
+
+def _step_account_links(cn: sqlite3.Connection) -> None:
+    """Garante colunas de contas e vínculo com perfis."""
+    cur = cn.cursor()
+    # tabela accounts já criada em init_db; aqui garantimos que existe
+    cur.execute("PRAGMA table_info(accounts)")
+    # vínculo owner_account_id em profiles
+    cols = [r[1] for r in cn.execute("PRAGMA table_info(profiles)").fetchall()]
+    if "owner_account_id" not in cols:
+        cur.execute("ALTER TABLE profiles ADD COLUMN owner_account_id INTEGER;")
+
+_ANALYTICS_KEY_COLUMNS = (
+    ("ts_ms", "INTEGER"),
+    ("uf_norm", "TEXT"),
+    ("municipio_norm", "TEXT"),
+    ("gender_norm", "TEXT"),
+)
+
+_ANALYTICS_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_events_ts ON analytics_events (ts_ms)",
+    "CREATE INDEX IF NOT EXISTS ix_events_kind_ts ON analytics_events (kind, ts_ms)",
+    "CREATE INDEX IF NOT EXISTS ix_events_uf_ts ON analytics_events (uf_norm, ts_ms)",
+    "CREATE INDEX IF NOT EXISTS ix_events_region_ts ON analytics_events (uf_norm, municipio_norm, ts_ms)",
+    "CREATE INDEX IF NOT EXISTS ix_events_gender_ts ON analytics_events (gender_norm, ts_ms)",
+)
+
+# Requisitos atendidos/faltantes de cada evento (antes em met_json/missing_json)
+_EVENT_REQUIREMENTS_DDL = """
+    CREATE TABLE IF NOT EXISTS analytics_event_requirements (
+        event_id INTEGER NOT NULL REFERENCES analytics_events(id) ON DELETE CASCADE,
+        status TEXT NOT NULL,             -- 'met' | 'missing'
+        position INTEGER NOT NULL,        -- ordem original na lista
+        requirement TEXT NOT NULL,
+        PRIMARY KEY (event_id, status, position)
+    ) WITHOUT ROWID
+"""
+
+_EVENT_REQUIREMENTS_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_event_req_status ON analytics_event_requirements (status, requirement)",
+    # eventos cujo JSON ainda não foi movido para a tabela filha (vazio após o backfill)
+    "CREATE INDEX IF NOT EXISTS ix_events_pending_reqs ON analytics_events (id) "
+    "WHERE met_json IS NOT NULL OR missing_json IS NOT NULL",
+)
+
+# Rollups diários (dia × região × kind × política × gênero) mantidos por catch-up incremental.
+# Chaves ausentes são gravadas como '' (e ignoradas nos rankings).
+_ROLLUP_DDL = (
+    """
+    CREATE TABLE IF NOT EXISTS analytics_rollup_daily (
+        day_ms INTEGER NOT NULL,          -- início do dia (UTC) em epoch ms
+        kind TEXT NOT NULL,
+        uf TEXT NOT NULL,
+        municipio TEXT NOT NULL,
+        policy TEXT NOT NULL,
+        gender TEXT NOT NULL,
+        uf_norm TEXT NOT NULL,
+        municipio_norm TEXT NOT NULL,
+        gender_norm TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (day_ms, kind, uf, municipio, policy, gender)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS analytics_rollup_requirements (
+        day_ms INTEGER NOT NULL,
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL,             -- 'met' | 'missing'
+        requirement TEXT NOT NULL,
+        uf TEXT NOT NULL,
+        municipio TEXT NOT NULL,
+        gender TEXT NOT NULL,
+        uf_norm TEXT NOT NULL,
+        municipio_norm TEXT NOT NULL,
+        gender_norm TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (day_ms, kind, status, requirement, uf, municipio, gender)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS analytics_rollup_state (
+        name TEXT PRIMARY KEY,
+        last_event_id INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_rollup_daily_uf ON analytics_rollup_daily (uf_norm, day_ms)",
+    "CREATE INDEX IF NOT EXISTS ix_rollup_daily_region ON analytics_rollup_daily (uf_norm, municipio_norm, day_ms)",
+    "CREATE INDEX IF NOT EXISTS ix_rollup_req_uf ON analytics_rollup_requirements (uf_norm, day_ms)",
+)
+
+def _step_analytics_keys(cn: sqlite3.Connection) -> None:
+    """Tabela de eventos, chaves normalizadas (ts_ms/*_norm) e índices."""
+    cur = cn.cursor()
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS analytics_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        ts TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        policy TEXT,
+        uf TEXT,
+        municipio TEXT,
+        query TEXT,
+        gender TEXT,
+        met_json TEXT,
+        missing_json TEXT,
+        extras_json TEXT
+    )
+    """)
+    # Backfills tolerantes (não falham se já existem)
+    try: cur.execute("ALTER TABLE analytics_events ADD COLUMN gender TEXT")
+    except Exception: pass
+    try: cur.execute("ALTER TABLE analytics_events ADD COLUMN met_json TEXT")
+    except Exception: pass
+    try: cur.execute("ALTER TABLE analytics_events ADD COLUMN missing_json TEXT")
+    except Exception: pass
+
+    # Chaves pré-normalizadas + epoch: permitem range scans por índice
+    cols = {r[1] for r in cur.execute("PRAGMA table_info(analytics_events)").fetchall()}
+    for col, typ in _ANALYTICS_KEY_COLUMNS:
+        if col not in cols:
+            cur.execute(f"ALTER TABLE analytics_events ADD COLUMN {col} {typ}")
+    _backfill_analytics_keys(cn)
+    for ddl in _ANALYTICS_INDEXES:
+        cur.execute(ddl)
+    # estatísticas aproximadas para o planner escolher o índice certo
+    cur.execute("PRAGMA analysis_limit=1000")
+    cur.execute("ANALYZE analytics_events")
+
+def _step_event_requirements(cn: sqlite3.Connection) -> None:
+    """Requisitos em tabela filha + migração dos JSON antigos."""
+    cn.execute(_EVENT_REQUIREMENTS_DDL)
+    for ddl in _EVENT_REQUIREMENTS_INDEXES:
+        cn.execute(ddl)
+    _backfill_event_requirements(cn)
+
+def _step_rollups(cn: sqlite3.Connection) -> None:
+    """Tabelas de rollup do Observatório."""
+    for ddl in _ROLLUP_DDL:
+        cn.execute(ddl)
+
+# Versão por conta/usuário: UNIQUE torna a numeração livre de corrida sem lock em Python
+_PROFILE_INDEXES = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_profiles_owner_version ON profiles (owner_account_id, version DESC)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_profiles_user_version ON profiles (user_id, version DESC) "
+    "WHERE owner_account_id IS NULL",
+)
+
+def _step_profile_versions(cn: sqlite3.Connection) -> None:
+    """Renumera versões duplicadas (ordem: versão, id) e cria os índices únicos de perfis."""
+    for key, scope in (("owner_account_id", "owner_account_id IS NOT NULL"),
+                       ("user_id", "owner_account_id IS NULL AND user_id IS NOT NULL")):
+        cn.execute(f"""
+            UPDATE profiles
+               SET version = (
+                   SELECT rn FROM (
+                       SELECT id, ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY version, id) AS rn
+                         FROM profiles WHERE {scope}
+                   ) t WHERE t.id = profiles.id)
+             WHERE {scope} AND {key} IN (
+                   SELECT {key} FROM profiles WHERE {scope}
+                    GROUP BY {key} HAVING COUNT(*) <> COUNT(DISTINCT version) OR SUM(version IS NULL) > 0)
         """)
+    for ddl in _PROFILE_INDEXES:
+        cn.execute(ddl)
 
-        # Analytics para Observatório
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS analytics_events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ts TEXT NOT NULL,
-            kind TEXT NOT NULL,          -- 'search','view','matches','eligible'
-            policy TEXT,
-            uf TEXT,
-            municipio TEXT,
-            query TEXT,
-            gender TEXT,
-            met_json TEXT,               -- requisitos atendidos
-            missing_json TEXT,           -- requisitos faltantes
-            extras_json TEXT
+_PARTITIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS analytics_partitions (
+        month TEXT PRIMARY KEY,           -- 'YYYY-MM' (UTC)
+        path TEXT NOT NULL,               -- arquivo SQLite do mês (relativo ao diretório de arquivo)
+        start_ms INTEGER NOT NULL,        -- [start_ms, end_ms)
+        end_ms INTEGER NOT NULL,
+        events INTEGER NOT NULL,
+        parquet_path TEXT,
+        archived_at TEXT
+    )
+"""
+
+def _step_analytics_partitions(cn: sqlite3.Connection) -> None:
+    """Catálogo das partições mensais arquivadas."""
+    cn.execute(_PARTITIONS_DDL)
+
+def _backfill_analytics_keys(cn: sqlite3.Connection, chunk: int = 50_000) -> int:
+    """Preenche ts_ms/*_norm de eventos antigos (em lotes; idempotente)."""
+    done = 0
+    while True:
+        rows = cn.execute("""
+            SELECT id, ts, uf, municipio, gender FROM analytics_events
+             WHERE ts_ms IS NULL LIMIT ?
+        """, (chunk,)).fetchall()
+        if not rows:
+            return done
+        cn.executemany(
+            "UPDATE analytics_events SET ts_ms=?, uf_norm=?, municipio_norm=?, gender_norm=? WHERE id=?",
+            [(_iso_to_ms(r["ts"]) or 0, _key_upper(r["uf"]), _key_lower(r["municipio"]),
+              _key_lower(r["gender"]), r["id"]) for r in rows],
         )
-        """)
+        done += len(rows)
+
+def _backfill_event_requirements(cn: sqlite3.Connection, chunk: int = 50_000) -> int:
+    """
+    Move met_json/missing_json de eventos antigos para analytics_event_requirements
+    (em lotes de ids; idempotente: o JSON é zerado depois de copiado).
+    """
+    done = 0
+    while True:
+        ids = [r[0] for r in cn.execute("""
+            SELECT id FROM analytics_events
+             WHERE met_json IS NOT NULL OR missing_json IS NOT NULL
+             ORDER BY id LIMIT ?
+        """, (chunk,))]
+        if not ids:
+            return done
+        lo, hi = ids[0], ids[-1]
+        for status, col in (("met", "met_json"), ("missing", "missing_json")):
+            cn.execute(f"""
+                INSERT OR IGNORE INTO analytics_event_requirements (event_id, status, position, requirement)
+                SELECT e.id, ?, CAST(j.key AS INTEGER), CAST(j.value AS TEXT)
+                  FROM analytics_events e,
+                       json_each(CASE WHEN json_valid(e.{col}) THEN e.{col} ELSE '[]' END) j
+                 WHERE e.id BETWEEN ? AND ? AND e.{col} IS NOT NULL AND j.value IS NOT NULL
+            """, (status, lo, hi))
+        cn.execute("""
+            UPDATE analytics_events SET met_json=NULL, missing_json=NULL
+             WHERE id BETWEEN ? AND ? AND (met_json IS NOT NULL OR missing_json IS NOT NULL)
+        """, (lo, hi))
+        done += len(ids)
+
+def _step_profile_timestamps(cn: sqlite3.Connection) -> None:
+    """Pequenas migrações em perfis (created_at/updated_at)."""
+    cur = cn.cursor()
+    cols = [r[1] for r in cur.execute("PRAGMA table_info(profiles)").fetchall()]
+    if "updated_at" not in cols:
+        cur.execute("ALTER TABLE profiles ADD COLUMN updated_at TEXT;")
+    if "created_at" not in cols:
+        cur.execute("ALTER TABLE profiles ADD COLUMN created_at TEXT;")
+    # Preenche campos vazios
+    now = _now_iso()
+    cur.execute("""
+        UPDATE profiles
+           SET updated_at = COALESCE(updated_at, created_at, ?),
+               created_at = COALESCE(created_at, ?)
+         WHERE updated_at IS NULL OR updated_at='' OR created_at IS NULL OR created_at='';
+    """, (now, now))
+
+# ------------------------------------------------------------
+# Migrações versionadas (PRAGMA user_version)
+# ------------------------------------------------------------
+# Cada passo é idempotente (bancos antigos, com user_version=0, já podem ter parte
+# do esquema). Novos passos entram sempre no fim, com o próximo número.
+_MIGRATIONS: Tuple[Tuple[int, Callable[[sqlite3.Connection], None]], ...] = (
+    (1, _step_base_schema),
+    (2, _step_profile_timestamps),
+    (3, _step_account_links),
+    (4, _step_analytics_keys),
+    (5, _step_event_requirements),
+    (6, _step_rollups),
+    (7, _step_profile_versions),
+    (8, _step_analytics_partitions),
+)
+SCHEMA_VERSION = _MIGRATIONS[-1][0]
+
+_MIGRATED: Dict[str, int] = {}   # caminho do banco → versão, já conferida neste processo
+_MIGRATE_LOCK = Lock()
+
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """Lock exclusivo entre processos (fcntl no POSIX, msvcrt no Windows)."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK desiste após ~10s; continua esperando
+                    time.sleep(0.1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def schema_version() -> int:
+    with _read_conn() as cn:
+        return int(cn.execute("PRAGMA user_version").fetchone()[0])
+
+def run_migrations() -> int:
+    """
+    Leva o banco até SCHEMA_VERSION e retorna a versão final.
+    - Esquema em dia: custa uma leitura de PRAGMA user_version (e nada nas chamadas seguintes
+      do mesmo processo).
+    - Pendências: sob lock de arquivo (<DB_PATH>.migrate.lock), aplica só os passos acima de
+      user_version numa única transação, junto com o novo user_version.
+    """
+    key = str(Path(DB_PATH).resolve())
+    done = _MIGRATED.get(key)
+    if done is not None:
+        return done
+    with _MIGRATE_LOCK:
+        if key in _MIGRATED:
+            return _MIGRATED[key]
+        current = schema_version()
+        if current < SCHEMA_VERSION:
+            with _file_lock(Path(str(DB_PATH) + ".migrate.lock")):
+                with _write() as cn:
+                    current = int(cn.execute("PRAGMA user_version").fetchone()[0])
+                    for version, step in _MIGRATIONS:
+                        if version > current:
+                            step(cn)
+                    if current < SCHEMA_VERSION:
+                        cn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                        current = SCHEMA_VERSION
+        _MIGRATED[key] = current
+        return current
+
+# ---- Wrappers compatíveis (prefira run_migrations) ----
+def init_db() -> None:
+    """Cria tabelas base (idempotente)."""
+    with _conn() as cn:
+        _step_base_schema(cn)
+
+def migrate_db() -> None:
+    """Pequenas migrações em perfis (created_at/updated_at)."""
+    with _conn() as cn:
+        _step_profile_timestamps(cn)
 
 def migrate_accounts() -> None:
     """Garante colunas de contas e vínculo com perfis."""
     with _conn() as cn:
-        cur = cn.cursor()
-        # tabela accounts já criada em init_db; aqui garantimos que existe
-        cur.execute("PRAGMA table_info(accounts)")
-        # vínculo owner_account_id em profiles
-        cols = [r[1] for r in cn.execute("PRAGMA table_info(profiles)").fetchall()]
-        if "owner_account_id" not in cols:
-            cur.execute("ALTER TABLE profiles ADD COLUMN owner_account_id INTEGER;")
+        _step_account_links(cn)
 
 def migrate_analytics() -> None:
     """Garante colunas/estrutura de analytics."""
     with _conn() as cn:
-        cur = cn.cursor()
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS analytics_events (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            ts TEXT NOT NULL,
-            kind TEXT NOT NULL,
-            policy TEXT,
-            uf TEXT,
-            municipio TEXT,
-            query TEXT,
-            gender TEXT,
-            met_json TEXT,
-            missing_json TEXT,
-            extras_json TEXT
-        )
-        """)
-        # Backfills tolerantes (não falham se já existem)
-        try: cur.execute("ALTER TABLE analytics_events ADD COLUMN gender TEXT")
-        except Exception: pass
-        try: cur.execute("ALTER TABLE analytics_events ADD COLUMN met_json TEXT")
-        except Exception: pass
-
-def migrate_db() -> None:
-    """Pequenas migrações em perfis (created_at/updated_at)."""
-    with _conn() as cn:
-        cur = cn.cursor()
-        cols = [r[1] for r in cur.execute("PRAGMA table_info(profiles)").fetchall()]
-        if "updated_at" not in cols:
-            cur.execute("ALTER TABLE profiles ADD COLUMN updated_at TEXT;")
-        if "created_at" not in cols:
-            cur.execute("ALTER TABLE profiles ADD COLUMN created_at TEXT;")
-        # Preenche campos vazios
-        now = _now_iso()
-        cur.execute("""
-            UPDATE profiles
-               SET updated_at = COALESCE(updated_at, created_at, ?),
-                   created_at = COALESCE(created_at, ?)
-             WHERE updated_at IS NULL OR updated_at='' OR created_at IS NULL OR created_at='';
-        """, (now, now))
+        _step_analytics_keys(cn)
+        _step_event_requirements(cn)
+        _step_rollups(cn)
+        _step_analytics_partitions(cn)
 
 # ------------------------------------------------------------
 # Accounts (pessoa / coletivo)
@@ -212,100 +809,116 @@ def create_person_account(name: str, username: str, password_or_hash: str) -> in
     - Se receber senha em texto, gera PBKDF2.
     - Se receber hash PBKDF2 (pbkdf2$...), salva direto (compat bridge).
     """
-    pw_hash = password_or_hash if _is_pbkdf2_hash(password_or_hash) else _hash_password(password_or_hash)
-    with _DB_LOCK:
-        with _conn() as cn:
-            cur = cn.execute("""
-                INSERT INTO accounts (kind, username, display_name, password_hash, created_at)
-                VALUES ('person', ?, ?, ?, ?)
-            """, (username, name, pw_hash, _now_iso()))
-            rid = cur.lastrowid or cn.execute("SELECT last_insert_rowid()").fetchone()[0]
-            return int(rid)
+    pw_hash = password_or_hash if _is_pbkdf2_hash(password_or_hash) else _hasher().run(_hash_password, password_or_hash)
+    with _write() as cn:
+        cur = cn.execute("""
+            INSERT INTO accounts (kind, username, display_name, password_hash, created_at)
+            VALUES ('person', ?, ?, ?, ?)
+        """, (username, name, pw_hash, _now_iso()))
+        rid = cur.lastrowid or cn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return int(rid)
 
 def create_collective_account(cnpj: str, contact: str, password_or_hash: str) -> int:
-    pw_hash = password_or_hash if _is_pbkdf2_hash(password_or_hash) else _hash_password(password_or_hash)
-    with _DB_LOCK:
-        with _conn() as cn:
-            cur = cn.execute("""
-                INSERT INTO accounts (kind, cnpj, contact, password_hash, created_at)
-                VALUES ('collective', ?, ?, ?, ?)
-            """, (cnpj, contact, pw_hash, _now_iso()))
-            rid = cur.lastrowid or cn.execute("SELECT last_insert_rowid()").fetchone()[0]
-            return int(rid)
+    pw_hash = password_or_hash if _is_pbkdf2_hash(password_or_hash) else _hasher().run(_hash_password, password_or_hash)
+    with _write() as cn:
+        cur = cn.execute("""
+            INSERT INTO accounts (kind, cnpj, contact, password_hash, created_at)
+            VALUES ('collective', ?, ?, ?, ?)
+        """, (cnpj, contact, pw_hash, _now_iso()))
+        rid = cur.lastrowid or cn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return int(rid)
+
+def _check_password(account_id: int, stored: str, password_or_hash: str) -> bool:
+    """
+    Confere a senha (no executor de hash) e, se o hash gravado usa outro número de
+    iterações, regrava-o com _PBKDF2_ITER. A regravação é best-effort: nunca derruba o login.
+    """
+    if _is_pbkdf2_hash(password_or_hash):
+        return hmac.compare_digest(stored, password_or_hash)
+    if not _hasher().run(_verify_password, password_or_hash, stored):
+        return False
+    if _needs_rehash(stored):
+        try:
+            new_hash = _hasher().run(_hash_password, password_or_hash)
+            with _write() as cn:
+                # só troca se ninguém mudou a senha no meio tempo
+                cn.execute("UPDATE accounts SET password_hash=? WHERE id=? AND password_hash=?",
+                           (new_hash, account_id, stored))
+        except (AuthBusyError, sqlite3.Error):
+            pass
+    return True
 
 def authenticate_person(username: str, password_or_hash: str):
-    with _conn() as cn:
+    """Login de pessoa. Levanta AuthBusyError se a fila de hash estiver cheia."""
+    with _read_conn() as cn:
         row = cn.execute("""
             SELECT id, kind, username, display_name, password_hash
               FROM accounts WHERE kind='person' AND username=?
         """, (username,)).fetchone()
-        if not row:
-            return None
-        stored = row["password_hash"] or ""
-        if _is_pbkdf2_hash(password_or_hash):
-            ok = hmac.compare_digest(stored, password_or_hash)
-        else:
-            ok = _verify_password(password_or_hash, stored)
-        if ok:
-            return {"id": row["id"], "kind": row["kind"], "username": row["username"], "display_name": row["display_name"]}
+    if not row or not _check_password(row["id"], row["password_hash"] or "", password_or_hash):
         return None
+    return {"id": row["id"], "kind": row["kind"], "username": row["username"], "display_name": row["display_name"]}
 
 def authenticate_collective(cnpj: str, password_or_hash: str):
-    with _conn() as cn:
+    """Login de coletivo. Levanta AuthBusyError se a fila de hash estiver cheia."""
+    with _read_conn() as cn:
         row = cn.execute("""
             SELECT id, kind, cnpj, contact, password_hash
               FROM accounts WHERE kind='collective' AND cnpj=?
         """, (cnpj,)).fetchone()
-        if not row:
-            return None
-        stored = row["password_hash"] or ""
-        if _is_pbkdf2_hash(password_or_hash):
-            ok = hmac.compare_digest(stored, password_or_hash)
-        else:
-            ok = _verify_password(password_or_hash, stored)
-        if ok:
-            return {"id": row["id"], "kind": row["kind"], "cnpj": row["cnpj"], "contact": row["contact"]}
+    if not row or not _check_password(row["id"], row["password_hash"] or "", password_or_hash):
         return None
+    return {"id": row["id"], "kind": row["kind"], "cnpj": row["cnpj"], "contact": row["contact"]}
 
 # ------------------------------------------------------------
 # Users "legado" (opcional)
 # ------------------------------------------------------------
 def ensure_user(user_id: str, name: Optional[str] = None):
-    with _DB_LOCK:
-        with _conn() as cn:
-            cur = cn.execute("SELECT id FROM users WHERE id=?", (user_id,))
-            if not cur.fetchone():
-                cn.execute("INSERT INTO users (id, name, created_at) VALUES (?,?,?)",
-                           (user_id, name or "", _now_iso()))
+    with _write() as cn:
+        cur = cn.execute("SELECT id FROM users WHERE id=?", (user_id,))
+        if not cur.fetchone():
+            cn.execute("INSERT INTO users (id, name, created_at) VALUES (?,?,?)",
+                       (user_id, name or "", _now_iso()))
 
 # ------------------------------------------------------------
 # Perfis
 # ------------------------------------------------------------
+_PROFILE_SAVE_RETRIES = 5
+
+def _insert_profile_version(sql: str, args: Tuple[Any, ...]) -> int:
+    """
+    INSERT ... SELECT MAX(version)+1 num único comando (atômico no SQLite); o índice UNIQUE
+    garante a numeração entre processos. Em colisão, tenta de novo.
+    """
+    for attempt in range(_PROFILE_SAVE_RETRIES):
+        try:
+            with _write() as cn:
+                return int(cn.execute(sql, args).lastrowid)
+        except sqlite3.IntegrityError:
+            if attempt == _PROFILE_SAVE_RETRIES - 1:
+                raise
+            time.sleep(0.01 * (attempt + 1))
+    raise AssertionError("inalcançável")
+
 def save_profile_for_account(owner_account_id: int, profile: Dict[str, Any]) -> int:
     now = _now_iso()
-    with _DB_LOCK:
-        with _conn() as cn:
-            last = cn.execute("SELECT COALESCE(MAX(version),0) FROM profiles WHERE owner_account_id=?", (owner_account_id,)).fetchone()[0]
-            version = int(last or 0) + 1
-            cur = cn.execute("""
-                INSERT INTO profiles (user_id, profile_json, version, created_at, updated_at, owner_account_id)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, ("", json.dumps(profile, ensure_ascii=False), version, now, now, owner_account_id))
-            rid = cur.lastrowid or cn.execute("SELECT last_insert_rowid()").fetchone()[0]
-            return int(rid)
+    return _insert_profile_version("""
+        INSERT INTO profiles (user_id, profile_json, version, created_at, updated_at, owner_account_id)
+        SELECT '', ?, COALESCE(MAX(version), 0) + 1, ?, ?, ?
+          FROM profiles WHERE owner_account_id = ?
+    """, (json.dumps(profile, ensure_ascii=False), now, now, owner_account_id, owner_account_id))
 
 def update_profile_for_account(profile_id: int, owner_account_id: int, profile: Dict[str, Any]) -> None:
     now = _now_iso()
-    with _DB_LOCK:
-        with _conn() as cn:
-            row = cn.execute("SELECT owner_account_id FROM profiles WHERE id=?", (profile_id,)).fetchone()
-            if not row or int(row["owner_account_id"] or 0) != int(owner_account_id):
-                raise PermissionError("Este perfil não pertence à sua conta.")
-            cn.execute("UPDATE profiles SET profile_json=?, updated_at=? WHERE id=?",
-                       (json.dumps(profile, ensure_ascii=False), now, profile_id))
+    with _write() as cn:
+        row = cn.execute("SELECT owner_account_id FROM profiles WHERE id=?", (profile_id,)).fetchone()
+        if not row or int(row["owner_account_id"] or 0) != int(owner_account_id):
+            raise PermissionError("Este perfil não pertence à sua conta.")
+        cn.execute("UPDATE profiles SET profile_json=?, updated_at=? WHERE id=?",
+                   (json.dumps(profile, ensure_ascii=False), now, profile_id))
 
 def get_profiles_by_account(owner_account_id: int) -> List[Tuple[int,int,str,str]]:
-    with _conn() as cn:
+    with _read_conn() as cn:
         cur = cn.execute("""
             SELECT id, version, created_at, updated_at
               FROM profiles
@@ -317,61 +930,322 @@ def get_profiles_by_account(owner_account_id: int) -> List[Tuple[int,int,str,str
 # ---- APIs legado por user_id (se ainda usadas em alguma parte) ----
 def save_profile(user_id: str, profile: Dict[str, Any]) -> int:
     now = _now_iso()
-    with _DB_LOCK:
-        with _conn() as cn:
-            last = cn.execute("SELECT COALESCE(MAX(version),0) FROM profiles WHERE user_id=?", (user_id,)).fetchone()[0]
-            version = int(last or 0) + 1
-            cur = cn.execute("""
-                INSERT INTO profiles (user_id, profile_json, version, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?)
-            """, (user_id, json.dumps(profile, ensure_ascii=False), version, now, now))
-            rid = cur.lastrowid or cn.execute("SELECT last_insert_rowid()").fetchone()[0]
-            return int(rid)
+    return _insert_profile_version("""
+        INSERT INTO profiles (user_id, profile_json, version, created_at, updated_at)
+        SELECT ?, ?, COALESCE(MAX(version), 0) + 1, ?, ?
+          FROM profiles WHERE user_id = ? AND owner_account_id IS NULL
+    """, (user_id, json.dumps(profile, ensure_ascii=False), now, now, user_id))
 
 def update_profile(profile_id: int, profile: Dict[str, Any]):
     now = _now_iso()
-    with _DB_LOCK:
-        with _conn() as cn:
-            cn.execute("UPDATE profiles SET profile_json=?, updated_at=? WHERE id=?",
-                       (json.dumps(profile, ensure_ascii=False), now, profile_id))
+    with _write() as cn:
+        cn.execute("UPDATE profiles SET profile_json=?, updated_at=? WHERE id=?",
+                   (json.dumps(profile, ensure_ascii=False), now, profile_id))
 
 def get_profiles(user_id: str) -> List[Tuple[int,int,str,str]]:
-    with _conn() as cn:
+    with _read_conn() as cn:
         cur = cn.execute("""
             SELECT id, version, created_at, updated_at
               FROM profiles
-             WHERE user_id=?
+             WHERE user_id=? AND owner_account_id IS NULL
              ORDER BY version DESC
         """, (user_id,))
         return [(int(r["id"]), int(r["version"] or 1), r["created_at"], r["updated_at"]) for r in cur.fetchall()]
 
 def load_profile(profile_id: int) -> Dict[str, Any]:
-    with _conn() as cn:
+    with _read_conn() as cn:
         r = cn.execute("SELECT profile_json FROM profiles WHERE id=?", (profile_id,)).fetchone()
         return json.loads(r["profile_json"]) if r else {}
 
+def load_profile_entry(profile_id: int) -> Optional[Tuple[Dict[str, Any], str]]:
+    """(perfil, updated_at) lidos juntos — usado pelo cache de perfis."""
+    with _read_conn() as cn:
+        r = cn.execute("SELECT profile_json, updated_at FROM profiles WHERE id=?", (profile_id,)).fetchone()
+        return (json.loads(r["profile_json"] or "{}"), r["updated_at"] or "") if r else None
+
+def profile_updated_at(profile_id: int) -> Optional[str]:
+    """Só o carimbo updated_at (busca pela PK, sem ler o JSON)."""
+    with _read_conn() as cn:
+        r = cn.execute("SELECT updated_at FROM profiles WHERE id=?", (profile_id,)).fetchone()
+        return (r["updated_at"] or "") if r else None
+
 # ------------------------------------------------------------
 # Elegibilidade (opcional)
 # ------------------------------------------------------------
 def save_eligibility(user_id: str, profile_id: int, desired_policy: Optional[str],
                      matched_policies: List[Dict[str, Any]], gaps: List[Dict[str, Any]]) -> int:
     now = _now_iso()
-    with _DB_LOCK:
-        with _conn() as cn:
-            cur = cn.execute("""
-                INSERT INTO eligibility_results
-                (user_id, profile_id, desired_policy, matched_policies_json, gaps_json, created_at)
-                VALUES (?,?,?,?,?,?)
-            """, (user_id, profile_id, desired_policy or "",
-                  json.dumps(matched_policies, ensure_ascii=False),
-                  json.dumps(gaps, ensure_ascii=False),
-                  now))
-            rid = cur.lastrowid or cn.execute("SELECT last_insert_rowid()").fetchone()[0]
-            return int(rid)
+    with _write() as cn:
+        cur = cn.execute("""
+            INSERT INTO eligibility_results
+            (user_id, profile_id, desired_policy, matched_policies_json, gaps_json, created_at)
+            VALUES (?,?,?,?,?,?)
+        """, (user_id, profile_id, desired_policy or "",
+              json.dumps(matched_policies, ensure_ascii=False),
+              json.dumps(gaps, ensure_ascii=False),
+              now))
+        rid = cur.lastrowid or cn.execute("SELECT last_insert_rowid()").fetchone()[0]
+        return int(rid)
 
 # ------------------------------------------------------------
 # Observatório (Analytics)
 # ------------------------------------------------------------
+_INSERT_EVENT_SQL = """
+    INSERT INTO analytics_events
+    (ts, kind, policy, uf, municipio, query, gender, extras_json,
+     ts_ms, uf_norm, municipio_norm, gender_norm)
+    VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+"""
+
+_INSERT_REQUIREMENT_SQL = """
+    INSERT INTO analytics_event_requirements (event_id, status, position, requirement)
+    VALUES (?,?,?,?)
+"""
+
+def _event_row(kind: str, policy: Optional[str], uf: Optional[str], municipio: Optional[str],
+               query: Optional[str], gender: Optional[str], met: Optional[List[str]],
+               missing: Optional[List[str]], extras: Optional[Dict[str, Any]]) -> Tuple[Any, ...]:
+    """Linha de analytics_events seguida das listas de requisitos (met, missing)."""
+    ts = _now_iso()
+    return (ts, kind, _norm_str(policy), _norm_str(uf), _norm_str(municipio),
+            _norm_str(query), _norm_str(gender),
+            json.dumps(extras or {}, ensure_ascii=False),
+            _iso_to_ms(ts), _key_upper(uf), _key_lower(municipio), _key_lower(gender),
+            [str(x) for x in (met or []) if x is not None],
+            [str(x) for x in (missing or []) if x is not None])
+
+class AnalyticsWriter:
+    """
+    Escritor assíncrono de eventos: fila limitada em memória + thread de fundo que
+    grava com executemany, uma transação a cada `batch_size` eventos ou `flush_ms`.
+    Fila cheia (backpressure):
+      - "block": log_event espera espaço na fila;
+      - "drop":  descarta o evento (contabilizado em stats()["dropped"]);
+      - "spill": grava o evento num journal JSONL local, reaplicado quando a fila esvazia.
+    """
+
+    BACKPRESSURE = ("block", "drop", "spill")
+
+    def __init__(self, batch_size: int = _ANALYTICS_BATCH_SIZE, flush_ms: int = _ANALYTICS_FLUSH_MS,
+                 queue_max: int = _ANALYTICS_QUEUE_MAX, backpressure: str = _ANALYTICS_BACKPRESSURE,
+                 spill_path: Optional[Path | str] = _ANALYTICS_SPILL_PATH):
+        if backpressure not in self.BACKPRESSURE:
+            raise ValueError(f"backpressure deve ser um de {self.BACKPRESSURE}, não {backpressure!r}")
+        self.batch_size = max(1, int(batch_size))
+        self.flush_s = max(1, int(flush_ms)) / 1000.0
+        self.backpressure = backpressure
+        self.spill_path = Path(spill_path) if spill_path else Path(f"{DB_PATH}.events.jsonl")
+        self._q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, int(queue_max)))
+        self._spill_lock = Lock()
+        self._stats_lock = Lock()
+        self._stats = {"enqueued": 0, "written": 0, "batches": 0, "dropped": 0,
+                       "spilled": 0, "replayed": 0, "errors": 0}
+        self._stopped = False
+        self._thread = Thread(target=self._run, name="analytics-writer", daemon=True)
+        self._thread.start()
+
+    # ---------------- produtor ----------------
+    def submit(self, row: Tuple[Any, ...]) -> bool:
+        """Enfileira uma linha pronta para _INSERT_EVENT_SQL. False se descartada."""
+        if self._stopped:
+            _insert_events([row])
+            return True
+        try:
+            if self.backpressure == "block":
+                self._q.put(row)
+            else:
+                self._q.put_nowait(row)
+        except queue.Full:
+            if self.backpressure == "drop":
+                self._bump("dropped")
+                return False
+            self._spill([row])
+            return True
+        self._bump("enqueued")
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Aguarda a gravação de tudo que já foi enfileirado (inclusive o journal)."""
+        if self._stopped:
+            return True  # sem thread consumindo; submit já grava de forma síncrona
+        done = Event()
+        self._q.put(("__flush__", done))
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Drena a fila e encerra a thread (registrado em atexit)."""
+        if self._stopped:
+            return
+        self._q.put(("__stop__", None))
+        self._thread.join(timeout)
+        self._stopped = True
+        leftovers = []
+        while True:
+            try:
+                item = self._q.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(item, tuple) and len(item) == 2 and item[0] in ("__flush__", "__stop__"):
+                if item[1] is not None:
+                    item[1].set()
+                continue
+            leftovers.append(item)
+        if leftovers:
+            self._write(leftovers)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {**self._stats, "queued": self._q.qsize(), "backpressure": self.backpressure,
+                    "spill_pending": self.spill_path.exists()}
+
+    # ---------------- consumidor ----------------
+    def _run(self) -> None:
+        self._replay_spill()
+        while True:
+            try:
+                item = self._q.get(timeout=self.flush_s)
+            except queue.Empty:
+                self._replay_spill()
+                continue
+            batch: List[Tuple[Any, ...]] = []
+            waiters: List[Event] = []
+            stop = False
+            deadline = time.monotonic() + self.flush_s
+            while True:
+                if isinstance(item, tuple) and len(item) == 2 and item[0] in ("__flush__", "__stop__"):
+                    if item[0] == "__stop__":
+                        stop = True
+                    elif item[1] is not None:
+                        waiters.append(item[1])
+                    if waiters or stop:
+                        break
+                else:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+            if waiters or stop:
+                self._replay_spill()
+            for ev in waiters:
+                ev.set()
+            if stop:
+                return
+
+    def _write(self, rows: List[Tuple[Any, ...]]) -> None:
+        try:
+            _insert_events(rows)
+        except Exception:
+            # não perde eventos: manda o lote para o journal e tenta de novo depois
+            self._bump("errors")
+            self._spill(rows)
+            return
+        self._bump("written", len(rows))
+        self._bump("batches")
+
+    def _spill(self, rows: List[Tuple[Any, ...]]) -> None:
+        with self._spill_lock:
+            self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(list(row), ensure_ascii=False) + "\n")
+        self._bump("spilled", len(rows))
+
+    def _replay_spill(self) -> None:
+        with self._spill_lock:
+            if not self.spill_path.exists():
+                return
+            replaying = self.spill_path.with_name(self.spill_path.name + ".replay")
+            self.spill_path.replace(replaying)
+        rows = [tuple(json.loads(line)) for line in replaying.read_text(encoding="utf-8").splitlines() if line.strip()]
+        try:
+            for i in range(0, len(rows), self.batch_size):
+                _insert_events(rows[i:i + self.batch_size])
+        except Exception:
+            # devolve ao journal o que ainda não entrou (a próxima tentativa reaplica)
+            self._bump("errors")
+            with self._spill_lock:
+                with open(self.spill_path, "a", encoding="utf-8") as f:
+                    for row in rows[i:]:
+                        f.write(json.dumps(list(row), ensure_ascii=False) + "\n")
+            replaying.unlink(missing_ok=True)
+            return
+        replaying.unlink(missing_ok=True)
+        self._bump("replayed", len(rows))
+
+    def _bump(self, key: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += n
+
+_WRITER: Optional[AnalyticsWriter] = None
+_WRITER_LOCK = Lock()
+
+def configure_analytics_writer(enabled: bool = True, **options: Any) -> Optional[AnalyticsWriter]:
+    """
+    Liga/desliga a ingestão em lote em tempo de execução.
+    `options` são repassadas ao AnalyticsWriter (batch_size, flush_ms, queue_max, backpressure, spill_path).
+    """
+    global _WRITER, _ANALYTICS_BUFFERED
+    with _WRITER_LOCK:
+        if _WRITER is not None:
+            _WRITER.close()
+            _WRITER = None
+        _ANALYTICS_BUFFERED = bool(enabled)
+        if enabled:
+            _WRITER = AnalyticsWriter(**options)
+        return _WRITER
+
+def _analytics_writer() -> Optional[AnalyticsWriter]:
+    global _WRITER
+    if not _ANALYTICS_BUFFERED:
+        return None
+    with _WRITER_LOCK:
+        if _WRITER is None:
+            _WRITER = AnalyticsWriter()
+        return _WRITER
+
+def flush_analytics(timeout: Optional[float] = None) -> bool:
+    """Força a gravação dos eventos pendentes (no-op quando a ingestão é síncrona)."""
+    w = _WRITER
+    return w.flush(timeout) if w is not None else True
+
+def analytics_writer_stats() -> Dict[str, Any]:
+    w = _WRITER
+    return w.stats() if w is not None else {"buffered": False}
+
+@atexit.register
+def _close_analytics_writer() -> None:
+    w = _WRITER
+    if w is not None:
+        w.close()
+
+def _insert_event(cn: sqlite3.Connection, row: Tuple[Any, ...]) -> int:
+    """Grava o evento e seus requisitos na mesma transação; retorna o id."""
+    *event, met, missing = row
+    rid = int(cn.execute(_INSERT_EVENT_SQL, event).lastrowid)
+    reqs = [(rid, status, pos, req)
+            for status, items in (("met", met), ("missing", missing))
+            for pos, req in enumerate(items or [])]
+    if reqs:
+        cn.executemany(_INSERT_REQUIREMENT_SQL, reqs)
+    return rid
+
+def _insert_events(rows: List[Tuple[Any, ...]]) -> None:
+    with _write() as cn:
+        plain = [r[:-2] for r in rows if not r[-2] and not r[-1]]
+        if plain:
+            cn.executemany(_INSERT_EVENT_SQL, plain)
+        for row in rows:
+            if row[-2] or row[-1]:
+                _insert_event(cn, row)
+
 def log_event(kind: str,
               policy: Optional[str] = None,
               uf: Optional[str] = None,
@@ -381,52 +1255,691 @@ def log_event(kind: str,
               met: Optional[List[str]] = None,
               missing: Optional[List[str]] = None,
               extras: Optional[Dict[str, Any]] = None) -> int:
-    """Registra evento para o Observatório."""
-    with _DB_LOCK:
-        with _conn() as cn:
-            cur = cn.execute("""
-                INSERT INTO analytics_events
-                (ts, kind, policy, uf, municipio, query, gender, met_json, missing_json, extras_json)
-                VALUES (?,?,?,?,?,?,?,?,?,?)
-            """, (_now_iso(), kind, _norm_str(policy), _norm_str(uf), _norm_str(municipio),
-                  _norm_str(query), _norm_str(gender),
-                  json.dumps(met or [], ensure_ascii=False),
-                  json.dumps(missing or [], ensure_ascii=False),
-                  json.dumps(extras or {}, ensure_ascii=False)))
-            rid = cur.lastrowid or cn.execute("SELECT last_insert_rowid()").fetchone()[0]
-            return int(rid)
+    """
+    Registra evento para o Observatório.
+    Com ANALYTICS_BUFFERED ligado, o evento vai para a fila do AnalyticsWriter e o
+    retorno é 0 (o id só existe após o flush em lote).
+    """
+    row = _event_row(kind, policy, uf, municipio, query, gender, met, missing, extras)
+    writer = _analytics_writer()
+    if writer is not None:
+        writer.submit(row)
+        return 0
+    with _write() as cn:
+        return _insert_event(cn, row)
+
+def _analytics_filters(start_iso: Optional[str] = None, end_iso: Optional[str] = None,
+                       uf: Optional[str] = None, municipio: Optional[str] = None,
+                       gender: Optional[str] = None) -> Tuple[str, List[Any]]:
+    """Cláusulas WHERE sobre as colunas indexadas (ts_ms e chaves *_norm)."""
+    sql = ""
+    args: List[Any] = []
+    start_ms, end_ms = _iso_to_ms(start_iso), _iso_to_ms(end_iso)
+    if start_ms is not None:
+        sql += " AND ts_ms >= ?"; args.append(start_ms)
+    if end_ms is not None:
+        sql += " AND ts_ms <= ?"; args.append(end_ms)
+    if uf:
+        sql += " AND uf_norm = ?"; args.append(_key_upper(uf))
+    if municipio:
+        sql += " AND municipio_norm = ?"; args.append(_key_lower(municipio))
+    if gender:
+        sql += " AND gender_norm = ?"; args.append(_key_lower(gender))
+    return sql, args
+
+_EVENT_FIELDS = ("id", "ts", "ts_ms", "kind", "policy", "uf", "municipio", "query", "gender", "extras_json")
+_EVENT_COLUMNS = ", ".join(_EVENT_FIELDS)
+
+def _scan_events(cn: sqlite3.Connection, where: str, args: List[Any],
+                 batch_size: int) -> Iterator[List[Tuple[Any, ...]]]:
+    cur = cn.cursor()
+    cur.row_factory = None  # tuplas simples: bem mais baratas que sqlite3.Row por linha
+    cur.execute(f"""
+        SELECT {_EVENT_COLUMNS}
+          FROM analytics_events
+         WHERE 1=1 {where}
+         ORDER BY ts_ms DESC, id DESC
+    """, tuple(args))
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        yield rows
+
+def _event_batches(sources: List[sqlite3.Connection], where: str, args: List[Any],
+                   batch_size: int) -> Iterator[Tuple[List[Tuple[Any, ...]], List[sqlite3.Connection]]]:
+    """
+    Lê os eventos filtrados em lotes com fetchmany (tuplas na ordem de _EVENT_COLUMNS),
+    junto com a conexão de origem de cada linha. Com partições arquivadas, intercala as
+    varreduras (já ordenadas) por (ts_ms, id) decrescentes.
+    """
+    if len(sources) == 1:
+        for rows in _scan_events(sources[0], where, args, batch_size):
+            yield rows, [sources[0]] * len(rows)
+        return
+
+    def flat(cn: sqlite3.Connection):
+        for rows in _scan_events(cn, where, args, batch_size):
+            for r in rows:
+                yield (r[2] or 0, r[0], cn, r)
+
+    batch: List[Tuple[Any, ...]] = []
+    srcs: List[sqlite3.Connection] = []
+    for _ts, _id, cn, r in heapq.merge(*(flat(cn) for cn in sources),
+                                       key=lambda t: (t[0], t[1]), reverse=True):
+        batch.append(r)
+        srcs.append(cn)
+        if len(batch) >= batch_size:
+            yield batch, srcs
+            batch, srcs = [], []
+    if batch:
+        yield batch, srcs
+
+def _requirements_for(cn: sqlite3.Connection, ids: List[int],
+                      srcs: Optional[List[sqlite3.Connection]] = None) -> Dict[int, Dict[str, List[str]]]:
+    """met/missing de um lote de eventos (consultando a partição de origem de cada um), na ordem original."""
+    groups: Dict[int, Tuple[sqlite3.Connection, List[int]]] = {}
+    for i, eid in enumerate(ids):
+        src = srcs[i] if srcs else cn
+        groups.setdefault(id(src), (src, []))[1].append(eid)
+    out: Dict[int, Dict[str, List[str]]] = {}
+    for src, group in groups.values():
+        for event_id, status, requirement in src.execute("""
+            SELECT event_id, status, requirement
+              FROM analytics_event_requirements
+             WHERE event_id IN (SELECT value FROM json_each(?))
+             ORDER BY event_id, status, position
+        """, (json.dumps(group),)):
+            out.setdefault(event_id, {}).setdefault(status, []).append(requirement)
+    return out
+
+def iter_analytics(start_iso: Optional[str] = None, end_iso: Optional[str] = None,
+                   uf: Optional[str] = None, municipio: Optional[str] = None,
+                   gender: Optional[str] = None, batch_size: int = 5_000) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Gera lotes de até `batch_size` eventos (mesmo formato de get_analytics), do mais recente
+    para o mais antigo. Memória constante: útil para exportações e agregações em streaming.
+    """
+    where, args = _analytics_filters(start_iso, end_iso, uf, municipio, gender)
+    with _read_conn() as cn, _partition_readers(cn, [(_iso_to_ms(start_iso), _iso_to_ms(end_iso))]) as archives:
+        for rows, srcs in _event_batches([cn, *archives], where, args, max(1, int(batch_size))):
+            reqs = _requirements_for(cn, [r[0] for r in rows], srcs)
+            batch: List[Dict[str, Any]] = []
+            for eid, ts, _ts_ms, kind, policy, uf_, mun, query, gen, extras in rows:
+                lists = reqs.get(eid, {})
+                batch.append({
+                    "ts": ts, "kind": kind, "policy": policy,
+                    "uf": uf_, "municipio": mun, "query": query,
+                    "gender": gen,
+                    "met": lists.get("met", []),
+                    "missing": lists.get("missing", []),
+                    # extras quase sempre é "{}": só decodifica quando há conteúdo
+                    "extras": json.loads(extras) if extras and extras != "{}" else {},
+                })
+            yield batch
 
 def get_analytics(start_iso: Optional[str] = None, end_iso: Optional[str] = None,
                   uf: Optional[str] = None, municipio: Optional[str] = None,
                   gender: Optional[str] = None) -> List[Dict[str, Any]]:
-    sql = """
-        SELECT ts, kind, policy, uf, municipio, query, gender, met_json, missing_json, extras_json
-          FROM analytics_events
-         WHERE 1=1
+    return [d for batch in iter_analytics(start_iso, end_iso, uf, municipio, gender) for d in batch]
+
+class _CategoryCodes:
+    """Acumula uma coluna categórica como códigos inteiros (sem guardar uma str por linha)."""
+    def __init__(self) -> None:
+        self.index: Dict[str, int] = {}
+        self.codes = array("i")
+
+    def extend(self, values, pd, np) -> None:
+        # fatoriza o lote (vetorizado) e remapeia os códigos locais para os globais
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        remap = np.array([self.index.setdefault(u, len(self.index)) for u in uniques] + [-1], dtype=np.int32)
+        self.codes.frombytes(remap[codes].tobytes())  # código -1 (nulo) cai no último item
+
+    def build(self, pd, np):
+        return pd.Categorical.from_codes(np.frombuffer(self.codes, dtype=np.int32),
+                                         categories=list(self.index))
+
+_FRAME_CATEGORIES = ("kind", "policy", "uf", "municipio", "gender")
+
+def get_analytics_frame(start_iso: Optional[str] = None, end_iso: Optional[str] = None,
+                        uf: Optional[str] = None, municipio: Optional[str] = None,
+                        gender: Optional[str] = None, batch_size: int = 50_000,
+                        with_requirements: bool = False):
     """
-    args: List[Any] = []
-    if start_iso:
-        sql += " AND ts >= ?"; args.append(start_iso)
-    if end_iso:
-        sql += " AND ts <= ?"; args.append(end_iso)
+    Eventos filtrados como DataFrame, montado coluna a coluna direto do cursor:
+    ts (datetime64 UTC), kind/policy/uf/municipio/gender categóricos, query texto.
+    Com with_requirements=True inclui as listas met/missing (mais lento e pesado).
+    """
+    import numpy as np
+    import pandas as pd
+
+    where, args = _analytics_filters(start_iso, end_iso, uf, municipio, gender)
+    ts_ms = array("q")
+    cats = {c: _CategoryCodes() for c in _FRAME_CATEGORIES}
+    queries: List[Optional[str]] = []
+    met: List[List[str]] = []
+    missing: List[List[str]] = []
+    with _read_conn() as cn, _partition_readers(cn, [(_iso_to_ms(start_iso), _iso_to_ms(end_iso))]) as archives:
+        for rows, srcs in _event_batches([cn, *archives], where, args, max(1, int(batch_size))):
+            cols = dict(zip(_EVENT_FIELDS, zip(*rows)))  # transpõe o lote para colunas
+            ts_ms.extend(v or 0 for v in cols["ts_ms"])
+            for c, builder in cats.items():
+                builder.extend(cols[c], pd, np)
+            queries.extend(cols["query"])
+            if with_requirements:
+                reqs = _requirements_for(cn, list(cols["id"]), srcs)
+                met.extend(reqs.get(i, {}).get("met", []) for i in cols["id"])
+                missing.extend(reqs.get(i, {}).get("missing", []) for i in cols["id"])
+
+    data: Dict[str, Any] = {"ts": pd.to_datetime(pd.Series(ts_ms, dtype="int64"), unit="ms", utc=True)}
+    for c, builder in cats.items():
+        data[c] = builder.build(pd, np)
+    data["query"] = pd.Series(queries, dtype="object")
+    if with_requirements:
+        data["met"], data["missing"] = met, missing
+    columns = ["ts", "kind", "policy", "uf", "municipio", "query", "gender"]
+    return pd.DataFrame(data, columns=columns + (["met", "missing"] if with_requirements else []))
+
+# ------------------------------------------------------------
+# Observatório: rollups incrementais
+# ------------------------------------------------------------
+_DAY_MS = 86_400_000
+_ROLLUP_NAME = "analytics_daily"
+
+_ROLLUP_DAILY_SQL = """
+    INSERT INTO analytics_rollup_daily
+    (day_ms, kind, uf, municipio, policy, gender, uf_norm, municipio_norm, gender_norm, n)
+    SELECT (ts_ms / 86400000) * 86400000, kind,
+           COALESCE(uf,''), COALESCE(municipio,''), COALESCE(policy,''), COALESCE(gender,''),
+           MIN(COALESCE(uf_norm,'')), MIN(COALESCE(municipio_norm,'')), MIN(COALESCE(gender_norm,'')),
+           COUNT(*)
+      FROM {src}.analytics_events
+     WHERE id > ? AND id <= ?
+     GROUP BY 1, 2, 3, 4, 5, 6
+    ON CONFLICT (day_ms, kind, uf, municipio, policy, gender) DO UPDATE SET n = n + excluded.n
+"""
+
+_ROLLUP_REQUIREMENTS_SQL = """
+    INSERT INTO analytics_rollup_requirements
+    (day_ms, kind, status, requirement, uf, municipio, gender, uf_norm, municipio_norm, gender_norm, n)
+    SELECT (e.ts_ms / 86400000) * 86400000, e.kind, r.status, r.requirement,
+           COALESCE(e.uf,''), COALESCE(e.municipio,''), COALESCE(e.gender,''),
+           MIN(COALESCE(e.uf_norm,'')), MIN(COALESCE(e.municipio_norm,'')), MIN(COALESCE(e.gender_norm,'')),
+           COUNT(*)
+      FROM {src}.analytics_event_requirements r
+      JOIN {src}.analytics_events e ON e.id = r.event_id
+     WHERE r.event_id > ? AND r.event_id <= ?
+     GROUP BY 1, 2, 3, 4, 5, 6, 7
+    ON CONFLICT (day_ms, kind, status, requirement, uf, municipio, gender) DO UPDATE SET n = n + excluded.n
+"""
+
+def refresh_rollups(chunk: int = 200_000) -> int:
+    """
+    Catch-up incremental: agrega nos rollups os eventos com id acima da marca d'água
+    (analytics_rollup_state.last_event_id). Retorna quantos eventos foram incorporados.
+    Tudo numa transação IMMEDIATE, então dois processos nunca contam o mesmo evento.
+    """
+    with _read_conn() as cn:
+        max_id = cn.execute("SELECT COALESCE(MAX(id),0) FROM analytics_events").fetchone()[0]
+        row = cn.execute("SELECT last_event_id FROM analytics_rollup_state WHERE name=?",
+                         (_ROLLUP_NAME,)).fetchone()
+    if row is not None and int(row[0]) >= int(max_id):
+        return 0  # nada novo: não pega o lock de escrita
+
+    with _write() as cn:
+        row = cn.execute("SELECT last_event_id FROM analytics_rollup_state WHERE name=?",
+                         (_ROLLUP_NAME,)).fetchone()
+        hwm = int(row[0]) if row else 0
+        max_id = int(cn.execute("SELECT COALESCE(MAX(id),0) FROM analytics_events").fetchone()[0])
+        lo = hwm
+        while lo < max_id:
+            hi = min(lo + chunk, max_id)
+            cn.execute(_ROLLUP_DAILY_SQL.format(src="main"), (lo, hi))
+            cn.execute(_ROLLUP_REQUIREMENTS_SQL.format(src="main"), (lo, hi))
+            lo = hi
+        cn.execute("""
+            INSERT INTO analytics_rollup_state (name, last_event_id, updated_at) VALUES (?,?,?)
+            ON CONFLICT(name) DO UPDATE SET last_event_id=excluded.last_event_id, updated_at=excluded.updated_at
+        """, (_ROLLUP_NAME, max_id, _now_iso()))
+        return max_id - hwm
+
+def rebuild_rollups() -> int:
+    """Recalcula os rollups do zero, incluindo os meses arquivados. Retorna o total de eventos agregados."""
+    with _write() as cn:
+        cn.execute("DELETE FROM analytics_rollup_daily")
+        cn.execute("DELETE FROM analytics_rollup_requirements")
+        cn.execute("DELETE FROM analytics_rollup_state WHERE name=?", (_ROLLUP_NAME,))
+    with _conn() as cn:
+        for _month, path in _partition_files(cn, [(None, None)]):
+            cn.execute("ATTACH DATABASE ? AS arc", (str(path),))  # ATTACH só fora de transação
+            try:
+                _begin_immediate(cn)
+                cn.execute(_ROLLUP_DAILY_SQL.format(src="arc"), (-1, 2 ** 62))
+                cn.execute(_ROLLUP_REQUIREMENTS_SQL.format(src="arc"), (-1, 2 ** 62))
+                cn.commit()
+            finally:
+                cn.execute("DETACH DATABASE arc")
+    refresh_rollups()
+    with _read_conn() as cn:
+        return int(cn.execute("SELECT COALESCE(SUM(n),0) FROM analytics_rollup_daily").fetchone()[0])
+
+def _rollup_windows(start_ms: Optional[int], end_ms: Optional[int]):
+    """
+    Divide [start, end] em dias inteiros (lidos dos rollups) e bordas parciais
+    (lidas dos eventos brutos). Retorna ((first_day_ms, last_day_ms_exclusivo) | None, [bordas]).
+    """
+    first = None if start_ms is None else -(-start_ms // _DAY_MS) * _DAY_MS
+    last = None if end_ms is None else ((end_ms + 1) // _DAY_MS) * _DAY_MS
+    if first is not None and last is not None and first >= last:
+        return None, [(start_ms, end_ms)]
+    edges = []
+    if start_ms is not None and first is not None and start_ms < first:
+        edges.append((start_ms, first - 1))
+    if end_ms is not None and last is not None and last <= end_ms:
+        edges.append((last, end_ms))
+    return (first, last), edges
+
+def _key_filters(uf: Optional[str] = None, municipio: Optional[str] = None,
+                 gender: Optional[str] = None, prefix: str = "") -> Tuple[str, List[Any]]:
+    sql, args = "", []
     if uf:
-        sql += " AND UPPER(COALESCE(uf,'')) = ?"; args.append(uf.strip().upper())
+        sql += f" AND {prefix}uf_norm = ?"; args.append(_key_upper(uf))
     if municipio:
-        sql += " AND LOWER(COALESCE(municipio,'')) = ?"; args.append(municipio.strip().lower())
+        sql += f" AND {prefix}municipio_norm = ?"; args.append(_key_lower(municipio))
     if gender:
-        sql += " AND LOWER(COALESCE(gender,'')) = ?"; args.append(gender.strip().lower())
-    sql += " ORDER BY ts DESC"
+        sql += f" AND {prefix}gender_norm = ?"; args.append(_key_lower(gender))
+    return sql, args
 
-    out: List[Dict[str, Any]] = []
-    with _conn() as cn:
-        for r in cn.execute(sql, tuple(args)):
-            d = {
-                "ts": r["ts"], "kind": r["kind"], "policy": r["policy"],
-                "uf": r["uf"], "municipio": r["municipio"], "query": r["query"],
-                "gender": r["gender"],
-                "met": json.loads(r["met_json"] or "[]"),
-                "missing": json.loads(r["missing_json"] or "[]"),
-                "extras": json.loads(r["extras_json"] or "{}"),
-            }
-            out.append(d)
-    return out
\ No newline at end of file
+# ------------------------------------------------------------
+# Observatório: agregações
+# ------------------------------------------------------------
+# Métricas agregáveis do Observatório: nome → (kind do evento, status do requisito)
+_AGG_METRICS: Dict[str, Tuple[str, Optional[str]]] = {
+    "views": ("view", None),
+    "eligible": ("eligible", None),
+    "searches": ("search", None),
+    "missing": ("matches", "missing"),
+    "met": ("matches", "met"),
+}
+_AGG_DIMS = ("uf", "municipio", "policy", "gender", "requirement")
+
+def _raw_intervals(filters: Dict[str, Any], use_rollups: bool) -> List[Tuple[Optional[int], Optional[int]]]:
+    """Intervalos de ts_ms que precisam ser lidos dos eventos brutos."""
+    start_ms, end_ms = _iso_to_ms(filters.get("start_iso")), _iso_to_ms(filters.get("end_iso"))
+    if not use_rollups:
+        return [(start_ms, end_ms)]
+    return _rollup_windows(start_ms, end_ms)[1]
+
+def _agg_sources(kind: str, status: Optional[str], dims: List[str], filters: Dict[str, Any],
+                 use_rollups: bool, schemas: Tuple[str, ...] = ("main",)) -> Tuple[List[str], List[Any]]:
+    """SELECTs (rollups para dias inteiros + eventos brutos nas bordas) com dims + n."""
+    f = dict(filters or {})
+    start_ms, end_ms = _iso_to_ms(f.get("start_iso")), _iso_to_ms(f.get("end_iso"))
+    keys = {k: f.get(k) for k in ("uf", "municipio", "gender")}
+    parts: List[str] = []
+    args: List[Any] = []
+
+    def raw(lo: Optional[int], hi: Optional[int]) -> None:
+        exprs = ", ".join(("r.requirement" if d == "requirement" else f"COALESCE(e.{d},'')") + f" AS {d}"
+                          for d in dims)
+        for schema in schemas:
+            sql = f"SELECT {exprs}, COUNT(*) AS n FROM {schema}.analytics_events e"
+            a: List[Any] = [kind]
+            if status:
+                sql += f" JOIN {schema}.analytics_event_requirements r ON r.event_id = e.id AND r.status = ?"
+                a.insert(0, status)
+            sql += " WHERE e.kind = ?"
+            if lo is not None:
+                sql += " AND e.ts_ms >= ?"; a.append(lo)
+            if hi is not None:
+                sql += " AND e.ts_ms <= ?"; a.append(hi)
+            kf, ka = _key_filters(**keys, prefix="e.")
+            parts.append(f"{sql}{kf} GROUP BY {', '.join(dims)}")
+            args.extend(a + ka)
+
+    if not use_rollups:
+        raw(start_ms, end_ms)
+        return parts, args
+
+    window, edges = _rollup_windows(start_ms, end_ms)
+    if window is not None:
+        table = "analytics_rollup_requirements" if status else "analytics_rollup_daily"
+        sql = f"SELECT {', '.join(dims)}, SUM(n) AS n FROM {table} WHERE kind = ?"
+        a = [kind]
+        if status:
+            sql += " AND status = ?"; a.append(status)
+        if window[0] is not None:
+            sql += " AND day_ms >= ?"; a.append(window[0])
+        if window[1] is not None:
+            sql += " AND day_ms < ?"; a.append(window[1])
+        kf, ka = _key_filters(**keys)
+        parts.append(f"{sql}{kf} GROUP BY {', '.join(dims)}")
+        args.extend(a + ka)
+    for lo, hi in edges:
+        raw(lo, hi)
+    return parts, args
+
+def _agg_total(filters: Dict[str, Any], use_rollups: bool, cn: sqlite3.Connection,
+               schemas: Tuple[str, ...] = ("main",)) -> int:
+    f = dict(filters or {})
+    start_ms, end_ms = _iso_to_ms(f.get("start_iso")), _iso_to_ms(f.get("end_iso"))
+    keys = {k: f.get(k) for k in ("uf", "municipio", "gender")}
+    if not use_rollups:
+        where, args = _analytics_filters(**f)
+        return sum(int(cn.execute(f"SELECT COUNT(*) FROM {sc}.analytics_events WHERE 1=1 {where}",
+                                  args).fetchone()[0]) for sc in schemas)
+    window, edges = _rollup_windows(start_ms, end_ms)
+    total = 0
+    kf, ka = _key_filters(**keys)
+    if window is not None:
+        sql, a = "SELECT COALESCE(SUM(n),0) FROM analytics_rollup_daily WHERE 1=1", []
+        if window[0] is not None:
+            sql += " AND day_ms >= ?"; a.append(window[0])
+        if window[1] is not None:
+            sql += " AND day_ms < ?"; a.append(window[1])
+        total += int(cn.execute(sql + kf, a + ka).fetchone()[0])
+    for lo, hi in edges:
+        for sc in schemas:
+            total += int(cn.execute(f"SELECT COUNT(*) FROM {sc}.analytics_events WHERE ts_ms >= ? AND ts_ms <= ?{kf}",
+                                    [lo, hi, *ka]).fetchone()[0])
+    return total
+
+def get_analytics_aggregate(metric: str, group_by: Optional[List[str]] = None,
+                            filters: Optional[Dict[str, Any]] = None,
+                            top_n: Optional[int] = 10, use_rollups: bool = True) -> Dict[str, Any]:
+    """
+    Agrega eventos dentro do SQLite (GROUP BY / ORDER BY / LIMIT).
+    - metric: 'views' | 'eligible' | 'searches' | 'missing' | 'met'
+    - group_by: colunas do ranking (uf, municipio, policy, gender, requirement)
+    - filters: mesmos filtros de get_analytics (start_iso, end_iso, uf, municipio, gender)
+    Dias inteiros do período vêm dos rollups (atualizados por refresh_rollups antes da leitura);
+    só as bordas parciais do período são lidas dos eventos brutos.
+    Retorna {"total": eventos no filtro, "ranking": [{..., "count"}], "weights": [{uf, municipio, weight}]}.
+    Grupos com chave nula/vazia são ignorados (como no groupby do pandas).
+    """
+    if metric not in _AGG_METRICS:
+        raise ValueError(f"Métrica desconhecida: {metric!r}. Use uma de {sorted(_AGG_METRICS)}")
+    kind, status = _AGG_METRICS[metric]
+    cols = list(group_by or [])
+    bad = [c for c in cols if c not in _AGG_DIMS or (c == "requirement" and not status)]
+    if bad:
+        raise ValueError(f"Colunas de agrupamento inválidas para '{metric}': {bad}")
+
+    if use_rollups:
+        refresh_rollups()
+    dims = list(dict.fromkeys(cols + ["uf", "municipio"]))
+    filters = dict(filters or {})
+
+    rank_tail = f"SELECT {', '.join(cols) + ', ' if cols else ''}SUM(n) AS n FROM src WHERE 1=1"
+    rank_tail += "".join(f" AND {c} <> ''" for c in cols)
+    if cols:
+        rank_tail += " GROUP BY " + ", ".join(cols)
+    rank_tail += " HAVING SUM(n) > 0 ORDER BY n DESC" + "".join(f", {c}" for c in cols)
+    if top_n:
+        rank_tail += " LIMIT ?"
+    with _read_conn() as cn, _attached_partitions(cn, _raw_intervals(filters, use_rollups)) as schemas:
+        parts, args = _agg_sources(kind, status, dims, filters, use_rollups, schemas)
+        src = "WITH src AS (" + " UNION ALL ".join(parts) + ") "
+        rank_sql = src + rank_tail
+        rank_args = list(args) + ([int(top_n)] if top_n else [])
+        weight_sql = src + ("SELECT uf, municipio, SUM(n) AS weight FROM src"
+                            " WHERE uf <> '' AND municipio <> '' GROUP BY uf, municipio")
+
+        total = _agg_total(filters, use_rollups, cn, schemas)
+        ranking = [{**{c: r[c] for c in cols}, "count": int(r["n"])} for r in cn.execute(rank_sql, rank_args)]
+        weights = [{"uf": r["uf"], "municipio": r["municipio"], "weight": int(r["weight"])}
+                   for r in cn.execute(weight_sql, args)]
+    return {"total": int(total), "ranking": ranking, "weights": weights}
+
+# ------------------------------------------------------------
+# Observatório: partições mensais (arquivo morto)
+# ------------------------------------------------------------
+# Meses fechados saem do banco principal para um SQLite por mês (events_YYYY-MM.db),
+# compactado (VACUUM) e somente-leitura, registrado em analytics_partitions. As leituras
+# consultam só as partições que cruzam o intervalo pedido; os rollups continuam no principal.
+_ARCHIVE_EVENTS_DDL = """
+    CREATE TABLE IF NOT EXISTS analytics_events (
+        id INTEGER PRIMARY KEY,
+        ts TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        policy TEXT,
+        uf TEXT,
+        municipio TEXT,
+        query TEXT,
+        gender TEXT,
+        extras_json TEXT,
+        ts_ms INTEGER,
+        uf_norm TEXT,
+        municipio_norm TEXT,
+        gender_norm TEXT
+    )
+"""
+_ARCHIVE_EVENT_COLUMNS = ("id, ts, kind, policy, uf, municipio, query, gender, extras_json, "
+                          "ts_ms, uf_norm, municipio_norm, gender_norm")
+
+def _archive_dir() -> Path:
+    return Path(_ANALYTICS_ARCHIVE_DIR) if _ANALYTICS_ARCHIVE_DIR else DB_PATH.parent / "analytics_archive"
+
+def _month_of(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y-%m")
+
+def _month_shift(month: str, delta: int) -> str:
+    y, m = (int(x) for x in month.split("-"))
+    idx = y * 12 + (m - 1) + delta
+    return f"{idx // 12:04d}-{idx % 12 + 1:02d}"
+
+def _month_bounds(month: str) -> Tuple[int, int]:
+    """[início, fim) do mês em epoch ms (UTC)."""
+    y, m = (int(x) for x in month.split("-"))
+    nxt = _month_shift(month, 1)
+    ny, nm = (int(x) for x in nxt.split("-"))
+    start = datetime(y, m, 1, tzinfo=timezone.utc)
+    end = datetime(ny, nm, 1, tzinfo=timezone.utc)
+    return int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+
+def _partition_files(cn: sqlite3.Connection,
+                     intervals: List[Tuple[Optional[int], Optional[int]]]) -> List[Tuple[str, Path]]:
+    """Partições arquivadas que cruzam algum intervalo [lo, hi] (None = aberto), mais recentes primeiro."""
+    if not intervals:
+        return []
+    try:
+        rows = cn.execute("SELECT month, path, start_ms, end_ms FROM main.analytics_partitions "
+                          "ORDER BY month DESC").fetchall()
+    except sqlite3.OperationalError:
+        return []  # banco ainda sem o catálogo (antes de run_migrations)
+    base = _archive_dir()
+    out = []
+    for month, path, start_ms, end_ms in rows:
+        if any((lo is None or end_ms > lo) and (hi is None or start_ms <= hi) for lo, hi in intervals):
+            f = base / path
+            if f.exists():
+                out.append((month, f))
+    return out
+
+def _open_archive(path: Path) -> sqlite3.Connection:
+    cn = sqlite3.connect(f"file:{path.as_posix()}?mode=ro", uri=True, check_same_thread=False)
+    cn.execute("PRAGMA query_only = ON")
+    return cn
+
+@contextmanager
+def _partition_readers(cn: sqlite3.Connection, intervals: List[Tuple[Optional[int], Optional[int]]]):
+    """Conexões somente-leitura (uma por mês) às partições que cruzam os intervalos."""
+    opened: List[sqlite3.Connection] = []
+    try:
+        for _month, path in _partition_files(cn, intervals):
+            opened.append(_open_archive(path))
+        yield opened
+    finally:
+        for arc in opened:
+            arc.close()
+
+@contextmanager
+def _attached_partitions(cn: sqlite3.Connection, intervals: List[Tuple[Optional[int], Optional[int]]]):
+    """
+    ATTACH das partições que cruzam os intervalos na conexão `cn` (para consultas SQL
+    que unem vários meses). Devolve os schemas a consultar: ("main", "arc_YYYY_MM", ...).
+    """
+    files = _partition_files(cn, intervals)
+    limit = cn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    if len(files) > limit:
+        raise ValueError(f"Intervalo cruza {len(files)} partições arquivadas (máximo {limit} por consulta); "
+                         "use os rollups ou um intervalo menor.")
+    attached: List[str] = []
+    try:
+        for month, path in files:
+            schema = "arc_" + month.replace("-", "_")
+            cn.execute(f"ATTACH DATABASE ? AS {schema}", (str(path),))
+            attached.append(schema)
+        yield ("main", *attached)
+    finally:
+        for schema in attached:
+            try:
+                cn.execute(f"DETACH DATABASE {schema}")
+            except sqlite3.Error:
+                pass
+
+def _copy_month(target: Path, start_ms: int, end_ms: int, max_id: int) -> int:
+    """
+    Copia (idempotente) os eventos do mês com id <= max_id para o arquivo da partição,
+    compacta com VACUUM e deixa o arquivo somente-leitura. Retorna o total na partição.
+    """
+    if target.exists():
+        os.chmod(target, 0o644)  # mesclando com uma partição já existente (eventos atrasados)
+    arc = sqlite3.connect(target, isolation_level=None)
+    try:
+        arc.execute("PRAGMA journal_mode = DELETE")
+        arc.execute(_ARCHIVE_EVENTS_DDL)
+        arc.execute(_EVENT_REQUIREMENTS_DDL)
+        for ddl in _ANALYTICS_INDEXES + _EVENT_REQUIREMENTS_INDEXES[:1]:
+            arc.execute(ddl)
+        arc.execute("ATTACH DATABASE ? AS src", (str(DB_PATH),))
+        arc.execute("BEGIN")
+        arc.execute(f"""
+            INSERT OR IGNORE INTO analytics_events ({_ARCHIVE_EVENT_COLUMNS})
+            SELECT {_ARCHIVE_EVENT_COLUMNS} FROM src.analytics_events
+             WHERE ts_ms >= ? AND ts_ms < ? AND id <= ?
+        """, (start_ms, end_ms, max_id))
+        arc.execute("""
+            INSERT OR IGNORE INTO analytics_event_requirements (event_id, status, position, requirement)
+            SELECT r.event_id, r.status, r.position, r.requirement
+              FROM src.analytics_event_requirements r
+              JOIN src.analytics_events e ON e.id = r.event_id
+             WHERE e.ts_ms >= ? AND e.ts_ms < ? AND e.id <= ?
+        """, (start_ms, end_ms, max_id))
+        arc.execute("COMMIT")
+        arc.execute("DETACH DATABASE src")
+        arc.execute("ANALYZE")
+        arc.execute("VACUUM")
+        total = int(arc.execute("SELECT COUNT(*) FROM analytics_events").fetchone()[0])
+    finally:
+        arc.close()
+    os.chmod(target, 0o444)
+    return total
+
+def _write_parquet(db_file: Path) -> Path:
+    import pandas as pd  # opcional: só para quem pede a cópia em Parquet
+
+    out = db_file.with_suffix(".parquet")
+    arc = _open_archive(db_file)
+    try:
+        df = pd.read_sql_query(f"SELECT {_ARCHIVE_EVENT_COLUMNS} FROM analytics_events ORDER BY ts_ms, id", arc)
+    finally:
+        arc.close()
+    df.to_parquet(out, index=False)
+    return out
+
+def compact_analytics(parquet: bool = False, now: Optional[datetime] = None) -> List[str]:
+    """
+    Move para partições mensais os meses fechados fora da janela quente
+    (ANALYTICS_HOT_MONTHS, contando o mês atual). Só eventos já incorporados
+    aos rollups são movidos, então os agregados continuam completos.
+    Com parquet=True grava também events_YYYY-MM.parquet. Retorna os meses movidos.
+    """
+    refresh_rollups()
+    current = _month_of(now or datetime.now(timezone.utc))
+    cutoff_ms = _month_bounds(_month_shift(current, -(max(1, _ANALYTICS_HOT_MONTHS) - 1)))[0]
+    with _read_conn() as cn:
+        row = cn.execute("SELECT last_event_id FROM analytics_rollup_state WHERE name=?",
+                         (_ROLLUP_NAME,)).fetchone()
+        max_id = int(row[0]) if row else 0
+        months = [r[0] for r in cn.execute("""
+            SELECT DISTINCT strftime('%Y-%m', ts_ms / 1000, 'unixepoch')
+              FROM analytics_events
+             WHERE ts_ms < ? AND id <= ?
+             ORDER BY 1
+        """, (cutoff_ms, max_id))]
+
+    base = _archive_dir()
+    base.mkdir(parents=True, exist_ok=True)
+    for month in months:
+        start_ms, end_ms = _month_bounds(month)
+        target = base / f"events_{month}.db"
+        total = _copy_month(target, start_ms, end_ms, max_id)
+        pq = _write_parquet(target).name if parquet else None
+        with _write() as cn:
+            cn.execute("""
+                INSERT INTO analytics_partitions (month, path, start_ms, end_ms, events, parquet_path, archived_at)
+                VALUES (?,?,?,?,?,?,?)
+                ON CONFLICT(month) DO UPDATE SET
+                    path=excluded.path, events=excluded.events,
+                    parquet_path=COALESCE(excluded.parquet_path, analytics_partitions.parquet_path),
+                    archived_at=excluded.archived_at
+            """, (month, target.name, start_ms, end_ms, total, pq, _now_iso()))
+            cn.execute("""
+                DELETE FROM analytics_event_requirements WHERE event_id IN (
+                    SELECT id FROM analytics_events WHERE ts_ms >= ? AND ts_ms < ? AND id <= ?)
+            """, (start_ms, end_ms, max_id))
+            cn.execute("DELETE FROM analytics_events WHERE ts_ms >= ? AND ts_ms < ? AND id <= ?",
+                       (start_ms, end_ms, max_id))
+    if months:
+        with _conn() as cn:
+            cn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return months
+
+def apply_analytics_retention(now: Optional[datetime] = None) -> List[str]:
+    """
+    Apaga as partições mais antigas que ANALYTICS_RETENTION_MONTHS (0 = guarda tudo).
+    Os rollups desses meses são mantidos. Retorna os meses removidos.
+    """
+    if _ANALYTICS_RETENTION_MONTHS <= 0:
+        return []
+    oldest = _month_shift(_month_of(now or datetime.now(timezone.utc)), -(_ANALYTICS_RETENTION_MONTHS - 1))
+    base = _archive_dir()
+    with _write() as cn:
+        rows = cn.execute("SELECT month, path, parquet_path FROM analytics_partitions WHERE month < ?",
+                          (oldest,)).fetchall()
+        cn.execute("DELETE FROM analytics_partitions WHERE month < ?", (oldest,))
+    for _month, path, pq in rows:
+        for name in (path, pq):
+            f = base / name if name else None
+            if f is not None and f.exists():
+                os.chmod(f, 0o644)
+                f.unlink()
+    return [r[0] for r in rows]
+
+# ------------------------------------------------------------
+# CLI de manutenção:  python db.py rollups [--rebuild] | archive [--parquet]
+# ------------------------------------------------------------
+def _main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+    ap = argparse.ArgumentParser(description="Manutenção do banco do Matupiri")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    rp = sub.add_parser("rollups", help="Atualiza (ou reconstrói) os rollups do Observatório")
+    rp.add_argument("--rebuild", action="store_true", help="Apaga e recalcula os rollups do zero")
+    ap_arc = sub.add_parser("archive", help="Move meses fechados para partições e aplica a retenção")
+    ap_arc.add_argument("--parquet", action="store_true", help="Grava também uma cópia .parquet de cada mês")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "rollups":
+        run_migrations()
+        n = rebuild_rollups() if args.rebuild else refresh_rollups()
+        print(f"rollups: {n} eventos incorporados ({DB_PATH})")
+    elif args.cmd == "archive":
+        run_migrations()
+        moved = compact_analytics(parquet=args.parquet)
+        dropped = apply_analytics_retention()
+        print(f"archive: {len(moved)} mês(es) arquivado(s) {moved}, {len(dropped)} removido(s) {dropped} "
+              f"({_archive_dir()})")
+
+if __name__ == "__main__":
+    _main()
@@ -7,6 +7,9 @@ Use como módulos (recomendado):
     python -m etl.ucs_to_processed
     python -m etl.make_policies_catalog
     python -m etl.make_index
+    python -m etl.build_policy_catalog
+    python -m etl.build_manifest
+    python -m etl.publish_shared_tables
     python -m etl.validate_data  # opcional
 """
 __all__ = []
\ No newline at end of file
@@ -0,0 +1,33 @@
+# etl/build_manifest.py
+"""
+Gera data/processed/manifest.json: para cada dataset em data/ (exceto raw/, interim/ e
+perfis), caminho canônico, formato, nº de linhas, esquema, sha256 e horário de build.
+Deve ser a última etapa do run_all (descreve o que as etapas anteriores produziram).
+
+    python -m etl.build_manifest
+    python -m etl.build_manifest --root data --out data/processed/manifest.json
+"""
+from __future__ import annotations
+import argparse
+from pathlib import Path
+
+from app.data_access.manifest import build_manifest, manifest_path
+from etl.common import get_logger
+
+log = get_logger("etl.manifest")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--root", default=None, help="pasta de dados (padrão: data/)")
+    ap.add_argument("--out", default=None, help=f"manifesto de saída (padrão: {manifest_path()})")
+    args = ap.parse_args(argv)
+
+    out = Path(args.out) if args.out else manifest_path()
+    manifest = build_manifest(Path(args.root) if args.root else None, out)
+    datasets = manifest["datasets"]
+    fresh = sum(1 for d in datasets.values() if d["built_at"] == manifest["built_at"])
+    log.info("Manifesto %s: %d datasets (%d novos/alterados)", out, len(datasets), fresh)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
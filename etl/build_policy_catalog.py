@@ -0,0 +1,47 @@
+# etl/build_policy_catalog.py
+"""
+Compila as planilhas do catálogo de políticas num pacote binário único
+(data/processed/policy_catalog.bundle.pkl), identificado pelos sha256 das fontes, com os
+requisitos de policy_requirements.xlsx já pré-analisados (operador, limiares, listas, regex);
+regras que nunca passariam (operador desconhecido, valor não numérico, regex inválida) vão
+para o log. Sem mudança nas planilhas, não recompila (use --force para forçar).
+
+    python -m etl.build_policy_catalog
+    python -m etl.build_policy_catalog --src data/raw/policies_source --force
+"""
+from __future__ import annotations
+import argparse
+from pathlib import Path
+
+from app.data_access.policy_catalog import SOURCE_FILES, build_bundle, bundle_path, find_source_dir
+from app.services.requirement_rules import rule_errors
+from etl.common import get_logger
+
+log = get_logger("etl.policy_catalog")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--src", default=None,
+                    help="pasta com as planilhas (padrão: data/raw/policies_source, depois data/processed)")
+    ap.add_argument("--out", default=None, help=f"pacote de saída (padrão: {bundle_path()})")
+    ap.add_argument("--force", action="store_true", help="recompila mesmo sem mudança nas fontes")
+    args = ap.parse_args(argv)
+
+    src = Path(args.src) if args.src else find_source_dir()
+    if src is None or not (src / "policies.xlsx").exists():
+        log.warning("policies.xlsx não encontrado (%s); nada a compilar.", src or "fontes padrão")
+        return 0
+    out = Path(args.out) if args.out else bundle_path()
+    catalog, rebuilt = build_bundle(src, out, force=args.force)
+    assert catalog is not None
+    present = sum(1 for name in SOURCE_FILES if catalog.sources.get(name))
+    log.info("%s %s (versão %s): %d políticas, %d requisitos, %d/%d planilhas de %s",
+             "Compilado" if rebuilt else "Já atualizado", out, catalog.version,
+             len(catalog.policies_df), len(catalog.reqs_df), present, len(SOURCE_FILES), src)
+    for rule in rule_errors(catalog.rules):
+        log.warning("policy_requirements: %s / %s: %s (a regra nunca passa)",
+                    rule.policy_id, rule.label, rule.error)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,34 @@
+# etl/publish_shared_tables.py
+"""
+Publica as tabelas de referência (UFs, municípios, UCs, defesos, políticas) como Arrow IPC
+em data/processed/shared/<nome>-<versão>.arrow, para os processos do app mapearem em
+memória. Roda depois do manifesto (a versão é o sha256 registrado nele).
+
+    python -m etl.publish_shared_tables
+    python -m etl.publish_shared_tables --force
+"""
+from __future__ import annotations
+import argparse
+from pathlib import Path
+
+from app.data_access.shared_tables import publish_all, shared_dir
+from etl.common import get_logger
+
+log = get_logger("etl.shared_tables")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out", default=None, help=f"diretório de saída (padrão: {shared_dir()})")
+    ap.add_argument("--force", action="store_true", help="republica mesmo sem mudança na fonte")
+    args = ap.parse_args(argv)
+
+    published = publish_all(Path(args.out) if args.out else None, force=args.force)
+    for name, path in published.items():
+        if path is None:
+            log.warning("%s: fonte ausente, não publicada", name)
+        else:
+            log.info("%s → %s (%.1f KB)", name, path.name, path.stat().st_size / 1024)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
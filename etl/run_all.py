@@ -12,9 +12,17 @@ def main():
     ["python", "-m", "etl.make_policies_catalog", "--src", "data/raw/policies_source",
      "--out", "data/processed/politicas_publicas.xlsx"],
 
+    # pacote binário do catálogo usado pelas páginas de resultado
+    ["python", "-m", "etl.build_policy_catalog"],
+
     # índice (CSV, sem depender de pyarrow)
     ["python", "-m", "etl.make_index", "--policies", "data/processed/politicas_publicas.xlsx",
      "--out", "data/processed/policies_index.csv"],
+
+    # manifesto dos datasets (depois de todas as etapas que geram dados)
+    ["python", "-m", "etl.build_manifest"],
+    # tabelas de referência mapeadas pelo app (versão = sha256 do manifesto)
+    ["python", "-m", "etl.publish_shared_tables"],
 ]
 
     for cmd in STEPS:
@@ -63,7 +63,7 @@ def profile_ok() -> dict:
 # ---------- MOCK: DB BRIDGE (evita tocar no SQLite real) ----------
 
 @pytest.fixture(autouse=True)
-def mock_db_bridge(monkeypatch):
+def mock_db_bridge(monkeypatch, tmp_path):
     """
     Evita que testes acionem o banco real.
     """
@@ -74,6 +74,7 @@ def mock_db_bridge(monkeypatch):
         migrate_db=lambda: calls.append(("migrate_db",)),
         migrate_accounts=lambda: calls.append(("migrate_accounts",)),
         migrate_analytics=lambda: calls.append(("migrate_analytics",)),
+        run_migrations=lambda: calls.append(("run_migrations",)) or 6,
         log_event=lambda **kw: calls.append(("log_event", kw)),
         get_analytics=lambda **kw: [],
         create_person_account=lambda *a, **k: {"id": 1, "display_name": "Teste"},
@@ -84,11 +85,48 @@ def mock_db_bridge(monkeypatch):
         update_profile_for_account=lambda *a, **k: True,
         get_profiles_by_account=lambda *a, **k: [(42, 1, "2025-01-01", "2025-01-02")],
         load_profile=lambda *a, **k: {"estado": "PA", "municipio": "Bragança"},
+        load_profile_entry=lambda *a, **k: ({"estado": "PA", "municipio": "Bragança"}, "2025-01-02"),
+        profile_updated_at=lambda *a, **k: "2025-01-02",
     )
-    import app.data_access.adapters.bridge_legacy_db as bridge
+    # o bridge carrega o db.py no primeiro acesso: se acontecer aqui, que seja num SQLite temporário
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "test.db"))
+    import app.data_access.bridge_legacy_db as bridge
     for attr in vars(fake):
         monkeypatch.setattr(bridge, attr, getattr(fake, attr), raising=True)
 
+# ---------- BACKENDS DE BANCO (SQLite sempre; PostgreSQL com MATUPIRI_TEST_PG_DSN) ----------
+# Postgres local para os testes (cada teste cria e apaga um schema próprio):
+#   docker run -d --name matupiri-pg -e POSTGRES_PASSWORD=pg -p 5432:5432 postgres:16
+#   MATUPIRI_TEST_PG_DSN=postgresql://postgres:pg@localhost:5432/postgres pytest
+DB_FILE = Path(__file__).resolve().parents[1] / "db.py"
+PG_DSN = os.getenv("MATUPIRI_TEST_PG_DSN")
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def backend(request, tmp_path, monkeypatch):
+    """Mesmo contrato nos dois backends; o Postgres só roda com MATUPIRI_TEST_PG_DSN."""
+    import importlib.util
+    import uuid
+    from app.data_access.backends import create_backend
+
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "test.db"))
+    spec = importlib.util.spec_from_file_location("db_backend_under_test", DB_FILE)
+    legacy = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(legacy)
+    if request.param == "postgres":
+        if not PG_DSN:
+            pytest.skip("defina MATUPIRI_TEST_PG_DSN para testar o backend PostgreSQL")
+        pytest.importorskip("psycopg_pool")
+        schema = f"t_{uuid.uuid4().hex[:12]}"
+        be = create_backend("postgres", legacy=legacy, dsn=PG_DSN, schema=schema, max_size=4)
+    else:
+        be = create_backend("sqlite", legacy=legacy)
+    be.run_migrations()
+    yield be
+    if request.param == "postgres":
+        with be._pool.connection() as cn:
+            cn.execute(f"DROP SCHEMA {be.schema} CASCADE")
+    be.close()
+
 # ---------- AJUSTES DE AMBIENTE PARA PATHS ----------
 @pytest.fixture(autouse=True)
 def ensure_env_paths(tmpdir_path: Path, monkeypatch):
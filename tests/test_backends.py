@@ -0,0 +1,64 @@
+from __future__ import annotations
+import pytest
+
+def test_backend_from_environment(monkeypatch):
+    from app.data_access.backends import backend_name
+
+    monkeypatch.delenv("DB_BACKEND", raising=False)
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    assert backend_name() == "sqlite"
+    monkeypatch.setenv("DATABASE_URL", "postgresql://u@localhost/matupiri")
+    assert backend_name() == "postgres"
+    monkeypatch.setenv("DB_BACKEND", "sqlite")
+    assert backend_name() == "sqlite"
+    monkeypatch.setenv("DB_BACKEND", "mysql")
+    with pytest.raises(ValueError):
+        backend_name()
+
+def test_accounts_and_login(backend):
+    pid = backend.create_person_account("Fulana", "fulana", "s3nha")
+    cid = backend.create_collective_account("12.345.678/0001-90", "colonia@exemplo", "outra")
+    assert backend.authenticate_person("fulana", "s3nha")["id"] == pid
+    assert backend.authenticate_person("fulana", "errada") is None
+    assert backend.authenticate_collective("12.345.678/0001-90", "outra")["contact"] == "colonia@exemplo"
+    assert backend.authenticate_collective("12.345.678/0001-90", "s3nha") is None
+    assert pid != cid
+
+def test_profile_versions_and_ownership(backend):
+    owner = backend.create_person_account("Fulana", "fulana", "pbkdf2$x$y$z")
+    other = backend.create_person_account("Beltrana", "beltrana", "pbkdf2$x$y$z")
+    p1 = backend.save_profile_for_account(owner, {"estado": "PA"})
+    p2 = backend.save_profile_for_account(owner, {"estado": "AP"})
+    assert [v for _, v, *_ in backend.get_profiles_by_account(owner)] == [2, 1]
+    backend.update_profile_for_account(p1, owner, {"estado": "PA", "rgp": True})
+    assert backend.load_profile(p1) == {"estado": "PA", "rgp": True}
+    entry = backend.load_profile_entry(p2)
+    assert entry[0] == {"estado": "AP"} and entry[1] == backend.profile_updated_at(p2)
+    with pytest.raises(PermissionError):
+        backend.update_profile_for_account(p1, other, {})
+    assert backend.load_profile(999_999) == {} and backend.profile_updated_at(999_999) is None
+    assert backend.save_eligibility("u", p1, None, [{"policy": "A"}], []) > 0
+
+def test_analytics_filters_order_and_requirements(backend):
+    backend.log_event(kind="view", policy="Seguro Defeso", uf=" pa ", municipio="BRAGANÇA", gender="Feminino")
+    n = backend.log_events([
+        {"kind": "matches", "policy": "Bolsa", "uf": "PA", "municipio": "Bragança",
+         "missing": ["rgp", "cpf"], "met": ["cadunico"]},
+        {"kind": "matches", "policy": "Bolsa", "uf": "AP", "municipio": "Macapá", "missing": ["rgp"]},
+    ])
+    assert n == 2 and backend.log_events([]) == 0
+
+    rows = backend.get_analytics(uf="PA", municipio="bragança")
+    assert [r["kind"] for r in rows] == ["matches", "view"]  # mais recentes primeiro
+    assert rows[0]["missing"] == ["rgp", "cpf"] and rows[0]["met"] == ["cadunico"]
+    assert rows[1]["gender"] == "Feminino" and rows[1]["met"] == []
+    batches = list(backend.iter_analytics(batch_size=2))
+    assert [len(b) for b in batches] == [2, 1]
+
+    agg = backend.get_analytics_aggregate("missing", group_by=["requirement"])
+    assert agg["ranking"] == [{"requirement": "rgp", "count": 2}, {"requirement": "cpf", "count": 1}]
+    assert agg["total"] == 3
+    assert {(w["uf"], w["municipio"]): w["weight"] for w in agg["weights"]} == {
+        ("PA", "Bragança"): 2, ("AP", "Macapá"): 1}
+    with pytest.raises(ValueError):
+        backend.get_analytics_aggregate("nope")
@@ -0,0 +1,40 @@
+from __future__ import annotations
+import pandas as pd
+
+from app.data_access import dtypes
+
+def _raw() -> pd.DataFrame:
+    n = 40
+    return pd.DataFrame({
+        "uf": ["PA", "AM", None, "PA"] * (n // 4),
+        "nome": [f"UC {i}" for i in range(n)],
+        "ibge_mun": ["1501709", "", "1300144", None] * (n // 4),
+        "lat": [-1.06, -3.1, -2.5, None] * (n // 4),
+        "responsavel": [f"Órgão {i}" for i in range(n)],   # alta cardinalidade
+    }, dtype=object).astype({"lat": float})
+
+def test_apply_dtypes_policy():
+    df = dtypes.apply_dtypes(_raw())
+    assert isinstance(df["uf"].dtype, pd.CategoricalDtype)
+    assert df["uf"].isna().sum() == 10 and set(df["uf"].cat.categories) == {"AM", "PA"}
+    assert str(df["ibge_mun"].dtype) == "Int32"
+    assert df["ibge_mun"].tolist()[:4] == [1501709, pd.NA, 1300144, pd.NA]
+    assert df["lat"].dtype == "float32"
+    assert not isinstance(df["responsavel"].dtype, pd.CategoricalDtype)   # não compensa
+    if dtypes.string_dtype() is not None:
+        assert df["nome"].dtype == dtypes.string_dtype()
+        assert df["nome"].where(df["nome"] != "UC 0").isna().sum() == 1   # NaN, não pd.NA
+
+def test_apply_dtypes_keeps_columns_that_do_not_convert():
+    df = pd.DataFrame({"ibge_uf": ["15", "não informado"], "lat": ["-1.0", "?"], "uf": [1, 2]})
+    out = dtypes.apply_dtypes(df)
+    assert out["ibge_uf"].tolist() == ["15", "não informado"]
+    assert out["lat"].tolist() == ["-1.0", "?"]
+    assert out["uf"].tolist() == [1, 2]
+    assert dtypes.apply_dtypes(None) is None and dtypes.apply_dtypes(pd.DataFrame()).empty
+
+def test_memory_report_shrinks_repeated_strings():
+    report = dtypes.memory_report({"ucs": _raw(), "vazio": pd.DataFrame()})
+    assert report["frame"].tolist() == ["ucs", "vazio"]
+    row = report.iloc[0]
+    assert row["rows"] == 40 and row["after_kb"] < row["before_kb"] and row["saved_pct"] > 0
@@ -0,0 +1,71 @@
+from __future__ import annotations
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from app.data_access import manifest, storage
+
+@pytest.fixture
+def data_root(tmp_path, monkeypatch):
+    root = tmp_path / "data"
+    (root / "processed" / "profiles").mkdir(parents=True)
+    (root / "raw").mkdir()
+    pd.DataFrame({"policy_id": ["P1", "P2"], "nome": ["a", "b"]}).to_csv(
+        root / "processed" / "policies_master.csv", index=False)
+    pd.DataFrame({"policy_id": ["P1"], "v": [1]}).to_excel(root / "processed" / "policy_regions.xlsx", index=False)
+    (root / "processed" / "profiles" / "p.json").write_text("{}", encoding="utf-8")
+    (root / "raw" / "x.csv").write_text("a\n1\n", encoding="utf-8")
+    (root / "processed" / ".hidden.csv").write_text("a\n1\n", encoding="utf-8")
+    monkeypatch.setenv("DATA_DIR", str(root))
+    monkeypatch.setenv("DATA_MANIFEST", str(root / "processed" / "manifest.json"))
+    return root
+
+def test_build_manifest_describes_datasets(data_root):
+    m = manifest.build_manifest()
+    assert sorted(m["datasets"]) == ["processed/policies_master.csv", "processed/policy_regions.xlsx"]
+    d = m["datasets"]["processed/policies_master.csv"]
+    assert d["format"] == "csv" and d["rows"] == 2 and list(d["schema"]) == ["policy_id", "nome"]
+    assert d["sha256"] == manifest._file_sha256(data_root / "processed" / "policies_master.csv")
+    assert json.loads(manifest.manifest_path().read_text(encoding="utf-8")) == m
+
+def test_build_manifest_is_incremental(data_root, monkeypatch):
+    first = manifest.build_manifest()
+    csv = data_root / "processed" / "policies_master.csv"
+    pd.DataFrame({"policy_id": ["P3"]}).to_csv(csv, index=False)
+    os.utime(csv, ns=(csv.stat().st_atime_ns, csv.stat().st_mtime_ns + 1_000_000))
+    described = []
+    real = manifest._describe
+    monkeypatch.setattr(manifest, "_describe", lambda p, fmt: described.append(p.name) or real(p, fmt))
+    second = manifest.build_manifest()
+    assert described == ["policies_master.csv"]
+    assert second["datasets"]["processed/policy_regions.xlsx"] == first["datasets"]["processed/policy_regions.xlsx"]
+    assert second["datasets"]["processed/policies_master.csv"]["rows"] == 1
+
+def test_lookup_find_and_resolve(data_root):
+    assert manifest.load_manifest() is None
+    assert manifest.dataset_version("processed/policies_master.csv") == ""
+    manifest.build_manifest()
+    m = manifest.load_manifest()
+    assert m.lookup("data/processed/policy_regions.xlsx").format == "xlsx"
+    assert m.lookup("policies_master.csv").key == "processed/policies_master.csv"
+    found = m.find(["policies", "processed/polic*"], (".csv", ".xlsx"))
+    assert [e.key for e in found] == ["processed/policies_master.csv", "processed/policy_regions.xlsx"]
+    assert m.find(["processed/policy_regions"], (".csv",)) == []
+    assert storage.resolve("processed/policy_regions.xlsx") == data_root / "processed" / "policy_regions.xlsx"
+    assert manifest.dataset_version("processed/policies_master.csv") == m.entries["processed/policies_master.csv"].sha256
+
+def test_known_sha256_only_for_unchanged_files(data_root):
+    manifest.build_manifest()
+    csv = data_root / "processed" / "policies_master.csv"
+    assert manifest.known_sha256(csv) == manifest._file_sha256(csv)
+    assert manifest.known_sha256(data_root / "raw" / "x.csv") is None
+    csv.write_text("policy_id\nP9\n", encoding="utf-8")
+    assert manifest.known_sha256(csv) is None
+
+def test_resolve_skips_stale_manifest_entries(data_root):
+    manifest.build_manifest()
+    (data_root / "processed" / "policy_regions.xlsx").rename(data_root / "policy_regions.xlsx")
+    assert manifest.resolve_path("policy_regions.xlsx") == data_root / "processed" / "policy_regions.xlsx"
+    assert storage.resolve("policy_regions.xlsx") == (data_root / "policy_regions.xlsx").resolve()
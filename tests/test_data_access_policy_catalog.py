@@ -0,0 +1,73 @@
+from __future__ import annotations
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from app.data_access import policy_catalog as pc
+
+def _write_sources(src: Path) -> None:
+    src.mkdir(parents=True, exist_ok=True)
+    tables = {
+        "policies.xlsx": [{"id": "P1", "Nome": "Seguro Defeso", "Descrição": "Benefício"},
+                          {"id": "P2", "Nome": "Bolsa Verde", "Descrição": "Auxílio"}],
+        "policy_requirements.xlsx": [{"policy_id": "P1", "attribute": "rgp", "operator": "==", "value": "sim",
+                                      "obrigatorio": "Sim"}],
+        "policy_documents.xlsx": [{"policy_id": "P1", "doc_name": "RG", "mandatory_flag": "true"},
+                                  {"policy_id": "P1", "doc_name": "Comprovante", "mandatory_flag": "false"}],
+        "policy_regions.xlsx": [{"policy_id": "P1", "uf": "PA"}, {"policy_id": "P1", "uf": "AP"}],
+        "policy_contacts.xlsx": [{"policy_id": "P1", "organization": "MPA", "telefone": "123"}],
+        "policy_requirements_contacts.xlsx": [{"policy_id": "P1", "attribute": " RGP ", "org_name": "MPA PA"}],
+    }
+    for name, rows in tables.items():
+        pd.DataFrame(rows).to_excel(src / name, index=False)
+
+def test_compile_catalog_builds_tables_and_indexes(tmp_path):
+    src = tmp_path / "src"
+    _write_sources(src)
+    cat = pc.compile_catalog(src)
+    assert list(cat.policies_df["policy_id"]) == ["P1", "P2"]
+    assert cat.reqs_df["mandatory_flag"].tolist() == [True]
+    assert cat.docs_by_policy == {"P1": [("RG", True), ("Comprovante", False)]}
+    info = {(r.info_key, r.info_value) for r in cat.info_df.itertuples()}
+    assert ("Abrangência", "AP, PA") in info and ("Documento exigido", "RG (obrigatório)") in info
+    assert cat.contacts_by_policy["P1"]["org_name"].tolist() == ["MPA"]
+    assert len(cat.all_contacts_by_policy["P1"]) == 2
+    assert cat.req_contacts_index[("P1", "rgp")][0]["org_name"] == "MPA PA"
+    assert set(cat.reqs_by_policy) == {"P1"}
+    assert [(r.attribute, r.text, r.mandatory) for r in cat.rules["P1"]] == [("rgp", "sim", True)]
+    assert cat.sources["policy_subprograms.xlsx"] == ""  # ausente
+
+def test_bundle_is_reused_until_sources_change(tmp_path):
+    src, bundle = tmp_path / "src", tmp_path / "out" / "catalog.pkl"
+    _write_sources(src)
+    cat, rebuilt = pc.build_bundle(src, bundle)
+    assert rebuilt and bundle.exists()
+    again, rebuilt = pc.build_bundle(src, bundle)
+    assert not rebuilt and again.version == cat.version
+
+    store = pc.PolicyCatalogStore([src], bundle)
+    first = store.get()
+    assert store.get() is first
+    assert store.stats() == {"hits": 1, "bundle_loads": 1, "builds": 0}
+
+    pd.DataFrame([{"id": "P9", "Nome": "Nova"}]).to_excel(src / "policies.xlsx", index=False)
+    st = (src / "policies.xlsx").stat()
+    os.utime(src / "policies.xlsx", ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    fresh = store.get()
+    assert fresh.version != first.version and list(fresh.policies_df["policy_id"]) == ["P9"]
+    assert store.stats()["builds"] == 1
+    assert pc.read_bundle(bundle).version == fresh.version
+
+def test_bundle_from_another_checkout_is_reused(tmp_path):
+    import shutil
+    src, bundle = tmp_path / "a" / "src", tmp_path / "catalog.pkl"
+    _write_sources(src)
+    cat, _ = pc.build_bundle(src, bundle)
+    moved = tmp_path / "b" / "src"                 # mesmo conteúdo, outro caminho absoluto
+    shutil.copytree(src, moved)
+    again, rebuilt = pc.build_bundle(moved, bundle)
+    assert not rebuilt and again.version == cat.version
+    store = pc.PolicyCatalogStore([moved], bundle)
+    assert store.get().version == cat.version
+    assert store.stats() == {"hits": 0, "bundle_loads": 1, "builds": 0}
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from app.data_access.profile_cache import ProfileCache
+
+class FakeStore:
+    def __init__(self):
+        self.rows = {1: ({"estado": "PA", "docs": ["cpf"]}, "t1"), 2: ({"estado": "AP"}, "t1")}
+        self.loads = 0
+        self.stamps = 0
+
+    def load(self, pid):
+        self.loads += 1
+        row = self.rows.get(pid)
+        return (dict(row[0]), row[1]) if row else None
+
+    def stamp(self, pid):
+        self.stamps += 1
+        row = self.rows.get(pid)
+        return row[1] if row else None
+
+def test_hits_do_not_touch_the_store():
+    store, cache = FakeStore(), ProfileCache(maxsize=4, revalidate_after_s=60)
+    for _ in range(5):
+        assert cache.get("1", store.load, store.stamp) == {"estado": "PA", "docs": ["cpf"]}
+    assert (store.loads, store.stamps) == (1, 0)
+    st = cache.stats()
+    assert st["hits"] == 4 and st["misses"] == 1
+
+def test_returns_copies():
+    store, cache = FakeStore(), ProfileCache()
+    cache.get(1, store.load, store.stamp)["docs"].append("rgp")
+    assert cache.get(1, store.load, store.stamp)["docs"] == ["cpf"]
+
+def test_revalidates_by_updated_at():
+    store, cache = FakeStore(), ProfileCache(revalidate_after_s=0)
+    cache.get(1, store.load, store.stamp)
+    cache.get(1, store.load, store.stamp)          # carimbo igual: sem reler o JSON
+    assert (store.loads, store.stamps) == (1, 1)
+    store.rows[1] = ({"estado": "MA"}, "t2")       # gravação de outro processo
+    assert cache.get(1, store.load, store.stamp) == {"estado": "MA"}
+    assert store.loads == 2 and cache.stats()["stale"] == 1
+
+def test_invalidate_and_lru_eviction():
+    store, cache = FakeStore(), ProfileCache(maxsize=1, revalidate_after_s=60)
+    cache.get(1, store.load, store.stamp)
+    cache.get(2, store.load, store.stamp)          # expulsa o 1
+    cache.get(1, store.load, store.stamp)
+    assert store.loads == 3 and cache.stats()["evictions"] == 2
+    store.rows[1] = ({"estado": "PI"}, "t1")
+    cache.invalidate(1)
+    assert cache.get(1, store.load, store.stamp) == {"estado": "PI"}
+    assert cache.get(99, store.load, store.stamp) == {}
+
+def test_default_checks_stamp_on_every_hit():
+    store, cache = FakeStore(), ProfileCache()
+    cache.get(1, store.load, store.stamp)
+    store.rows[1] = ({"estado": "MA"}, "t2")       # gravação de outro processo
+    assert cache.get(1, store.load, store.stamp) == {"estado": "MA"}
+    assert (store.loads, store.stamps) == (2, 1)
+
+def test_invalidate_during_load_is_not_undone():
+    store, cache = FakeStore(), ProfileCache()
+
+    def racing_load(pid):
+        row = store.load(pid)                      # lê a versão antiga...
+        store.rows[1] = ({"estado": "AM"}, "t2")   # ...e outro caminho grava e invalida
+        cache.invalidate(pid)
+        return row
+
+    assert cache.get(1, racing_load, store.stamp) == {"estado": "PA", "docs": ["cpf"]}
+    assert cache.stats()["size"] == 0
+    assert cache.get(1, store.load, store.stamp) == {"estado": "AM"}
@@ -10,3 +10,43 @@ def test_load_policies_table_from_tmp(tmp_policies_xlsx):
     df = repo.load_policies_table(tmp_policies_xlsx)
     assert not df.empty
     assert set(["Número","Politicas publicas","Acesso"]).issubset(df.columns)
+
+def test_importing_data_access_does_not_load_db(tmp_path):
+    # processo novo: o conftest já tocou no bridge neste aqui
+    import subprocess, sys
+    from pathlib import Path
+    root = Path(__file__).resolve().parents[1]
+    code = (
+        "import os, sys\n"
+        "import app.data_access.repositories as R\n"
+        "from app.data_access import bridge_legacy_db as B\n"
+        "assert not B.is_loaded() and 'db_legacy' not in sys.modules\n"
+        "assert not os.path.exists('infra')\n"
+        "assert R.AuthBusyError.__module__ == 'db_legacy' and B.is_loaded()\n"
+        "assert os.path.isdir('infra')\n"  # DB_PATH padrão: infra/pp_platform.db
+    )
+    env = {"PYTHONPATH": str(root), "PATH": ""}
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, check=True)
+
+def test_repositories_on_real_backend(backend, monkeypatch):
+    # repositories → bridge → backend (SQLite, e Postgres com MATUPIRI_TEST_PG_DSN)
+    from app.data_access import bridge_legacy_db as bridge
+    from app.data_access.profile_cache import ProfileCache
+    for name in ("save_profile_for_account", "update_profile_for_account", "get_profiles_by_account",
+                 "load_profile", "load_profile_entry", "profile_updated_at", "log_event",
+                 "get_analytics", "get_analytics_aggregate"):
+        monkeypatch.setattr(bridge, name, getattr(backend, name))
+    monkeypatch.setattr(repo, "_PROFILE_CACHE", ProfileCache())
+
+    owner = backend.create_person_account("Fulana", "fulana", "pbkdf2$x$y$z")
+    pid = repo.save_profile_for_account(owner, {"estado": "PA"})
+    assert repo.load_profile(pid) == {"estado": "PA"}
+    repo.update_profile_for_account(pid, owner, {"estado": "AP"})
+    assert repo.load_profile(pid) == {"estado": "AP"}
+    assert [r[0] for r in repo.get_profiles_by_account(owner)] == [pid]
+
+    repo.log_event(kind="matches", uf="PA", municipio="Bragança", missing=["rgp"])
+    repo.log_event(kind="view", policy="Bolsa", uf="pa")
+    assert [r["kind"] for r in repo.get_analytics(uf="PA")] == ["view", "matches"]
+    agg = repo.get_analytics_aggregate("missing", ["requirement"])
+    assert agg["ranking"] == [{"requirement": "rgp", "count": 1}]
@@ -0,0 +1,54 @@
+from __future__ import annotations
+import os
+
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from app.data_access import shared_tables
+from app.utils.config import paths
+
+@pytest.fixture
+def ucs_csv(tmp_path, monkeypatch):
+    src = tmp_path / "ucs.csv"
+    pd.DataFrame({"nome": [f"UC {i}" for i in range(30)], "uf": ["PA", "AM", "AP"] * 10,
+                  "area_ha": [float(i) for i in range(30)]}).to_csv(src, index=False)
+    monkeypatch.setenv("UCS_CSV", str(src))
+    monkeypatch.setenv("SHARED_TABLES_DIR", str(tmp_path / "shared"))
+    paths.cache_clear()
+    yield src
+    paths.cache_clear()
+
+def _bump(p):
+    st = p.stat()
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+def test_shared_frame_is_memory_mapped(ucs_csv):
+    store = shared_tables.SharedTableStore()
+    df = store.frame("ucs")
+    pd.testing.assert_frame_equal(df, shared_tables.TABLES["ucs"].reader(ucs_csv))
+    assert len(list(shared_tables.shared_dir().glob("ucs-*.arrow"))) == 1
+    # o texto do frame aponta para os buffers da tabela mapeada (zero-cópia)
+    names = store.table("ucs").column("nome")
+    assert pa.chunked_array(df["nome"].array.__arrow_array__()).chunks[0].buffers()[-1].address == \
+        names.chunks[0].buffers()[-1].address
+    assert store.frame("ucs") is not df          # cópia rasa por chamada
+    stats = store.stats()
+    assert stats["publishes"] == 1 and stats["maps"] == 1 and stats["hits"] == 2
+
+def test_new_source_version_republishes_and_prunes(ucs_csv):
+    store = shared_tables.SharedTableStore()
+    store.frame("ucs")
+    pd.DataFrame({"nome": ["Nova"], "uf": ["PA"], "area_ha": [1.0]}).to_csv(ucs_csv, index=False)
+    _bump(ucs_csv)
+    assert store.frame("ucs")["nome"].tolist() == ["Nova"]
+    files = list(shared_tables.shared_dir().glob("ucs-*.arrow"))
+    assert len(files) == 1 and shared_tables.table_version(ucs_csv) in files[0].name
+    assert shared_tables.publish_table("ucs") == files[0]        # já publicada: no-op
+
+def test_disabled_reads_the_source(ucs_csv, monkeypatch):
+    monkeypatch.setenv("SHARED_TABLES", "0")
+    assert len(shared_tables.shared_frame("ucs")) == 30
+    assert shared_tables.shared_table("ucs") is None
+    assert not shared_tables.shared_dir().exists()
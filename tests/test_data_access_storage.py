@@ -0,0 +1,44 @@
+from __future__ import annotations
+import os
+
+import pandas as pd
+
+from app.data_access import storage
+
+def _xlsx(path, rows):
+    pd.DataFrame(rows).to_excel(path, index=False)
+    return str(path)
+
+def test_excel_sidecar_round_trip_and_projection(tmp_path):
+    p = _xlsx(tmp_path / "t.xlsx", [{"policy_id": "P1", "valor": 1500, "obs": None},
+                                    {"policy_id": "P2", "valor": "a confirmar", "obs": "x"}])
+    before = storage.sidecar_stats()
+    first = storage.read_excel(p)
+    assert storage.sidecar_path(tmp_path / "t.xlsx").exists()
+    second = storage.read_excel(p)
+    pd.testing.assert_frame_equal(first, second)
+    assert [type(v) for v in second["valor"]] == [int, str]  # coluna mista preservada
+    assert storage.read_excel(p, usecols=["obs", "nada"]).columns.tolist() == ["obs"]
+    after = storage.sidecar_stats()
+    assert after["writes"] - before["writes"] == 1 and after["hits"] - before["hits"] == 2
+
+def test_excel_sidecar_is_refreshed_when_workbook_changes(tmp_path):
+    path = tmp_path / "t.xlsx"
+    storage.read_excel(_xlsx(path, [{"a": 1}]))
+    _xlsx(path, [{"a": 2}, {"a": 3}])
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    stale = storage.sidecar_stats()["stale"]
+    assert storage.read_excel(str(path))["a"].tolist() == [2, 3]
+    assert storage.sidecar_stats()["stale"] == stale + 1
+    assert storage.read_excel(str(path))["a"].tolist() == [2, 3]
+
+def test_sidecar_cli_lists_and_clears(tmp_path, capsys, monkeypatch):
+    storage.read_excel(_xlsx(tmp_path / "t.xlsx", [{"a": 1}]))
+    assert storage.main(["list", str(tmp_path)]) == 0
+    assert ".t.xlsx.0.feather" in capsys.readouterr().out
+    storage.main(["clear", str(tmp_path)])
+    assert storage.list_sidecars(tmp_path) == []
+    monkeypatch.setenv("EXCEL_SIDECAR", "0")
+    storage.read_excel(str(tmp_path / "t.xlsx"))
+    assert storage.list_sidecars(tmp_path) == []
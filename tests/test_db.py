@@ -0,0 +1,383 @@
+from __future__ import annotations
+import importlib.util
+import os
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+DB_FILE = Path(__file__).resolve().parents[1] / "db.py"
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    """Carrega uma cópia isolada do db.py apontando para um SQLite temporário."""
+    monkeypatch.setenv("DB_PATH", str(tmp_path / "test.db"))
+    spec = importlib.util.spec_from_file_location("db_under_test", DB_FILE)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    mod.run_migrations()
+    yield mod
+    mod.get_pool().close()
+
+def test_pool_reuses_connections(legacy_db):
+    for i in range(5):
+        legacy_db.log_event(kind="view", policy=f"P{i}", uf="PA")
+        legacy_db.get_analytics(uf="pa")
+    st = legacy_db.pool_stats()
+    assert st["opened"] <= 2  # uma de escrita + uma de leitura
+    assert st["reused"] >= 8
+    assert st["in_use"] == {"write": 0, "read": 0}
+
+def test_read_connections_are_query_only(legacy_db):
+    import sqlite3
+    with legacy_db._read_conn() as cn:
+        with pytest.raises(sqlite3.OperationalError):
+            cn.execute("INSERT INTO users (id, name, created_at) VALUES ('x','x','x')")
+
+def test_pool_bounds_concurrent_readers(legacy_db):
+    pool = legacy_db.ConnectionPool(legacy_db.DB_PATH, max_writers=1, max_readers=2)
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(20):
+                with pool.connection("read") as cn:
+                    cn.execute("SELECT COUNT(*) FROM analytics_events").fetchone()
+        except Exception as e:  # pragma: no cover - só para diagnóstico
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    st = pool.stats()
+    pool.close()
+    assert not errors
+    assert st["open"]["read"] <= 2
+
+def test_log_event_writes_normalized_keys(backend):
+    backend.log_event(kind="view", policy="Seguro Defeso", uf=" pa ", municipio="BRAGANÇA", gender="Feminino")
+    backend.log_event(kind="view", policy="Outra", uf="AP", municipio="Macapá")
+    rows = backend.get_analytics(uf="PA", municipio="bragança", gender="feminino")
+    assert [r["policy"] for r in rows] == ["Seguro Defeso"]
+    assert backend.get_analytics(start_iso="2000-01-01T00:00:00+00:00", end_iso="2000-01-02T00:00:00+00:00") == []
+
+def test_migrate_analytics_backfills_legacy_rows(legacy_db):
+    with legacy_db._conn() as cn:
+        cn.execute("""INSERT INTO analytics_events (ts, kind, uf, municipio, gender)
+                      VALUES ('2025-01-10T12:00:00+00:00', 'search', 'Pa', 'Bragança', 'Mulher')""")
+    legacy_db.migrate_analytics()
+    with legacy_db._read_conn() as cn:
+        r = cn.execute("SELECT ts_ms, uf_norm, municipio_norm, gender_norm FROM analytics_events").fetchone()
+    assert tuple(r) == (1736510400000, "PA", "bragança", "mulher")
+
+def test_get_analytics_uses_indexes(legacy_db):
+    where, args = legacy_db._analytics_filters(start_iso="2025-01-01T00:00:00+00:00", uf="PA", municipio="Bragança")
+    with legacy_db._read_conn() as cn:
+        plan = " ".join(r["detail"] for r in cn.execute(
+            f"EXPLAIN QUERY PLAN SELECT * FROM analytics_events WHERE 1=1 {where}", args))
+    assert "USING INDEX" in plan and "SCAN analytics_events" not in plan
+
+def test_buffered_writer_batches_and_flushes(legacy_db, tmp_path):
+    w = legacy_db.configure_analytics_writer(True, batch_size=10, flush_ms=50,
+                                             spill_path=tmp_path / "spill.jsonl")
+    for i in range(25):
+        assert legacy_db.log_event(kind="search", query=f"q{i}", uf="PA") == 0
+    assert legacy_db.flush_analytics(timeout=5)
+    assert len(legacy_db.get_analytics(uf="PA")) == 25
+    st = w.stats()
+    assert st["written"] == 25 and st["batches"] >= 3
+    legacy_db.configure_analytics_writer(False)
+
+def test_flush_after_close_returns_immediately(legacy_db, tmp_path):
+    w = legacy_db.configure_analytics_writer(True, batch_size=10, flush_ms=50,
+                                             spill_path=tmp_path / "spill.jsonl")
+    w.close()
+    assert legacy_db.log_event(kind="search", query="q", uf="AP") == 0   # síncrono após close
+    t0 = time.perf_counter()
+    assert w.flush(timeout=2)                 # antes: esperava o timeout e devolvia False
+    assert time.perf_counter() - t0 < 1
+    assert len(legacy_db.get_analytics(uf="AP")) == 1
+    legacy_db.configure_analytics_writer(False)
+
+def test_buffered_writer_spills_and_replays(legacy_db, tmp_path, monkeypatch):
+    spill = tmp_path / "spill.jsonl"
+    w = legacy_db.configure_analytics_writer(True, batch_size=5, flush_ms=20, spill_path=spill)
+    real_insert = legacy_db._insert_events
+
+    def failing(rows):
+        raise legacy_db.sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(legacy_db, "_insert_events", failing)
+    for i in range(3):
+        legacy_db.log_event(kind="view", policy=f"P{i}")
+    w.flush(timeout=5)
+    assert spill.exists() and w.stats()["spilled"] == 3
+    monkeypatch.setattr(legacy_db, "_insert_events", real_insert)
+    w.flush(timeout=5)
+    legacy_db.configure_analytics_writer(False)
+    assert not spill.exists()
+    assert sorted(r["policy"] for r in legacy_db.get_analytics()) == ["P0", "P1", "P2"]
+
+def test_get_analytics_aggregate_matches_pandas_groupby(backend):
+    import pandas as pd
+    backend.log_event(kind="view", policy="A", uf="PA", municipio="Bragança")
+    backend.log_event(kind="view", policy="A", uf="PA", municipio="Bragança")
+    backend.log_event(kind="view", policy="B", uf="AP", municipio="Macapá")
+    backend.log_event(kind="view", policy="C", uf="AP")  # sem município: fora dos pesos
+    backend.log_event(kind="matches", uf="PA", municipio="Bragança", met=["cpf"], missing=["rgp", "caf"])
+    backend.log_event(kind="matches", uf="AP", municipio="Macapá", missing=["rgp"])
+
+    agg = backend.get_analytics_aggregate("views", ["uf", "municipio", "policy"], {}, top_n=10)
+    ev = pd.DataFrame(backend.get_analytics())
+    view = ev[ev["kind"] == "view"]
+    expected = view.groupby(["uf", "municipio", "policy"]).size().sort_values(ascending=False)
+    assert [(r["uf"], r["municipio"], r["policy"], r["count"]) for r in agg["ranking"]] == \
+           [(*k, v) for k, v in expected.items()]
+    assert {(w["uf"], w["weight"]) for w in agg["weights"]} == {("PA", 2), ("AP", 1)}
+    assert agg["total"] == 6
+
+    miss = backend.get_analytics_aggregate("missing", ["requirement"], {"uf": "pa"}, top_n=1)
+    assert miss["ranking"] == [{"requirement": "caf", "count": 1}]
+    top = backend.get_analytics_aggregate("missing", ["requirement"], {}, top_n=1)
+    assert top["ranking"] == [{"requirement": "rgp", "count": 2}]
+
+    with pytest.raises(ValueError):
+        backend.get_analytics_aggregate("views", ["requirement"])
+
+def test_rollups_match_raw_aggregation(legacy_db):
+    day = legacy_db._DAY_MS
+    base = 1_736_467_200_000  # 2025-01-10T00:00:00Z
+    for i in range(12):
+        legacy_db.log_event(kind="view", policy=f"P{i % 3}", uf="PA" if i % 2 else "AP",
+                            municipio="Bragança" if i % 2 else "Macapá")
+        legacy_db.log_event(kind="matches", uf="PA", municipio="Bragança", missing=["rgp"] if i % 2 else ["caf"])
+    with legacy_db._conn() as cn:  # espalha os eventos em 4 dias, com horas variadas
+        cn.execute("UPDATE analytics_events SET ts_ms = ? + (id % 4) * ? + (id % 5) * 3600000", (base, day))
+
+    assert legacy_db.refresh_rollups() == 24
+    assert legacy_db.refresh_rollups() == 0  # marca d'água: nada novo
+
+    periods = [
+        {},
+        {"start_iso": "2025-01-10T07:30:00+00:00", "end_iso": "2025-01-12T02:00:00+00:00"},
+        {"start_iso": "2025-01-11T01:00:00+00:00", "end_iso": "2025-01-11T03:00:00+00:00", "uf": "pa"},
+    ]
+    for f in periods:
+        for metric, cols in (("views", ["uf", "policy"]), ("missing", ["requirement"])):
+            fast = legacy_db.get_analytics_aggregate(metric, cols, f, top_n=None)
+            slow = legacy_db.get_analytics_aggregate(metric, cols, f, top_n=None, use_rollups=False)
+            assert fast["total"] == slow["total"]
+            assert fast["ranking"] == slow["ranking"]
+            assert sorted(map(tuple, (w.values() for w in fast["weights"]))) == \
+                   sorted(map(tuple, (w.values() for w in slow["weights"])))
+
+    legacy_db.log_event(kind="view", policy="Nova", uf="PA", municipio="Bragança")
+    agg = legacy_db.get_analytics_aggregate("views", ["policy"], {}, top_n=None)
+    assert {"policy": "Nova", "count": 1} in agg["ranking"]  # catch-up antes da leitura
+    assert legacy_db.rebuild_rollups() == 25
+
+def test_requirements_live_in_child_table(legacy_db):
+    with legacy_db._conn() as cn:  # evento antigo, ainda com as listas em JSON
+        cn.execute("""INSERT INTO analytics_events (ts, kind, uf, met_json, missing_json, extras_json)
+                      VALUES ('2025-01-10T12:00:00+00:00', 'matches', 'PA', '["cpf"]', '["rgp","caf"]', '{}')""")
+    legacy_db.migrate_analytics()
+    legacy_db.migrate_analytics()  # idempotente
+    legacy_db.log_event(kind="matches", uf="PA", met=["caf"], missing=["rgp"], extras={"origem": "teste"})
+
+    with legacy_db._read_conn() as cn:
+        assert cn.execute("SELECT COUNT(*) FROM analytics_events WHERE met_json IS NOT NULL "
+                          "OR missing_json IS NOT NULL").fetchone()[0] == 0
+        assert cn.execute("SELECT COUNT(*) FROM analytics_event_requirements").fetchone()[0] == 5
+    rows = legacy_db.get_analytics(uf="PA")
+    assert [(r["met"], r["missing"], r["extras"]) for r in rows] == [
+        (["caf"], ["rgp"], {"origem": "teste"}),
+        (["cpf"], ["rgp", "caf"], {}),
+    ]
+    miss = legacy_db.get_analytics_aggregate("missing", ["requirement"], {}, use_rollups=False)
+    assert miss["ranking"][0] == {"requirement": "rgp", "count": 2}
+
+def test_analytics_frame_and_batches(backend):
+    import pandas as pd
+    for i in range(7):
+        backend.log_event(kind="view" if i % 2 else "matches", policy=f"P{i % 2}", uf="PA",
+                            municipio="Bragança", gender=None if i == 3 else "Mulher",
+                            missing=["rgp"] if i % 2 == 0 else None)
+
+    batches = list(backend.iter_analytics(uf="pa", batch_size=3))
+    assert [len(b) for b in batches] == [3, 3, 1]
+    assert [d for b in batches for d in b] == backend.get_analytics(uf="pa")
+
+    df = backend.get_analytics_frame(uf="pa", batch_size=2, with_requirements=True)
+    assert len(df) == 7
+    assert pd.api.types.is_datetime64_any_dtype(df["ts"])
+    for col in ("kind", "uf", "gender"):
+        assert isinstance(df[col].dtype, pd.CategoricalDtype)
+    assert df["gender"].isna().sum() == 1
+    assert df["missing"].map(len).sum() == 4
+    expected = pd.DataFrame(backend.get_analytics(uf="pa"))
+    assert df["kind"].astype(str).tolist() == expected["kind"].tolist()
+    assert backend.get_analytics_frame(uf="XX").empty
+
+def test_compaction_moves_closed_months_to_readonly_partitions(legacy_db, tmp_path, monkeypatch):
+    import os
+    from datetime import datetime, timezone
+    archive = tmp_path / "arquivo"
+    monkeypatch.setattr(legacy_db, "_ANALYTICS_ARCHIVE_DIR", str(archive))
+    months = {"2024-12": 1_733_011_200_000, "2025-01": 1_735_689_600_000,
+              "2025-02": 1_738_368_000_000, "2025-03": 1_740_787_200_000}  # dia 1, 00:00 UTC
+    for i, start in enumerate(months.values()):
+        for j in range(3):
+            eid = legacy_db.log_event(kind="matches" if j == 0 else "view", policy=f"P{j}", uf="PA",
+                                      municipio="Bragança", missing=["rgp"] if j == 0 else None)
+            with legacy_db._conn() as cn:
+                cn.execute("UPDATE analytics_events SET ts_ms = ? WHERE id = ?",
+                           (start + (j + 1) * 3_600_000 + i, eid))
+    f = {"start_iso": "2024-12-01T02:00:00+00:00", "end_iso": "2025-03-01T01:30:00+00:00"}
+    before = (legacy_db.get_analytics(), legacy_db.get_analytics(uf="pa", **f),
+              legacy_db.get_analytics_aggregate("views", ["policy"], f, top_n=None),
+              legacy_db.get_analytics_aggregate("missing", ["requirement"], {}, use_rollups=False))
+
+    now = datetime(2025, 3, 15, tzinfo=timezone.utc)  # janela quente: fevereiro e março
+    assert legacy_db.compact_analytics(now=now) == ["2024-12", "2025-01"]
+    assert legacy_db.compact_analytics(now=now) == []  # idempotente
+    with legacy_db._read_conn() as cn:
+        assert cn.execute("SELECT COUNT(*) FROM analytics_events").fetchone()[0] == 6
+        assert [tuple(r) for r in cn.execute("SELECT month, events FROM analytics_partitions")] == \
+               [("2024-12", 3), ("2025-01", 3)]
+    part = archive / "events_2025-01.db"
+    assert not os.stat(part).st_mode & 0o222  # somente-leitura
+
+    after = (legacy_db.get_analytics(), legacy_db.get_analytics(uf="pa", **f),
+             legacy_db.get_analytics_aggregate("views", ["policy"], f, top_n=None),
+             legacy_db.get_analytics_aggregate("missing", ["requirement"], {}, use_rollups=False))
+    assert after == before
+    assert [len(b) for b in legacy_db.iter_analytics(batch_size=5)] == [5, 5, 2]
+    assert len(legacy_db.get_analytics_frame(with_requirements=True)) == 12
+    assert legacy_db.rebuild_rollups() == 12
+
+    monkeypatch.setattr(legacy_db, "_ANALYTICS_RETENTION_MONTHS", 3)
+    assert legacy_db.apply_analytics_retention(now=now) == ["2024-12"]
+    assert not (archive / "events_2024-12.db").exists()
+    assert len(legacy_db.get_analytics()) == 9
+    agg = legacy_db.get_analytics_aggregate("views", ["policy"], {}, top_n=None)
+    assert agg["total"] == 12  # rollups dos meses removidos continuam
+
+def test_writes_from_several_processes_are_not_lost(legacy_db):
+    import subprocess
+    import sys
+    script = (
+        "import importlib.util, sys\n"
+        f"spec = importlib.util.spec_from_file_location('db_proc', {str(DB_FILE)!r})\n"
+        "db = importlib.util.module_from_spec(spec); spec.loader.exec_module(db)\n"
+        "for i in range(100):\n"
+        "    db.log_event(kind='matches', policy=f'P{i}', uf='PA', missing=['rgp'])\n"
+        "    if i % 10 == 0: db.save_profile_for_account(1, {'i': i})\n"
+    )
+    procs = [subprocess.Popen([sys.executable, "-c", script], env={**os.environ, "DB_BUSY_TIMEOUT_MS": "50"},
+                              stderr=subprocess.PIPE, text=True) for _ in range(4)]
+    errors = [p.communicate(timeout=120)[1] for p in procs]
+    assert [p.returncode for p in procs] == [0] * 4, errors
+    with legacy_db._read_conn() as cn:
+        assert cn.execute("SELECT COUNT(*) FROM analytics_events").fetchone()[0] == 400
+        assert cn.execute("SELECT COUNT(*) FROM analytics_event_requirements").fetchone()[0] == 400
+        assert [r[0] for r in cn.execute("SELECT version FROM profiles ORDER BY version")] == list(range(1, 41))
+
+def test_login_upgrades_hash_when_iterations_change(legacy_db, monkeypatch):
+    acc = legacy_db.create_person_account("Fulana", "fulana", "s3nha")
+    monkeypatch.setattr(legacy_db, "_PBKDF2_ITER", 1_000)
+
+    def stored():
+        with legacy_db._read_conn() as cn:
+            return cn.execute("SELECT password_hash FROM accounts WHERE id=?", (acc,)).fetchone()[0]
+
+    assert stored().split("$")[1] == "130000"
+    assert legacy_db.authenticate_person("fulana", "errada") is None
+    assert stored().split("$")[1] == "130000"  # só regrava após verificar
+    assert legacy_db.authenticate_person("fulana", "s3nha")["id"] == acc
+    assert stored().split("$")[1] == "1000"
+    assert legacy_db.authenticate_person("fulana", "s3nha")["id"] == acc
+
+def test_login_is_rejected_fast_when_hash_queue_is_full(legacy_db, monkeypatch):
+    import threading
+    legacy_db.create_collective_account("123", "contato", "pbkdf2$1000$00$00")
+    hasher = legacy_db._HashExecutor(workers=1, queue_max=0, wait_s=5)
+    monkeypatch.setattr(legacy_db, "_HASHER", hasher)
+    release = threading.Event()
+    busy = threading.Thread(target=hasher.run, args=(release.wait,))
+    busy.start()
+    try:
+        while hasher.stats()["submitted"] == 0:
+            pass
+        with pytest.raises(legacy_db.AuthBusyError):
+            legacy_db.authenticate_collective("123", "qualquer")
+        with pytest.raises(legacy_db.AuthBusyError):
+            legacy_db.create_person_account("Fulana", "fulana", "s3nha")
+    finally:
+        release.set()
+        busy.join()
+    assert hasher.stats()["rejected"] == 2
+    assert legacy_db.authenticate_collective("123", "qualquer") is None  # vaga livre de novo
+    hasher.shutdown()
+
+def test_run_migrations_is_versioned_and_runs_once(legacy_db, monkeypatch):
+    assert legacy_db.schema_version() == legacy_db.SCHEMA_VERSION
+
+    # outro processo: esquema em dia → só lê o user_version, sem passos nem lock
+    legacy_db._MIGRATED.clear()
+    ran = []
+    monkeypatch.setattr(legacy_db, "_MIGRATIONS",
+                        tuple((v, lambda cn, v=v: ran.append(v)) for v, _ in legacy_db._MIGRATIONS))
+    assert legacy_db.run_migrations() == legacy_db.SCHEMA_VERSION
+    assert ran == []
+
+    # banco numa versão antiga: aplica só os passos pendentes
+    with legacy_db._conn() as cn:
+        cn.execute("PRAGMA user_version = 4")
+    legacy_db._MIGRATED.clear()
+    legacy_db.run_migrations()
+    assert ran == list(range(5, legacy_db.SCHEMA_VERSION + 1))
+    ran.clear()
+    legacy_db.run_migrations()  # já conferido neste processo
+    assert ran == []
+
+def test_run_migrations_upgrades_legacy_database(legacy_db):
+    """Banco criado pelas funções antigas (user_version=0) sobe de versão sem perder dados."""
+    legacy_db.log_event(kind="view", policy="A", uf="PA")
+    with legacy_db._conn() as cn:
+        cn.execute("PRAGMA user_version = 0")
+    legacy_db._MIGRATED.clear()
+    assert legacy_db.run_migrations() == legacy_db.SCHEMA_VERSION
+    assert [r["policy"] for r in legacy_db.get_analytics()] == ["A"]
+
+def test_profile_versions_are_unique_under_concurrency(legacy_db):
+    errors = []
+
+    def worker(i):
+        try:
+            for j in range(10):
+                legacy_db.save_profile_for_account(7, {"i": i, "j": j})
+        except Exception as e:  # pragma: no cover - só para diagnóstico
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert not errors
+    versions = [v for _, v, _, _ in legacy_db.get_profiles_by_account(7)]
+    assert versions == list(range(40, 0, -1))
+
+    with legacy_db._read_conn() as cn:
+        plan = " ".join(r["detail"] for r in cn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM profiles WHERE owner_account_id=? ORDER BY version DESC", (7,)))
+    assert "ux_profiles_owner_version" in plan and "TEMP B-TREE" not in plan
+
+def test_profile_version_step_renumbers_duplicates(legacy_db):
+    with legacy_db._conn() as cn:
+        cn.execute("DROP INDEX ux_profiles_owner_version")
+        for v in (1, 1, 2):
+            cn.execute("INSERT INTO profiles (user_id, profile_json, version, owner_account_id) VALUES ('', '{}', ?, 3)", (v,))
+        legacy_db._step_profile_versions(cn)
+    assert sorted(v for _, v, _, _ in legacy_db.get_profiles_by_account(3)) == [1, 2, 3]
+    assert legacy_db.load_profile(legacy_db.save_profile_for_account(3, {"a": 1})) == {"a": 1}
+    assert legacy_db.get_profiles_by_account(3)[0][1] == 4
@@ -17,3 +17,14 @@ def test_filter_and_active_defesos_on():
     # filtro por UF e arte
     filt = filter_defesos(df, uf="PA", arte_query="re")
     assert len(filt) == 1 and filt.iloc[0]["especie"] == "Camarão"
+
+def test_load_defesos_keeps_blank_categoricals(tmp_path):
+    from app.services.defeso_calendar import load_defesos
+    rows = [{"especie": f"E{i}", "uf": "PA" if i % 3 else None, "esfera": "Federal" if i % 2 else None,
+             "inicio": "2025-01-01", "fim": "2025-02-01"} for i in range(6)]
+    p = tmp_path / "defesos.csv"
+    pd.DataFrame(rows).to_csv(p, index=False)
+    df = load_defesos(str(p))
+    assert isinstance(df["uf"].dtype, pd.CategoricalDtype)
+    assert df["uf"].tolist() == ["", "PA", "PA", "", "PA", "PA"]
+    assert df["esfera"].tolist() == ["", "Federal", "", "Federal", "", "Federal"]
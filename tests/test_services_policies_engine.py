@@ -14,15 +14,125 @@ def test_evaluate_requirements_wrapper(monkeypatch, keyword_map_dict, profile_ok
     met, missing = pe.evaluate_requirements("cpf; cadunico; rgp", profile_ok, keyword_map_dict)
     assert "cpf" in met and "cadunico" in met and "rgp" in missing
 
-def test_batch_evaluate_policies(monkeypatch, keyword_map_dict, profile_ok):
+def test_batch_evaluate_policies(keyword_map_dict, profile_ok):
     def fake_eval(txt, profile, km):
         return (["ok"], []) if "cpf" in txt and "rgp" not in txt else (["ok"], ["rgp"])
-    monkeypatch.setattr(pe, "_evaluate_requirements", fake_eval, raising=True)
 
     df = pd.DataFrame([
         {"Acesso": "cpf; cadunico"},     # elegível
         {"Acesso": "rgp; cpf"},          # quase
         {"Acesso": ""},                  # ignora
     ])
-    eligible, nearly = pe.batch_evaluate_policies(df, profile_ok, keyword_map_dict)
+    # motor plugado explicitamente (o índice de regras é o padrão)
+    eligible, nearly = pe.batch_evaluate_policies(df, profile_ok, keyword_map_dict, evaluate=fake_eval)
     assert len(eligible) == 1 and len(nearly) == 1
+
+def test_batch_evaluate_policies_default_index(profile_ok):
+    kw = {"cpf": {"label": "CPF regular", "field": "cpf_ok", "type": "bool"},
+          "rgp": {"label": "RGP ativo", "field": "rgp", "type": "bool"},
+          "cadunico": {"label": "CadÚnico", "field": "cadunico", "type": "bool"}}
+    df = pd.DataFrame([
+        {"Acesso": "cpf; cadunico"},     # elegível
+        {"Acesso": "rgp; cpf"},          # quase
+        {"Acesso": ""},                  # ignora
+    ])
+    eligible, nearly = pe.batch_evaluate_policies(df, profile_ok, kw)
+    assert eligible == [(0, ["CPF regular", "CadÚnico"], [])]
+    assert nearly == [(1, ["CPF regular"], ["RGP ativo"])]
+
+def _loop_keys(text, kw_map):
+    import utils
+    req = utils.norm(text)
+    return [k for k in kw_map if k in req]
+
+def test_keyword_matcher_keeps_substring_semantics():
+    import utils
+    keys = ["rgp", "registro geral da pesca", "pesca", "pescador", "pescadora", "a", "cpf", "mulher"]
+    kw = {k: {"field": k, "type": "bool"} for k in keys}
+    texts = ["Registro Geral da Pesca (RGP) ativo; pescadora", "CPF", "", "mulheres", "sem requisitos"]
+    for trie_min_keys in (None, 1):            # laço por chave e trie em uma passada
+        m = utils.KeywordMatcher(kw, trie_min_keys=trie_min_keys)
+        for t in texts:
+            assert [m.keys[i] for i in m.keys_in(t)] == _loop_keys(t, kw)
+
+def test_evaluate_requirements_reuses_compiled_matcher():
+    import utils
+    kw = {"cpf": {"field": "cpf", "type": "bool", "label": "CPF"},
+          "rgp": {"field": "rgp", "type": "bool", "label": "RGP"}}
+    assert utils.compile_keyword_map(kw) is utils.compile_keyword_map(kw)
+    assert utils.evaluate_requirements("RGP e CPF", {"cpf": True}, kw) == (["CPF"], ["RGP"])
+    kw["cnpj"] = {"field": "cnpj", "type": "bool", "label": "CNPJ"}   # chaves mudaram: recompila
+    assert utils.evaluate_requirements("cnpj", {}, kw) == ([], ["CNPJ"])
+
+def test_policy_rule_index_matches_text_evaluation():
+    import utils
+    kw = {"rgp": {"field": "registro_rgp", "type": "bool", "value": True},
+          "registro geral da pesca": {"field": "registro_rgp", "type": "bool", "value": True},
+          "cpf": {"field": "cpf", "type": "bool", "label": "CPF"},
+          "renda": {"field": "renda", "type": "number", "op": "<=", "value": 1500}}
+    df = pd.DataFrame({"Acesso": ["Registro Geral da Pesca (RGP) e CPF", "renda até 1500", "", None]},
+                      index=[10, 11, 12, 13])
+    index = pe.PolicyRuleIndex.build(df, kw, "v1")
+    assert len(index.conditions) == 3                  # rgp e "registro geral..." são a mesma condição
+    for profile in ({"cpf": True, "renda": 900}, {"registro_rgp": True, "renda": 3000}, {}):
+        expected = ([], [])
+        for idx, text in df["Acesso"].items():
+            met, missing = utils.evaluate_requirements(str(text), profile, kw)
+            if met or missing:
+                (expected[1] if missing else expected[0]).append((idx, met, missing))
+        assert index.evaluate(profile) == expected
+        assert pe.batch_evaluate_policies(df, profile, kw) == expected
+
+def test_policy_rule_index_is_built_once_per_version():
+    kw = {"cpf": {"field": "cpf", "type": "bool"}}
+    df = pd.DataFrame({"Acesso": ["cpf"]})
+    first = pe.policy_rule_index(df, kw, "catalogo-1")
+    assert pe.policy_rule_index(df, kw, "catalogo-1") is first
+    assert pe.policy_rule_index(df, kw) is pe.policy_rule_index(df.copy(), kw)   # hash dos textos
+    assert pe.policy_rule_index(pd.DataFrame({"Acesso": ["nada"]}), kw).rules[0][1] == ()
+
+def test_evaluate_matrix_matches_per_profile_index():
+    import numpy as np
+    kw = {"rgp": {"field": "registro_rgp", "type": "bool", "value": True, "label": "RGP"},
+          "cpf": {"field": "cpf", "type": "bool", "label": "CPF"},
+          "renda": {"field": "renda", "type": "number", "op": "<=", "value": 1500},
+          "uf": {"field": "uf", "type": "select_in", "value": ["PA", "AM"]},
+          "colonia": {"field": "colonia", "type": "bool"}}      # coluna ausente nos perfis
+    df = pd.DataFrame({"Acesso": ["RGP e CPF", "renda e uf", "colonia; cpf", "", "nada"]})
+    index = pe.PolicyRuleIndex.build(df, kw, "m1")
+    profiles = pd.DataFrame({
+        "registro_rgp": [True, False, None, 1, "sim"],
+        "cpf": [True, True, False, np.nan, 1.0],
+        "renda": [900.0, 3000.0, np.nan, 1500.0, 0.0],
+        "uf": ["PA", "SP", None, "AM", "pa"],
+    })
+    matrix = pe.evaluate_matrix(profiles, index)
+    assert matrix.eligible.shape == (len(profiles), len(df))
+    for p in range(len(profiles)):
+        # célula NaN/None na matriz = campo ausente no perfil
+        profile = {k: v for k, v in profiles.iloc[p].items() if v is not None and v == v}
+        assert pe.matrix_results(index, matrix, p) == index.evaluate(profile)
+
+def test_evaluate_matrix_wide_bitset():
+    kw = {f"k{i:03d}": {"field": f"f{i}", "type": "bool", "label": f"L{i}"} for i in range(70)}
+    df = pd.DataFrame({"Acesso": [" ".join(kw), "k000 k069"]})
+    index = pe.PolicyRuleIndex.build(df, kw, "wide")
+    profiles = pd.DataFrame({f"f{i}": [True, i != 69] for i in range(70)})
+    matrix = pe.evaluate_matrix(profiles, index)
+    assert matrix.missing.ndim == 3                      # > 64 condições: palavras uint64
+    assert matrix.eligible.tolist() == [[True, True], [False, False]]
+    assert [index.conditions[c]["label"] for c in pe.missing_conditions(matrix, 1, 1)] == ["L69"]
+    for p in range(len(profiles)):
+        assert pe.matrix_results(index, matrix, p) == index.evaluate(profiles.iloc[p].to_dict())
+
+def test_batch_evaluate_policies_with_plugged_engine():
+    seen = []
+
+    def engine(text, profile, km):
+        seen.append(text)
+        return (["CPF"], []) if "cpf" in text else ([], ["RGP"]) if "rgp" in text else ([], [])
+
+    df = pd.DataFrame({"Acesso": ["cpf", "rgp", "nada"]}, index=[7, 8, 9])
+    assert pe.batch_evaluate_policies(df, {}, {}, evaluate=engine) == (
+        [(7, ["CPF"], [])], [(8, [], ["RGP"])])
+    assert seen == ["cpf", "rgp", "nada"]
@@ -0,0 +1,105 @@
+from __future__ import annotations
+import itertools
+import re
+
+import pandas as pd
+
+from app.services import requirement_rules as rr
+
+def _legacy_eval_operator(attr_value, operator, expected):
+    """O _eval_operator das páginas de resultado antes das regras compiladas."""
+    def num(x):
+        try: return float(x)
+        except Exception: return None
+
+    def value_in(left, right):
+        if isinstance(right, (list, tuple, set)): return left in right
+        if isinstance(right, str):
+            return str(left) in [s.strip() for s in re.split(r",|;|\|", right) if s.strip()]
+        return False
+
+    def contains(container, needle):
+        if container is None: return False
+        if isinstance(container, str): return needle.lower() in container.lower()
+        if isinstance(container, (list, tuple, set)): return any(contains(x, needle) for x in container)
+        return needle.lower() in str(container).lower()
+
+    op = (operator or "").strip().lower()
+    lv, rv = num(attr_value), num(expected)
+    if op in {"==", "=", "eq"}: return str(attr_value) == str(expected)
+    if op in {"!=", "<>", "ne"}: return str(attr_value) != str(expected)
+    if op in {">=", "ge"} and lv is not None and rv is not None: return lv >= rv
+    if op in {"<=", "le"} and lv is not None and rv is not None: return lv <= rv
+    if op in {">", "gt"} and lv is not None and rv is not None: return lv > rv
+    if op in {"<", "lt"} and lv is not None and rv is not None: return lv < rv
+    if op in {"in", "∈"}: return value_in(attr_value, expected)
+    if op in {"not in", "∉"}: return not value_in(attr_value, expected)
+    if op in {"contains", "has", "∋"}: return contains(attr_value, str(expected))
+    if op in {"not contains", "!contains"}: return not contains(attr_value, str(expected))
+    if op in {"regex", "match"}:
+        try: return bool(re.compile(str(expected)).search(str(attr_value)))
+        except Exception: return False
+    return False
+
+def test_compiled_rules_match_legacy_operator():
+    ops = list(rr.OPERATOR_ALIASES) + [" GE ", "Not In", "", None, "~"]
+    expected = ["sim", "PA, AM|AP", "10", 10, 2.5, float("nan"), None, ["PA", 1], ("x", [1]),
+                "^\\d{3}$", "(", "Pescador"]
+    values = ["sim", "PA", "ap", 10, "10", 9.99, True, None, float("nan"), "123", ["pescador", "x"],
+              {"k": 1}, [1]]
+    for op, exp, val in itertools.product(ops, expected, values):
+        assert rr.eval_operator(val, op, exp) == _legacy_eval_operator(val, op, exp), (op, exp, val)
+
+def test_parse_requirements_types_and_errors():
+    reqs = pd.DataFrame([
+        {"policy_id": "P1", "attribute": " renda ", "operator": "<=", "value": "1500", "mandatory_flag": True},
+        {"policy_id": "P1", "attribute": "uf", "operator": "IN", "value": "PA; AM", "mandatory_flag": False},
+        {"policy_id": "P2", "attribute": "nis", "operator": "regex", "value": "([0-9]", "mandatory_flag": True},
+        {"policy_id": "P2", "attribute": "idade", "operator": ">", "value": "maior", "mandatory_flag": True},
+        {"policy_id": None, "attribute": "x", "operator": "==", "value": 1, "mandatory_flag": True},
+    ])
+    rules = rr.parse_requirements(reqs)
+    assert list(rules) == ["P1", "P2"]
+    renda, uf = rules["P1"]
+    assert (renda.attribute, renda.op, renda.threshold, renda.label) == ("renda", rr.Operator.LE, 1500.0, "renda <= 1500")
+    assert uf.op is rr.Operator.IN and uf.items == frozenset({"PA", "AM"}) and not uf.mandatory
+    assert [r.error is not None for r in rules["P2"]] == [True, True]
+    assert [r.label for r in rr.rule_errors(rules)] == ["nis regex ([0-9]", "idade > maior"]
+
+    engine = rr.compiled_rules(rules, "v1")
+    assert rr.compiled_rules(rules, "v1") is engine
+    assert [(r.attribute, ok, val) for r, ok, val in engine.evaluate("P1", {"renda": "900", "uf": "SP"})] == [
+        ("renda", True, "900"), ("uf", False, "SP")]
+    assert engine.evaluate("P9", {}) == []
+
+def test_dependency_index_patches_only_affected_policies():
+    reqs = pd.DataFrame([
+        {"policy_id": "P1", "attribute": "experiencia_anos", "operator": ">=", "value": 3, "mandatory_flag": True},
+        {"policy_id": "P2", "attribute": "uf", "operator": "in", "value": "PA, AP", "mandatory_flag": True},
+        {"policy_id": "P3", "attribute": "renda", "operator": "<=", "value": 1500, "mandatory_flag": True},
+    ])
+    docs = {"P2": [("RGP", True)], "P4": [("CPF", True), ("RGP", False)]}
+    rules = rr.parse_requirements(reqs)
+    engine = rr.compiled_rules(rules)
+    deps = rr.dependency_index(rules, docs)
+    ids = ["P1", "P2", "P3", "P4", "P5"]
+
+    def evaluate(pid, profile):
+        have = profile.get("docs") or {}
+        return ([ok for _, ok, _ in engine.evaluate(pid, profile)]
+                + [bool(have.get(d)) for d, _ in docs.get(pid, [])])
+
+    old = {"experiencia_anos": 2, "uf": "PA", "renda": 900, "docs": {"RGP": True, "CPF": False}}
+    new = {"experiencia_anos": 4, "uf": "PA", "renda": 900, "docs": {"RGP": True, "CPF": True}}
+    assert rr.profile_changes(old, new) == ({"experiencia_anos", "docs"}, {"CPF"})
+    assert rr.profile_changes({"x": 1}, {"x": 1.0}) == ({"x"}, set())     # "==" compara str(valor)
+    affected = deps.affected_by(old, new)
+    assert affected == {"P1", "P4"}
+
+    calls = []
+    previous = [evaluate(pid, old) for pid in ids]
+    patched, redone = rr.patch_results(previous, ids, affected,
+                                       lambda i: calls.append(ids[i]) or evaluate(ids[i], new))
+    assert calls == ["P1", "P4"] and redone == [0, 3]
+    assert patched == [evaluate(pid, new) for pid in ids]
+    assert rr.dependency_index(rules, docs, "v1") is rr.dependency_index(rules, docs, "v1")
@@ -1,6 +1,8 @@
 
 import re, json, unicodedata
-from typing import Dict, Any, List, Tuple
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Any, List, Optional, Tuple
 
 def norm(s: str) -> str:
     if s is None:
@@ -61,15 +63,107 @@ def check_condition(user_value, cond):
     # Se o tipo não for reconhecido, falha com segurança
     return False
 
+# ------------------------------------------------------------
+# Matcher do keyword_map: compilado uma vez por mapa
+# ------------------------------------------------------------
+# Semântica igual ao laço antigo (`key in norm(texto)` para cada chave, na ordem do mapa).
+# Com muitas chaves o mapa vira um trie numa única regex com lookahead: uma passada pelo
+# texto acha todas as ocorrências, inclusive sobrepostas (em cada posição casa a chave
+# mais longa; as chaves que são prefixo dela vêm junto). Com poucas chaves, `in` por chave
+# (busca em C) é mais rápido que a passada única, então fica o laço.
+# O resultado por texto é memorizado: avaliar vários perfis contra as mesmas políticas
+# normaliza e varre cada texto uma vez só.
+
+TRIE_MIN_KEYS = 128
+_TEXT_MEMO_SIZE = 4096
+
+def _trie_pattern(keys: List[str]) -> str:
+    trie: Dict[str, Any] = {}
+    for k in keys:
+        node = trie
+        for ch in k:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def emit(node: Dict[str, Any]) -> str:
+        alts = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        # nó terminal com filhos: opcional guloso → tenta primeiro a chave mais longa
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+class KeywordMatcher:
+    """Chaves do keyword_map que ocorrem num texto de requisitos (índices na ordem do mapa)."""
+
+    def __init__(self, kw_map: Dict[str, Dict[str, Any]], trie_min_keys: Optional[int] = None):
+        self.keys: List[str] = list(kw_map)
+        self.conds: List[Dict[str, Any]] = [kw_map[k] for k in self.keys]
+        self._always = tuple(i for i, k in enumerate(self.keys) if k == "")   # "" in req é sempre True
+        words = sorted({k for k in self.keys if k})
+        self._regex = None
+        if len(words) >= (TRIE_MIN_KEYS if trie_min_keys is None else trie_min_keys):
+            index = {k: i for i, k in enumerate(self.keys)}
+            self._regex = re.compile("(?=(" + _trie_pattern(words) + "))")
+            self._implied = {w: tuple(index[p] for p in words if w.startswith(p)) for w in words}
+        self._memo: "OrderedDict[str, Tuple[int, ...]]" = OrderedDict()
+        self._lock = Lock()
+
+    def scan(self, req: str) -> Tuple[int, ...]:
+        """Varre um texto já normalizado."""
+        if self._regex is None:
+            return tuple(i for i, k in enumerate(self.keys) if k in req)
+        found = set(self._always)
+        for m in self._regex.finditer(req):
+            found.update(self._implied[m.group(1)])
+        return tuple(sorted(found))
+
+    def keys_in(self, requirement_text: str) -> Tuple[int, ...]:
+        """Índices das chaves presentes em norm(requirement_text), memorizado por texto."""
+        with self._lock:
+            hit = self._memo.get(requirement_text)
+            if hit is not None:
+                self._memo.move_to_end(requirement_text)
+                return hit
+        hit = self.scan(norm(requirement_text))
+        with self._lock:
+            self._memo[requirement_text] = hit
+            if len(self._memo) > _TEXT_MEMO_SIZE:
+                self._memo.popitem(last=False)
+        return hit
+
+_MATCHERS: "OrderedDict[int, Tuple[Dict[str, Any], Tuple[str, ...], KeywordMatcher]]" = OrderedDict()
+_MATCHERS_LOCK = Lock()
+
+def compile_keyword_map(kw_map: Dict[str, Dict[str, Any]]) -> KeywordMatcher:
+    """
+    Matcher do mapa, reaproveitado enquanto o mesmo objeto (ex.: o resultado memorizado
+    de load_keyword_map) for passado com as mesmas chaves.
+    """
+    keys = tuple(kw_map)
+    with _MATCHERS_LOCK:
+        hit = _MATCHERS.get(id(kw_map))
+        if hit is not None and hit[0] is kw_map and hit[1] == keys:
+            _MATCHERS.move_to_end(id(kw_map))
+            return hit[2]
+    matcher = KeywordMatcher(kw_map)
+    with _MATCHERS_LOCK:
+        _MATCHERS[id(kw_map)] = (kw_map, keys, matcher)   # a referência impede reuso do id
+        if len(_MATCHERS) > 8:
+            _MATCHERS.popitem(last=False)
+    return matcher
+
 def evaluate_requirements(requirement_text: str, profile: Dict[str, Any], kw_map: Dict[str, Dict[str, Any]]) -> Tuple[List[str], List[str]]:
-    req = norm(requirement_text)
+    matcher = compile_keyword_map(kw_map)
     met, missing = [], []
-    for key, cond in kw_map.items():
-        if key in req:
-            ok = check_condition(profile.get(cond["field"]), cond)
-            label = cond.get("label", key)
-            if ok:
-                met.append(label)
-            else:
-                missing.append(label)
+    for i in matcher.keys_in(requirement_text):
+        key, cond = matcher.keys[i], matcher.conds[i]
+        ok = check_condition(profile.get(cond["field"]), cond)
+        label = cond.get("label", key)
+        if ok:
+            met.append(label)
+        else:
+            missing.append(label)
     return met, missing